@@ -3,33 +3,45 @@ import BandoDetailClient from "@/components/BandoDetailClient";
 import path from "path";
 import fs from "fs";
 
-// Helper to read bandi from JSON file at build time
-async function getBandi() {
-    const filePath = path.join(process.cwd(), "public", "bandi.json");
+// Static shards written by scripts/export_json.py, read at build time
+const DATA_DIR = path.join(process.cwd(), "public", "data");
+
+function readJson(relativePath: string) {
+    return JSON.parse(fs.readFileSync(path.join(DATA_DIR, relativePath), "utf8"));
+}
+
+// Placeholder route when there is no manifest: output 'export' rejects an empty param list
+const MISSING_CATALOG_ID = "0";
+
+// id -> per-grant JSON file (listed in the manifest)
+async function getGrantFiles(): Promise<Record<string, string>> {
     try {
-        const fileContents = fs.readFileSync(filePath, "utf8");
-        return JSON.parse(fileContents);
+        const manifest = readJson("manifest.json");
+        return readJson(manifest.grants);
     } catch (error) {
-        console.error("Error reading bandi.json:", error);
-        return [];
+        console.warn("Catalog manifest not found, run scripts/export_json.py:", error);
+        return {};
     }
 }
 
 export async function generateStaticParams() {
-    const bandi = await getBandi();
+    const ids = Object.keys(await getGrantFiles());
 
-    return bandi.map((bando: any) => ({
-        id: bando.id.toString(),
+    // Without a manifest the build still succeeds with a single "not found" page
+    return (ids.length ? ids : [MISSING_CATALOG_ID]).map((id) => ({
+        id,
     }));
 }
 
 export default async function BandoPage({ params }: { params: { id: string } }) {
-    const bandi = await getBandi();
-    const bando = bandi.find((b: any) => b.id.toString() === params.id);
+    const grantFiles = await getGrantFiles();
+    const file = grantFiles[params.id];
 
-    if (!bando) {
+    if (!file) {
         notFound();
     }
 
+    // Only this grant's JSON is read, not the whole catalog
+    const bando = readJson(file);
     return <BandoDetailClient bando={bando} />;
 }
@@ -1,6 +1,6 @@
 "use client";
 
-import { useEffect, useState, useCallback } from "react";
+import { useEffect, useState, useCallback, useRef } from "react";
 import { GrantCard } from "@/components/GrantCard";
 import { Loader2, RefreshCw } from "lucide-react";
 import NeonLogo from "@/components/ui/NeonLogo";
@@ -9,6 +9,7 @@ import FilterBar from "@/components/FilterBar";
 import CinematicBackground from "@/components/CinematicBackground";
 import Navbar from "@/components/Navbar";
 import type { Bando } from "@/lib/types";
+import { loadManifest, loadRange, loadAll } from "@/lib/catalog";
 
 export default function Home() {
   const [bandi, setBandi] = useState<Bando[]>([]);
@@ -24,54 +25,49 @@ export default function Home() {
   const [region, setRegion] = useState("");
   const [status, setStatus] = useState("");
 
+  // "Aggiorna DB" re-reads the manifest; shard pages stay cached (content-hashed)
+  const refreshRequested = useRef(false);
+
   const fetchBandi = useCallback(async () => {
     setLoading(true);
     try {
-      // STATIC MODE: Fetch from JSON and filter client-side
-      // BasePath is /AlSolved_Bandi, so we need to include it in manual fetches
-      const basePath = process.env.NODE_ENV === "production" ? "/AlSolved_Bandi" : "";
-      const res = await fetch(`${basePath}/bandi.json`);
-      if (!res.ok) throw new Error("Failed to load static data");
+      // STATIC MODE: manifest + content-hashed shards (scripts/export_json.py)
+      const manifest = await loadManifest(refreshRequested.current);
+      refreshRequested.current = false;
+
+      // Region filter -> per-region slice
+      const slice = region ? manifest.regions[region] : manifest.index;
+      if (!slice) {
+        setBandi([]);
+        setHasMore(false);
+        return;
+      }
+
+      // Status filter: shards are sorted active first, so it is a contiguous range
+      let rangeStart = 0;
+      let rangeEnd = slice.total;
+      if (status === "attivi") rangeEnd = slice.active_total;
+      else if (status === "scaduti") rangeStart = slice.active_total;
 
-      let data = await res.json();
+      const start = (page - 1) * pageSize;
 
-      // Client-side Filtering
       if (search) {
+        // Free-text search needs the whole slice (compact records, cached after first load)
         const lowerSearch = search.toLowerCase();
-        data = data.filter((b: Bando) =>
+        const data = (await loadAll(slice)).slice(rangeStart, rangeEnd).filter((b: Bando) =>
           b.title.toLowerCase().includes(lowerSearch) ||
           (b.marketing_text && b.marketing_text.toLowerCase().includes(lowerSearch))
         );
+        setBandi(data.slice(start, start + pageSize));
+        setHasMore(start + pageSize < data.length);
+      } else {
+        // Only the shard pages covering this page are fetched
+        const from = rangeStart + start;
+        const to = Math.min(from + pageSize, rangeEnd);
+        setBandi(await loadRange(slice, manifest.page_size, from, to));
+        setHasMore(to < rangeEnd);
       }
 
-      if (region && region !== "") {
-        data = data.filter((b: Bando) => {
-          // simple check against regions array or string
-          const r = JSON.stringify(b.ai_analysis?.regions || b.ai_analysis?.regione || "").toLowerCase();
-          return r.includes(region.toLowerCase());
-        });
-      }
-
-      if (status === "attivi") {
-        data = data.filter((b: Bando) => {
-          const expired = b.ai_analysis?.is_expired;
-          return expired !== true && expired !== "true";
-        });
-      } else if (status === "scaduti") {
-        data = data.filter((b: Bando) => {
-          const expired = b.ai_analysis?.is_expired;
-          return expired === true || expired === "true";
-        });
-      }
-
-      // Pagination
-      const start = (page - 1) * pageSize;
-      const end = start + pageSize;
-      const paginatedData = data.slice(start, end);
-
-      setBandi(paginatedData);
-      setHasMore(end < data.length);
-
     } catch (e) {
       console.error(e);
       // Fallback to empty
@@ -115,7 +111,7 @@ export default function Home() {
             </p>
           </div>
           <button
-            onClick={() => { setPage(1); fetchBandi(); }}
+            onClick={() => { refreshRequested.current = true; setPage(1); fetchBandi(); }}
             className="flex items-center gap-2 px-6 py-2.5 bg-primary hover:bg-primary/90 rounded-full font-bold text-sm uppercase tracking-wide transition-all shadow-md hover:shadow-lg shadow-primary/20 text-white"
           >
             <RefreshCw className={`w-4 h-4 ${loading ? 'animate-spin' : ''}`} />
@@ -41,7 +41,8 @@ function formatDeadline(analysis: Bando["ai_analysis"]): string | null {
         if (!isNaN(date.getTime())) {
             return format(date, "dd MMM yyyy", { locale: it });
         }
-        return dateStr.slice(0, 10);
+        // Non-date deadlines ("A sportello") are shown as-is
+        return /^\d{4}-\d{2}-\d{2}/.test(dateStr) ? dateStr.slice(0, 10) : dateStr;
     } catch {
         return dateStr.slice(0, 10);
     }
@@ -0,0 +1,68 @@
+import type { Bando } from "@/lib/types";
+
+// Static catalog shards written by scripts/export_json.py (public/data)
+
+export interface CatalogSlice {
+    total: number;
+    active_total: number; // items are sorted active first
+    pages: string[];
+}
+
+export interface CatalogManifest {
+    version: string;
+    generated_at: string;
+    page_size: number;
+    index: CatalogSlice;
+    regions: Record<string, CatalogSlice & { slug: string }>;
+    grants: string;
+}
+
+export type CatalogCard = Bando & { detail: string };
+
+// BasePath is /AlSolved_Bandi, so we need to include it in manual fetches
+const basePath = process.env.NODE_ENV === "production" ? "/AlSolved_Bandi" : "";
+const DATA_URL = `${basePath}/data`;
+
+let manifestPromise: Promise<CatalogManifest> | null = null;
+// Shard files are content-hashed: a cached page never goes stale
+const pageCache = new Map<string, Promise<CatalogCard[]>>();
+
+async function fetchJson<T>(url: string, init?: RequestInit): Promise<T> {
+    const res = await fetch(url, init);
+    if (!res.ok) throw new Error(`Failed to load ${url}`);
+    return res.json();
+}
+
+export function loadManifest(refresh = false): Promise<CatalogManifest> {
+    if (!manifestPromise || refresh) {
+        manifestPromise = fetchJson<CatalogManifest>(`${DATA_URL}/manifest.json`, { cache: "no-cache" });
+        manifestPromise.catch(() => { manifestPromise = null; });
+    }
+    return manifestPromise;
+}
+
+function loadPage(file: string): Promise<CatalogCard[]> {
+    let page = pageCache.get(file);
+    if (!page) {
+        page = fetchJson<CatalogCard[]>(`${DATA_URL}/${file}`);
+        page.catch(() => pageCache.delete(file));
+        pageCache.set(file, page);
+    }
+    return page;
+}
+
+/** Items [start, end) of a slice, fetching only the pages covering the range. */
+export async function loadRange(slice: CatalogSlice, pageSize: number, start: number, end: number): Promise<CatalogCard[]> {
+    end = Math.min(end, slice.total);
+    if (start >= end) return [];
+    const first = Math.floor(start / pageSize);
+    const last = Math.floor((end - 1) / pageSize);
+    const pages = await Promise.all(slice.pages.slice(first, last + 1).map(loadPage));
+    return pages.flat().slice(start - first * pageSize, end - first * pageSize);
+}
+
+/** Whole slice (compact card records), used by free-text search. */
+export async function loadAll(slice: CatalogSlice): Promise<CatalogCard[]> {
+    const pages = await Promise.all(slice.pages.map(loadPage));
+    return pages.flat();
+}
@@ -0,0 +1,93 @@
+"""
+Benchmark: serializzazione di una pagina GET /bandi (size=100).
+
+Confronta il percorso standard di FastAPI (validazione response_model
+List[BandoResponse] + json della stdlib) con il percorso veloce di
+src/api/fast_json.py (dict dalle colonne + orjson), sulle stesse righe ORM.
+Verifica anche che i due body siano identici.
+
+Usage:
+    python scripts/benchmarks/bench_api_serialization.py --size 100 --repeat 200
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List
+
+from pydantic import TypeAdapter
+
+root_path = Path(__file__).parent.parent.parent
+sys.path.append(str(root_path))
+
+from src.api.schemas import BandoResponse, CARD_FIELDS
+from src.api.fast_json import bando_rows, dumps, orjson
+from src.scraper.models import Bando, ProcessingStatus
+
+ANALYSIS = {
+    "titolo_riassuntivo": "Contributi per la digitalizzazione delle PMI",
+    "sintesi": "Contributo a fondo perduto fino al 50% delle spese ammissibili. " * 3,
+    "regions": ["Lombardia", "Veneto"], "ateco_codes": ["62.01", "62.02", "63.11"],
+    "scadenza": "2030-06-30", "is_expired": False, "budget_totale": "10.000.000 EUR",
+    "beneficiari": ["PMI", "Startup"], "spese_ammissibili": ["Software", "Hardware", "Consulenza"] * 3,
+    "search_tags": ["digitale", "software", "cloud", "cybersecurity"],
+}
+
+
+def make_rows(size: int) -> list:
+    now = datetime(2026, 1, 1)
+    return [
+        Bando(
+            id=i, url=f"https://example.org/bando/{i}", url_hash=f"h{i}", title=f"Bando {i}",
+            source_name="Incentivi.gov.it [Solr]", status=ProcessingStatus.ANALYZED,
+            ingested_at=now + timedelta(minutes=i), raw_content="Testo del bando. " * 400,
+            ai_analysis=ANALYSIS, marketing_text="Fino a 200.000€ per digitalizzare la tua impresa.",
+        )
+        for i in range(1, size + 1)
+    ]
+
+
+def pydantic_path(adapter, rows) -> bytes:
+    """Quello che fa FastAPI con response_model: validate + serialize + json.dumps."""
+    content = adapter.dump_python(adapter.validate_python(rows), mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    rows = make_rows(args.size)
+    adapter = TypeAdapter(List[BandoResponse])
+
+    before = pydantic_path(adapter, rows)
+    after = dumps(bando_rows(rows))
+    assert json.loads(before) == json.loads(after), "output diverso"
+
+    slow = timed(lambda: pydantic_path(adapter, rows), args.repeat)
+    fast = timed(lambda: dumps(bando_rows(rows)), args.repeat)
+    card = timed(lambda: dumps(bando_rows(rows, CARD_FIELDS)), args.repeat)
+
+    print(f"Encoder:               {'orjson' if orjson else 'stdlib json'}")
+    print(f"Pydantic + json:       {slow:7.2f} ms  ({len(before) / 1024:.0f} KB)")
+    print(f"Fast path:             {fast:7.2f} ms  ({len(after) / 1024:.0f} KB)  x{slow / fast:.1f}")
+    print(f"Fast path fields=card: {card:7.2f} ms  ({len(dumps(bando_rows(rows, CARD_FIELDS))) / 1024:.0f} KB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark: backfill delle colonne di scadenza su tutta la tabella.
+
+Popola un DB SQLite temporaneo con N bandi le cui scadenze sono nei formati
+reali (timestamp Solr, dd/mm/yyyy Open Data, mesi in italiano, "A sportello",
+"N/A"), poi misura backfill_deadlines(full=True): primo passaggio (tutte le
+righe cambiano) e secondo (nessuna riga cambia, nessuna scrittura).
+
+Usage:
+    python scripts/benchmarks/bench_deadlines.py --rows 50000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+root_path = Path(__file__).parent.parent.parent
+sys.path.append(str(root_path))
+
+# DB temporaneo: va impostato prima di importare i modelli
+os.environ["DATABASE_URL"] = f"sqlite:///{Path(tempfile.mkdtemp()) / 'bench.db'}"
+
+from sqlalchemy import insert  # noqa: E402
+
+from src.scraper.models import Bando, ProcessingStatus, backfill_deadlines, init_db  # noqa: E402
+
+MONTHS = ["gennaio", "febbraio", "marzo", "aprile", "maggio", "giugno",
+          "luglio", "agosto", "settembre", "ottobre", "novembre", "dicembre"]
+
+
+def random_analysis(rng: random.Random) -> dict:
+    y, m, d = rng.randint(2022, 2028), rng.randint(1, 12), rng.randint(1, 28)
+    kind = rng.randrange(6)
+    if kind == 0:
+        return {"close_date": f"{y}-{m:02d}-{d:02d}T22:00:00Z", "open_date": f"{y - 1}-{m:02d}-01T00:00:00Z"}
+    if kind == 1:
+        return {"data_chiusura": f"{d:02d}/{m:02d}/{y}", "data_apertura": f"01/{m:02d}/{y - 1}"}
+    if kind == 2:
+        return {"scadenza": f"{d} {MONTHS[m - 1].capitalize()} {y}"}
+    if kind == 3:
+        return {"scadenza": "A sportello", "scadenza_descrizione": "fino a esaurimento fondi"}
+    if kind == 4:
+        return {"scadenza": "N/A"}
+    return {"scadenza": f"{y}-{m:02d}-{d:02d}"}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    session = init_db()
+    session.execute(insert(Bando), [
+        {"url": f"https://example.org/{i}", "url_hash": f"h{i}", "title": f"Bando {i}",
+         "status": ProcessingStatus.ANALYZED, "ai_analysis": json.dumps(random_analysis(rng))}
+        for i in range(args.rows)
+    ])
+    session.commit()
+
+    t0 = time.perf_counter()
+    first = backfill_deadlines(session, full=True)
+    t1 = time.perf_counter()
+    second = backfill_deadlines(session, full=True)
+    t2 = time.perf_counter()
+
+    statuses = Counter(status for (status,) in session.query(Bando.deadline_status))
+    print(f"Righe:            {args.rows}")
+    print(f"Primo backfill:   {first} aggiornate in {t1 - t0:.2f}s ({args.rows / (t1 - t0):,.0f} righe/s)")
+    print(f"Secondo backfill: {second} aggiornate in {t2 - t1:.2f}s")
+    print(f"Stati:            {dict(statuses)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark: export statico completo vs incrementale.
+
+Popola un DB SQLite temporaneo con N bandi analizzati, esegue un export
+completo, poi modifica `--changed` bandi e misura l'export incrementale
+(tempo e file scritti).
+
+Usage:
+    python scripts/benchmarks/bench_export.py --grants 5000 --changed 20
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+root_path = Path(__file__).parent.parent.parent
+sys.path.append(str(root_path))
+
+# DB temporaneo: va impostato prima di importare i modelli
+workdir = Path(tempfile.mkdtemp())
+os.environ["DATABASE_URL"] = f"sqlite:///{workdir / 'bench.db'}"
+
+from src.scraper.models import Bando, ProcessingStatus, init_db  # noqa: E402
+
+sys.path.append(str(root_path / "scripts"))
+from export_json import export_to_json  # noqa: E402
+
+REGIONS = ["Lombardia", "Lazio", "Puglia", "Veneto", "Sicilia", "Toscana", "Campania"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--grants", type=int, default=5000)
+    parser.add_argument("--changed", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    session = init_db()
+    session.add_all(
+        Bando(
+            url=f"https://example.org/bando/{i}", url_hash=f"bench-{i}", title=f"Bando {i}",
+            raw_content="Lorem ipsum " * 200, source_name="bench", status=ProcessingStatus.ANALYZED,
+            ai_analysis=json.dumps({
+                "titolo_riassuntivo": f"Bando {i}", "sintesi": "Contributo a fondo perduto",
+                "regions": [rng.choice(REGIONS)], "close_date": f"20{rng.randint(20, 30)}-06-30",
+            }),
+        )
+        for i in range(args.grants)
+    )
+    session.commit()
+
+    output = workdir / "data"
+    state = workdir / "export-state.json"
+    full = export_to_json(output, state_path=state)
+    noop = export_to_json(output, state_path=state)
+
+    ids = [bando_id for (bando_id,) in session.query(Bando.id)]
+    for bando in session.query(Bando).filter(Bando.id.in_(rng.sample(ids, args.changed))):
+        bando.marketing_text = "Aggiornato"
+    session.commit()
+    incremental = export_to_json(output, state_path=state)
+
+    print()
+    print(f"Export completo:     {full['elapsed'] * 1000:8.0f} ms  {full['written']:6} file")
+    print(f"Nessuna modifica:    {noop['elapsed'] * 1000:8.0f} ms  {noop['written']:6} file")
+    print(f"{args.changed} bandi modificati: {incremental['elapsed'] * 1000:6.0f} ms  {incremental['written']:6} file")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark: marketing text generation, ORM loop vs columnar batch.
+
+Crea un database SQLite temporaneo con N bandi sintetici "Gold" ed esegue
+run_marketing_generation (loop su oggetti ORM) e
+run_marketing_generation_batch (colonne + bulk update), verificando che i
+testi generati siano identici.
+
+Usage:
+    python scripts/benchmarks/bench_marketing.py --rows 20000
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+root_path = Path(__file__).parent.parent.parent
+sys.path.append(str(root_path))
+
+
+def make_analysis(rng: random.Random) -> dict:
+    analysis = {"ateco_codes": " ".join(rng.sample(["10.1", "25.62", "56.10", "62.01", "41.20", "99.00"], 2))}
+    if rng.random() < 0.7:
+        analysis["financial_max"] = rng.choice([800, 25_000, 150_000, 2_500_000])
+    elif rng.random() < 0.5:
+        analysis["financial_min"] = rng.choice([500, 10_000, 1_200_000])
+    if rng.random() < 0.5:
+        analysis["forma_agevolazione"] = [rng.choice(["Fondo perduto", "Garanzia", "Credito d'imposta", "Prestito"])]
+    if rng.random() < 0.6:
+        analysis["data_chiusura"] = "2026-12-31T23:59:00"
+    if rng.random() < 0.4:
+        analysis["regione"] = rng.choice(["Lombardia", "Lazio", "Puglia"])
+    return analysis
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20000)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp_dir}/bench.db"
+
+    from src.scraper.models import init_db, Bando, backfill_tiers
+    from src.analysis.marketing import run_marketing_generation, run_marketing_generation_batch
+
+    session = init_db()
+    rng = random.Random(42)
+    session.bulk_insert_mappings(Bando, [
+        {
+            "url": f"https://example.org/bando/{i}",
+            "url_hash": Bando.generate_hash(f"https://example.org/bando/{i}"),
+            "title": f"Bando {i}",
+            "ai_analysis": json.dumps(make_analysis(rng)),
+        }
+        for i in range(args.rows)
+    ])
+    session.commit()
+    backfill_tiers(session)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        t0 = time.perf_counter()
+        run_marketing_generation(force=True)
+        loop_time = time.perf_counter() - t0
+        loop_texts = dict(session.query(Bando.id, Bando.marketing_text))
+
+        session.query(Bando).update({Bando.marketing_text: None})
+        session.commit()
+
+        t0 = time.perf_counter()
+        run_marketing_generation_batch(force=True)
+        batch_time = time.perf_counter() - t0
+    session.expire_all()
+    batch_texts = dict(session.query(Bando.id, Bando.marketing_text))
+
+    print(f"Rows:           {args.rows}")
+    print(f"ORM loop:       {loop_time:.3f}s")
+    print(f"Columnar batch: {batch_time:.3f}s  ({loop_time / batch_time:.1f}x)")
+    print(f"Same output:    {loop_texts == batch_texts}")
+
+
+if __name__ == "__main__":
+    main()
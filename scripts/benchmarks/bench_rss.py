@@ -0,0 +1,155 @@
+"""
+Benchmark: ingestione RSS seriale (legacy) vs concorrente (src/scraper/rss.py).
+
+Avvia un server HTTP locale con `--feeds` feed da `--entries` voci ciascuno;
+ogni pagina di dettaglio risponde dopo `--latency` ms (come un portale PA
+lento). Misura:
+- seriale: una voce alla volta, deep fetch + commit per riga (come
+  Ingestor.fetch_rss di scripts/legacy/bi_ingest.py)
+- concorrente: run_rss_ingestion su un DB vuoto
+- secondo giro, feed invariati: il server risponde 304 all'If-None-Match,
+  conta anche le query SQL eseguite (attese: 0)
+- terzo giro con `--new` voci aggiunte in testa a ogni feed: la lettura si
+  ferma alla prima voce nota
+
+Usage:
+    python scripts/benchmarks/bench_rss.py --feeds 4 --entries 30 --latency 200
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+root_path = Path(__file__).parent.parent.parent
+sys.path.append(str(root_path))
+
+# DB temporaneo: va impostato prima di importare i modelli
+os.environ["DATABASE_URL"] = f"sqlite:///{Path(tempfile.mkdtemp()) / 'bench.db'}"
+
+from sqlalchemy import event  # noqa: E402
+from sqlalchemy.engine import Engine  # noqa: E402
+
+from src.scraper import rss  # noqa: E402
+from src.scraper.detail import fetch_detail_text  # noqa: E402
+from src.scraper.models import Bando, ProcessingStatus, init_db  # noqa: E402
+
+
+QUERIES = [0]
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_query(*args):
+    QUERIES[0] += 1
+
+
+def make_handler(n_entries: int, latency: float, extra: list):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.startswith("/feed/"):
+                feed = self.path.split("/")[2]
+                # Voci dalla più recente; `extra[0]` voci aggiunte in testa
+                ids = range(n_entries + extra[0] - 1, -1, -1)
+                items = "".join(
+                    f"<item><title>Bando {feed}-{i}</title><link>http://{self.headers['Host']}/page/{feed}/{i}</link>"
+                    f"<guid>{feed}-{i}</guid><description>Estratto del bando {feed}-{i}</description></item>"
+                    for i in ids
+                )
+                body = f'<?xml version="1.0"?><rss version="2.0"><channel><title>{feed}</title>{items}</channel></rss>'
+                etag = '"' + hashlib.sha256(body.encode()).hexdigest()[:16] + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                content_type = "application/rss+xml"
+            else:
+                time.sleep(latency)
+                words = " ".join(f"parola{self.path}{i}" for i in range(200))
+                body = f"<html><body><nav>menu</nav><main><h1>{self.path}</h1><p>{words}</p></main></body></html>"
+                content_type = "text/html"
+            payload = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            if content_type == "application/rss+xml":
+                self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(payload)
+
+    return Handler
+
+
+def serial_ingest(session, feeds):
+    """Il ciclo legacy: una voce alla volta, commit per riga."""
+    import feedparser
+    saved = 0
+    for url, source_name in feeds:
+        for entry in feedparser.parse(url).entries:
+            text = fetch_detail_text(entry.link) or f"[RSS ONLY] {entry.get('description', '')}"
+            url_hash = Bando.generate_hash(entry.link)
+            if session.query(Bando).filter_by(url_hash=url_hash).first():
+                continue
+            session.add(Bando(url=entry.link, url_hash=url_hash, title=entry.title, raw_content=text,
+                              source_name=source_name, status=ProcessingStatus.NEW))
+            session.commit()
+            saved += 1
+    return saved
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--feeds", type=int, default=4)
+    parser.add_argument("--entries", type=int, default=30)
+    parser.add_argument("--latency", type=int, default=200, help="ms per pagina di dettaglio")
+    parser.add_argument("--concurrency", type=int, default=rss.DEEP_FETCH_CONCURRENCY)
+    parser.add_argument("--new", type=int, default=3, help="Voci nuove per feed nel terzo giro")
+    args = parser.parse_args()
+
+    extra = [0]
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args.entries, args.latency / 1000, extra))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    feeds = [(f"{base}/feed/f{i}", f"Feed {i}") for i in range(args.feeds)]
+    total = args.feeds * args.entries
+
+    session = init_db()
+    t0 = time.perf_counter()
+    serial = serial_ingest(session, feeds)
+    t_serial = time.perf_counter() - t0
+    session.query(Bando).delete()
+    session.commit()
+
+    t0 = time.perf_counter()
+    concurrent = rss.run_rss_ingestion(feeds, concurrency=args.concurrency)
+    t_concurrent = time.perf_counter() - t0
+    QUERIES[0] = 0
+    t0 = time.perf_counter()
+    again = rss.run_rss_ingestion(feeds, concurrency=args.concurrency)
+    t_again = time.perf_counter() - t0
+    again_queries = QUERIES[0]
+
+    extra[0] = args.new
+    t0 = time.perf_counter()
+    fresh = rss.run_rss_ingestion(feeds, concurrency=args.concurrency)
+    t_fresh = time.perf_counter() - t0
+    server.shutdown()
+
+    print()
+    print(f"Voci: {total} ({args.feeds} feed x {args.entries}), latenza pagina {args.latency} ms")
+    print(f"Seriale (legacy):       {serial:4} salvati in {t_serial:6.2f}s")
+    print(f"Concorrente (x{args.concurrency:<2}):      {concurrent:4} salvati in {t_concurrent:6.2f}s ({t_serial / t_concurrent:.1f}x)")
+    print(f"Feed invariati (304):   {again:4} salvati in {t_again:6.2f}s, {again_queries} query SQL")
+    print(f"+{args.new} voci per feed:       {fresh:4} salvati in {t_fresh:6.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark: latenza della ricerca semantica (HNSW su memmap).
+
+Costruisce un SemanticIndex temporaneo con N vettori casuali normalizzati e
+misura p50/p95 di `search` su query casuali, più la recall@k rispetto alla
+ricerca esatta. Con --model misura anche l'embedding della query con il
+modello locale (richiede sentence-transformers e il modello in cache).
+
+Usage:
+    python scripts/benchmarks/bench_semantic.py --rows 20000
+    python scripts/benchmarks/bench_semantic.py --rows 20000 --model
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+root_path = Path(__file__).parent.parent.parent
+sys.path.append(str(root_path))
+
+from src.search.semantic import SemanticIndex, Embedder, EMBEDDING_MODEL
+
+QUERIES = [
+    "finanziamenti per capannoni", "contributi a fondo perduto per startup",
+    "bandi per la digitalizzazione delle PMI", "credito d'imposta ricerca e sviluppo",
+    "agevolazioni per giovani imprenditori in Lombardia", "efficienza energetica imprese",
+]
+
+
+def normalized(vectors):
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def clustered(rng, centers, n):
+    """Vettori raggruppati per "tema" come gli embedding reali (quelli uniformi sono il caso peggiore per HNSW)."""
+    picks = rng.integers(0, len(centers), n)
+    noise = rng.standard_normal((n, centers.shape[1])).astype(np.float32) * 0.06
+    return normalized(centers[picks] + noise)
+
+
+def percentile_ms(samples, p):
+    return float(np.percentile(samples, p)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--model", action="store_true", help="Includi l'embedding della query")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    centers = normalized(rng.standard_normal((200, args.dim)).astype(np.float32))
+    vectors = clustered(rng, centers, args.rows)
+    ids = list(range(1, args.rows + 1))
+
+    index = SemanticIndex(Path(tempfile.mkdtemp()), EMBEDDING_MODEL, args.dim)
+    t0 = time.perf_counter()
+    for start in range(0, args.rows, 5000):
+        index.upsert(ids[start:start + 5000], vectors[start:start + 5000], ["-"] * len(ids[start:start + 5000]))
+    index.save()
+    print(f"Build:        {args.rows} vettori in {time.perf_counter() - t0:.2f}s")
+
+    queries = clustered(rng, centers, args.queries)
+    timings, recall = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        hits = index.search(q, args.k)
+        timings.append(time.perf_counter() - t0)
+        exact = set(np.argsort(-(vectors @ q))[:args.k] + 1)
+        recall.append(len(exact & {bando_id for bando_id, _ in hits}) / args.k)
+
+    print(f"ANN search:   p50 {percentile_ms(timings, 50):.2f}ms  p95 {percentile_ms(timings, 95):.2f}ms")
+    print(f"Recall@{args.k}:    {np.mean(recall):.3f}")
+
+    if args.model:
+        embedder = Embedder()
+        embedder.encode(["warmup"])
+        timings = []
+        for i in range(args.queries // 10):
+            text = f"{QUERIES[i % len(QUERIES)]} {i}"  # niente cache: query sempre diverse
+            t0 = time.perf_counter()
+            index.search(embedder.encode_query(text)[:args.dim], args.k)
+            timings.append(time.perf_counter() - t0)
+        print(f"Query+embed:  p50 {percentile_ms(timings, 50):.2f}ms  p95 {percentile_ms(timings, 95):.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Load test: scaling delle read API con la concorrenza, a worker fisso.
+
+Avvia uvicorn con un solo worker sul DB configurato (DATABASE_URL), oppure
+usa un server già avviato (--url), e per ogni livello di concorrenza invia
+richieste per `--duration` secondi da N client httpx concorrenti.
+Riporta throughput, p50/p95 e errori.
+
+Con le route sync il throughput smette di crescere quando le richieste in
+volo superano il threadpool di uvicorn (40 thread) e la latenza cresce in
+coda; con le route async le query restano sull'event loop.
+
+Usage:
+    python scripts/benchmarks/load_test_api.py --levels 1,8,32,128 --duration 10
+    python scripts/benchmarks/load_test_api.py --url http://localhost:8000 --path "/bandi?fields=card&size=12"
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+root_path = Path(__file__).parent.parent.parent
+
+DEFAULT_PATHS = [
+    "/bandi?size=20",
+    "/bandi?size=12&fields=card",
+    "/bandi?size=20&regione=Lombardia",
+    "/regioni",
+]
+
+
+async def client_loop(client: httpx.AsyncClient, paths, deadline: float, latencies: list, errors: list):
+    i = 0
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        t0 = time.perf_counter()
+        try:
+            resp = await client.get(path)
+            if resp.status_code >= 400:
+                errors.append(resp.status_code)
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+        latencies.append(time.perf_counter() - t0)
+
+
+async def run_level(url: str, paths, concurrency: int, duration: float):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        latencies, errors = [], []
+        deadline = time.perf_counter() + duration
+        t0 = time.perf_counter()
+        await asyncio.gather(*(client_loop(client, paths, deadline, latencies, errors) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - t0
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+    print(f"{concurrency:>6} {len(latencies) / elapsed:>10.1f} {statistics.median(latencies) * 1000:>9.1f} "
+          f"{p95 * 1000:>9.1f} {len(errors):>7}")
+
+
+def start_server(port: int):
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.api.main:app", "--port", str(port), "--workers", "1", "--log-level", "warning"],
+        cwd=root_path, env=os.environ.copy(),
+    )
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            httpx.get(url + "/", timeout=1)
+            return proc, url
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("uvicorn did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="Server già avviato (default: avvia uvicorn con 1 worker)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--path", action="append", help="Endpoint da colpire (ripetibile)")
+    parser.add_argument("--levels", default="1,8,32,128")
+    parser.add_argument("--duration", type=float, default=10)
+    args = parser.parse_args()
+
+    proc, url = (None, args.url) if args.url else start_server(args.port)
+    paths = args.path or DEFAULT_PATHS
+    try:
+        print(f"Target: {url}  paths: {', '.join(paths)}")
+        print(f"{'conc':>6} {'req/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'errors':>7}")
+        for level in (int(n) for n in args.levels.split(",")):
+            asyncio.run(run_level(url, paths, level, args.duration))
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,54 +1,314 @@
+"""
+export_json.py - Static JSON Shards for the Frontend
+====================================================
+Esporta l'intero catalogo (bandi analizzati, senza near-duplicate) in file
+JSON statici per il sito Next.js (output: 'export').
+
+    frontend/public/data/
+      manifest.json                      versione, conteggi, elenco shard (cache breve)
+      index/page-0001.<hash>.json        indice paginato (record compatti per GrantCard)
+      regions/<slug>/page-0001.<hash>.json   stessa paginazione per regione
+      grants/<id>.<hash>.json            dettaglio completo di un bando
+      grants.<hash>.json                 id -> file di dettaglio (usato in build)
+
+    data/export/.export-state.json       stato per l'export incrementale, fuori da
+                                         public/: contiene i record e i watermark interni
+
+- JSON compatto (nessuna indentazione), ogni file anche precompresso
+  .gz e .br (brotli se installato) per il web server / CDN
+- Il nome dei file contiene l'hash del contenuto: i CDN possono
+  servirli con Cache-Control immutable, cambia solo manifest.json
+- Le pagine sono ordinate come l'API (attivi prima, poi più recenti), sulle
+  stesse colonne expired / opens_on (backfill e refresh nel job expire):
+  `active_total` nel manifest permette al frontend di filtrare
+  Attivi / Scaduti caricando solo le pagine necessarie
+
+Export incrementale:
+- lo stato salva, per ogni bando, il record card già esportato e il
+  watermark `updated_at` dell'ultimo export
+- solo i bandi con updated_at successivo (o nuovi) vengono riletti dal DB
+  e riscritti; le pagine con lo stesso contenuto hanno lo stesso nome e
+  non vengono toccate
+- ogni file è scritto su un temporaneo + rename, manifest.json per ultimo;
+  i file non più referenziati vengono cancellati all'export successivo
+  (una generazione di grazia per i client con il manifest precedente)
+
+Usage:
+    python scripts/export_json.py [--page-size 12] [--full] [--state data/export/.export-state.json]
+"""
+
+import argparse
+import gzip
+import hashlib
 import json
-import sqlite3
 import os
+import re
+import sys
+import time
+from datetime import datetime
 from pathlib import Path
 
+try:
+    import brotli
+except ImportError:  # precompressione .br opzionale
+    brotli = None
+
 # Paths
 BASE_DIR = Path(__file__).parent.parent
-DB_PATH = BASE_DIR / "data" / "db" / "bandi.db"
-OUTPUT_PATH = BASE_DIR / "frontend" / "public" / "bandi.json"
-
-def export_to_json():
-    print(f"Reading from database: {DB_PATH}")
-    if not DB_PATH.exists():
-        print("❌ Database not found!")
-        return
-
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-
-    # Query all processed bandi
-    cursor.execute("""
-        SELECT id, url, title, ai_analysis, marketing_text, status, ingested_at
-        FROM bandi
-        WHERE status IN ('ANALYZED', 'MATCHED', 'analyzed', 'matched')
-        ORDER BY ingested_at DESC
-        LIMIT 200
-    """)
-    
-    rows = cursor.fetchall()
-    bandi = []
-    
-    for row in rows:
-        bando = dict(row)
-        
-        # Parse JSON fields
-        if bando['ai_analysis']:
+sys.path.append(str(BASE_DIR))
+OUTPUT_DIR = BASE_DIR / "frontend" / "public" / "data"
+# Lo stato non va pubblicato: resta fuori dall'artifact del sito
+STATE_PATH = BASE_DIR / "data" / "export" / ".export-state.json"
+
+from src.scraper.models import Bando, ProcessingStatus, init_db, load_analysis
+from src.api.schemas import CARD_ANALYSIS_FIELDS
+from src.utils.regions import NAZIONALE, extract_regions
+
+PAGE_SIZE = 12  # stesso page size del catalogo (3x4)
+STATE_FILE = ".export-state.json"
+STATE_VERSION = 1
+# Quality 11 costa ~10x più tempo di 9 per pochi punti percentuali su JSON piccoli
+BROTLI_QUALITY = 9
+
+
+def compact_json(data) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def content_hash(payload: bytes) -> str:
+    return hashlib.sha256(payload).hexdigest()[:12]
+
+
+def region_slug(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+
+
+def atomic_write(path: Path, payload: bytes):
+    """Temporaneo + rename: un lettore vede il file vecchio o quello nuovo, mai a metà."""
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(payload)
+    os.replace(tmp, path)
+
+
+def variants(rel: str):
+    """Il file e le sue versioni precompresse."""
+    yield rel
+    yield rel + ".gz"
+    yield rel + ".br"
+
+
+class ShardWriter:
+    """Scrive shard con nome content-hashed sotto root; tiene il conto dei file scritti."""
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.written = 0
+
+    def write(self, prefix: str, data) -> str:
+        """Scrive `<prefix>.<hash>.json` (+ .gz / .br) se non esiste già. Ritorna il path relativo."""
+        payload = compact_json(data)
+        rel = f"{prefix}.{content_hash(payload)}.json"
+        path = self.root / rel
+        if path.exists():
+            return rel  # stesso contenuto già scritto
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # mtime=0: a parità di contenuto anche il .gz è identico byte per byte
+        atomic_write(path.with_name(path.name + ".gz"), gzip.compress(payload, compresslevel=9, mtime=0))
+        if brotli is not None:
+            atomic_write(path.with_name(path.name + ".br"), brotli.compress(payload, quality=BROTLI_QUALITY))
+        atomic_write(path, payload)
+        self.written += 1
+        return rel
+
+
+def load_state(path: Path, output_dir: Path) -> dict:
+    legacy = output_dir / STATE_FILE
+    if legacy.exists():
+        # Stato scritto dalle versioni precedenti dentro public/: spostato fuori
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(legacy, path)
+        else:
+            legacy.unlink()
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except json.JSONDecodeError:
+        return {}
+
+
+def grant_detail(bando: Bando, analysis: dict) -> dict:
+    return {
+        "id": bando.id,
+        "url": bando.url,
+        "title": bando.title,
+        "source_name": bando.source_name,
+        "status": bando.status.value if bando.status else None,
+        "ingested_at": bando.ingested_at,
+        "ai_analysis": analysis,
+        "marketing_text": bando.marketing_text,
+        "raw_content": bando.raw_content,
+    }
+
+
+def grant_card(bando: Bando, analysis: dict, detail_file: str) -> dict:
+    return {
+        "id": bando.id,
+        "title": bando.title,
+        "source_name": bando.source_name,
+        "marketing_text": bando.marketing_text,
+        "ai_analysis": {k: analysis[k] for k in CARD_ANALYSIS_FIELDS if k in analysis},
+        "detail": detail_file,
+    }
+
+
+def scan_catalog(session, state: dict):
+    """
+    Scansione leggera (id, updated_at, expired) dei bandi pubblicabili, già
+    nell'ordine dell'API: colonne indicizzate expired / opens_on (vedi
+    _sort_expressions in src/api/main.py), nessuna data JSON confrontata qui.
+    Ritorna ([(id, expired)] ordinati, id da riesportare, nuovo watermark).
+    """
+    watermark = state.get("watermark")
+    exported = state.get("grants", {})
+
+    order, changed = [], []
+    new_watermark = watermark
+    rows = (
+        session.query(Bando.id, Bando.updated_at, Bando.expired)
+        .filter(Bando.status.in_([ProcessingStatus.ANALYZED, ProcessingStatus.MATCHED]))
+        .filter(Bando.canonical_id.is_(None))
+        .order_by(Bando.expired.asc(), Bando.opens_on.desc(), Bando.id.desc())
+    )
+    for bando_id, updated_at, expired in rows:
+        order.append((bando_id, bool(expired)))
+        updated = updated_at.isoformat() if updated_at else None
+        if updated and (new_watermark is None or updated > new_watermark):
+            new_watermark = updated
+        # >=: righe scritte nello stesso istante del watermark ma dopo l'export precedente
+        if str(bando_id) not in exported or (updated and (watermark is None or updated >= watermark)):
+            changed.append(bando_id)
+    return order, changed, new_watermark
+
+
+def export_to_json(output_dir: Path = OUTPUT_DIR, page_size: int = PAGE_SIZE, full: bool = False,
+                   state_path: Path = STATE_PATH):
+    print("=" * 70)
+    print("📦 STATIC EXPORT - JSON shards per il frontend")
+    print("=" * 70)
+    t0 = time.perf_counter()
+
+    session = init_db()
+    output_dir.mkdir(parents=True, exist_ok=True)
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+    previous = load_state(state_path, output_dir)
+    # Formato o paginazione cambiati: export completo (i vecchi file vengono comunque ripuliti)
+    reusable = previous.get("version") == STATE_VERSION and previous.get("page_size") == page_size
+    state = previous if reusable and not full else {}
+    writer = ShardWriter(output_dir)
+
+    # 1. Cosa è cambiato dall'ultimo export
+    order, changed, watermark = scan_catalog(session, state)
+    entries = dict(state.get("grants", {}))
+    eligible_keys = {str(bando_id) for bando_id, _ in order}
+    removed = [bando_id for bando_id in entries if bando_id not in eligible_keys]
+    for bando_id in removed:
+        del entries[bando_id]
+
+    # 2. Dettaglio + card solo per i bandi nuovi o modificati
+    for start in range(0, len(changed), 500):
+        for bando in session.query(Bando).filter(Bando.id.in_(changed[start:start + 500])):
+            analysis = load_analysis(bando.ai_analysis)
+            detail_file = writer.write(f"grants/{bando.id}", grant_detail(bando, analysis))
+            entries[str(bando.id)] = {"card": grant_card(bando, analysis, detail_file)}
+
+    # 3. Pagine (ordine e attivi / scaduti da scan_catalog): si riscrivono solo quelle il cui contenuto cambia
+    cards = [(entries[str(bando_id)]["card"], expired) for bando_id, expired in order]
+    by_region = {}
+    for card, expired in cards:
+        for region in extract_regions(card["ai_analysis"]) or {NAZIONALE}:
+            by_region.setdefault(region, []).append((card, expired))
+
+    def slice_entry(prefix, items):
+        pages = [
+            writer.write(f"{prefix}/page-{n + 1:04d}", [card for card, _ in items[start:start + page_size]])
+            for n, start in enumerate(range(0, len(items), page_size))
+        ]
+        return {
+            "total": len(items),
+            "active_total": sum(1 for _, expired in items if not expired),
+            "pages": pages,
+        }
+
+    grants_map = {bando_id: entries[bando_id]["card"]["detail"] for bando_id in sorted(entries, key=int)}
+    index = slice_entry("index", cards)
+    regions = {
+        region: {"slug": region_slug(region), **slice_entry(f"regions/{region_slug(region)}", items)}
+        for region, items in sorted(by_region.items())
+    }
+    grants_file = writer.write("grants", grants_map)
+
+    live = set(grants_map.values()) | set(index["pages"]) | {grants_file}
+    for entry in regions.values():
+        live.update(entry["pages"])
+
+    manifest = {
+        "version": content_hash(compact_json(sorted(live))),
+        "generated_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "page_size": page_size,
+        "index": index,
+        "regions": regions,
+        "grants": grants_file,
+    }
+
+    # 4. Pubblicazione: manifest per ultimo (rename atomico), solo se qualcosa è cambiato
+    if manifest["version"] != state.get("manifest_version") or not (output_dir / "manifest.json").exists():
+        atomic_write(output_dir / "manifest.json", compact_json(manifest))
+
+    # 5. Pulizia: cancella i file usciti dal manifest già all'export precedente
+    deleted = 0
+    for rel in previous.get("retired", []):
+        if rel in live:
+            continue
+        for variant in variants(rel):
             try:
-                bando['ai_analysis'] = json.loads(bando['ai_analysis'])
-            except:
-                bando['ai_analysis'] = {}
-        
-        bandi.append(bando)
-        
-    conn.close()
-    
-    # Save to JSON
-    with open(OUTPUT_PATH, 'w', encoding='utf-8') as f:
-        json.dump(bandi, f, indent=2, ensure_ascii=False)
-        
-    print(f"✅ Exported {len(bandi)} bandi to {OUTPUT_PATH}")
+                (output_dir / variant).unlink()
+                deleted += 1
+            except FileNotFoundError:
+                pass
+    retired = sorted(set(previous.get("live", [])) - live)
+
+    atomic_write(state_path, compact_json({
+        "version": STATE_VERSION,
+        "page_size": page_size,
+        "watermark": watermark,
+        "manifest_version": manifest["version"],
+        "grants": entries,
+        "live": sorted(live),
+        "retired": retired,
+    }))
+
+    elapsed = time.perf_counter() - t0
+    print(f"   ✅ Bandi esportati:  {len(cards)}")
+    print(f"   🔄 Riesportati:      {len(changed)} (rimossi: {len(removed)})")
+    print(f"   📝 File scritti:     {writer.written}")
+    print(f"   🗑️ File cancellati:  {deleted}")
+    print(f"   ⏱️ Tempo:            {elapsed * 1000:.0f} ms")
+    print(f"   📁 Output:           {output_dir}")
+    if brotli is None:
+        print("   ⚠️ brotli non installato: solo precompressione .gz")
+    return {"manifest": manifest, "changed": len(changed), "removed": len(removed),
+            "written": writer.written, "deleted": deleted, "elapsed": elapsed}
+
 
 if __name__ == "__main__":
-    export_to_json()
+    parser = argparse.ArgumentParser(description="Export static JSON shards for the frontend catalog")
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    parser.add_argument("--output", type=Path, default=OUTPUT_DIR)
+    parser.add_argument("--full", action="store_true", help="Ignora lo stato e riesporta tutto")
+    parser.add_argument("--state", type=Path, default=STATE_PATH, help="File di stato (fuori dalla cartella pubblicata)")
+    args = parser.parse_args()
+
+    export_to_json(output_dir=args.output, page_size=args.page_size, full=args.full, state_path=args.state)
@@ -3,6 +3,9 @@ Background Worker - AlSolved Band
 Questo script orchestra il ciclo continuo di:
 1. Ingestion (Scarico nuovi bandi)
 2. Analisi AI (Processamento con Ollama)
+
+DEPRECATO: sostituito da src/scheduler (python scripts/manage.py scheduler),
+un job indipendente per fonte / fase con intervallo proprio.
 """
 
 import time
@@ -9,7 +9,7 @@ sys.path.append(str(root_path))
 def main():
     if len(sys.argv) < 2:
         print("Usage: python scripts/manage.py [command]")
-        print("Commands: fetch, enrich, analyze, api")
+        print("Commands: fetch, rss, enrich, analyze, marketing, match-batch, index, dedup, expire, sources, scheduler, enqueue, worker, queue, api")
         sys.exit(1)
     
     command = sys.argv[1]
@@ -30,6 +30,16 @@ def main():
             
         run_bulk_import(dry_run=dry_run, limit=limit)
         
+    elif command == "rss":
+        from src.scraper.rss import run_rss_ingestion, DEEP_FETCH_CONCURRENCY
+        concurrency = DEEP_FETCH_CONCURRENCY
+        if "--concurrency" in args:
+            try:
+                idx = args.index("--concurrency")
+                concurrency = int(args[idx+1])
+            except: pass
+        run_rss_ingestion(concurrency=concurrency, dry_run="--dry-run" in args)
+        
     elif command == "enrich":
         from src.scraper.enricher import run_enrichment
         dry_run = "--dry-run" in args
@@ -43,7 +53,143 @@ def main():
                 idx = args.index("--limit")
                 limit = int(args[idx+1])
             except: pass
-        run_v2_analysis(limit=limit)
+        force = "--force" in args
+        run_v2_analysis(limit=limit, force=force)
+        
+    elif command == "marketing":
+        from src.analysis.marketing import run_marketing_generation, run_marketing_generation_batch
+        limit = None
+        if "--limit" in args:
+            try:
+                idx = args.index("--limit")
+                limit = int(args[idx+1])
+            except: pass
+        dry_run = "--dry-run" in args
+        force = "--force" in args
+        if "--batch" in args:
+            run_marketing_generation_batch(limit=limit, dry_run=dry_run, force=force)
+        else:
+            run_marketing_generation(limit=limit, dry_run=dry_run, force=force)
+        
+    elif command == "match-batch":
+        from src.matching.batch import run_batch_matching
+        if not args or args[0].startswith("--"):
+            print("Usage: python scripts/manage.py match-batch <companies.csv|.jsonl> [--top-k N] [--workers N] [--include-expired] [--dry-run]")
+            sys.exit(1)
+        top_k = 10
+        workers = None
+        if "--top-k" in args:
+            try:
+                idx = args.index("--top-k")
+                top_k = int(args[idx+1])
+            except: pass
+        if "--workers" in args:
+            try:
+                idx = args.index("--workers")
+                workers = int(args[idx+1])
+            except: pass
+        run_batch_matching(args[0], top_k=top_k, workers=workers,
+                           include_expired="--include-expired" in args, dry_run="--dry-run" in args)
+        
+    elif command == "index":
+        from src.search.semantic import run_index_sync
+        run_index_sync()
+        
+    elif command == "dedup":
+        from src.scraper.dedup import run_dedup
+        run_dedup()
+        
+    elif command == "expire":
+        # Nightly: 0 1 * * * python scripts/manage.py expire
+        from src.scraper.expiry import run_expiry_refresh
+        run_expiry_refresh(full="--full" in args)
+        
+    elif command == "sources":
+        import logging
+        from src.scraper.registry import print_sources, run_sources
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        if "--run" in args:
+            names = None
+            idx = args.index("--run")
+            if idx + 1 < len(args) and not args[idx+1].startswith("--"):
+                names = args[idx+1].split(",")
+            max_parallel = None
+            if "--parallel" in args:
+                try:
+                    idx = args.index("--parallel")
+                    max_parallel = int(args[idx+1])
+                except: pass
+            run_sources(names, max_parallel=max_parallel)
+        else:
+            print_sources()
+        
+    elif command == "scheduler":
+        import logging
+        from src.scheduler import service
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        if "--history" in args:
+            limit = 30
+            if "--limit" in args:
+                try:
+                    idx = args.index("--limit")
+                    limit = int(args[idx+1])
+                except: pass
+            service.print_history(limit=limit)
+        elif "--run" in args:
+            idx = args.index("--run")
+            if idx + 1 >= len(args):
+                print("Usage: python scripts/manage.py scheduler --run <job>")
+                sys.exit(1)
+            service.run_job_now(args[idx+1])
+        else:
+            service.run_scheduler()
+        
+    elif command == "enqueue":
+        from src.scheduler.tasks import PRODUCERS
+        from src.scraper.models import init_db
+        if not args or args[0].startswith("--") or args[0] not in list(PRODUCERS) + ["all"]:
+            print(f"Usage: python scripts/manage.py enqueue <{'|'.join(PRODUCERS)}|all> [--batch-size N] [--priority P] [--force]")
+            sys.exit(1)
+        kwargs = {}
+        for flag, name in (("--batch-size", "batch_size"), ("--priority", "priority")):
+            if flag in args:
+                try:
+                    idx = args.index(flag)
+                    kwargs[name] = int(args[idx+1])
+                except: pass
+        session = init_db()
+        for task in (PRODUCERS if args[0] == "all" else [args[0]]):
+            task_kwargs = dict(kwargs)
+            if task == "export":
+                task_kwargs.pop("batch_size", None)
+                task_kwargs["full"] = "--full" in args
+            elif task == "analyze":
+                task_kwargs["force"] = "--force" in args
+            print(f"📥 {task}: {PRODUCERS[task](session, **task_kwargs)} job accodati")
+        
+    elif command == "worker":
+        from src.scheduler.worker import run_workers
+        concurrency = 1
+        tasks = None
+        if "--concurrency" in args:
+            try:
+                idx = args.index("--concurrency")
+                concurrency = int(args[idx+1])
+            except: pass
+        if "--tasks" in args:
+            try:
+                idx = args.index("--tasks")
+                tasks = [t for t in args[idx+1].split(",") if t]
+            except: pass
+        run_workers(concurrency=concurrency, tasks=tasks, burst="--burst" in args)
+        
+    elif command == "queue":
+        from src.scheduler.worker import print_queue_stats
+        if "--purge" in args:
+            from src.scheduler.queue import purge_finished
+            from src.scraper.models import init_db
+            print(f"🗑️ {purge_finished(init_db())} job conclusi rimossi")
+        print_queue_stats()
         
     elif command == "api":
         import uvicorn
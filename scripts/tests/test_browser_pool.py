@@ -0,0 +1,144 @@
+"""
+Test del pool di browser headless (src/scraper/browser.py) sul sito statico
+in scripts/tests/fixtures/catalogo, servito in locale:
+
+1. elenco: banner cookie chiuso dal locator handler, "MOSTRA ALTRI INCENTIVI"
+   cliccato finché ci sono card -> 18 card
+2. intercettazione: nessuna immagine / font arriva al server, analytics bloccati
+3. dettagli in parallelo: testo renderizzato da JS per tutte le schede,
+   tempo con 4 contesti vs 1
+4. connettore html-browser: 18 bandi salvati, al secondo giro nessuna
+   scheda riaperta; una scheda che non si apre non finisce nel task
+   fetch-detail (requests non renderizza JavaScript)
+5. elenco non raggiungibile: scrape_listing ritorna None, nessuna eccezione
+
+Richiede Playwright e Chromium (pip install playwright && playwright install chromium).
+
+Usage:
+    python scripts/tests/test_browser_pool.py [--size 4]
+"""
+
+import argparse
+import asyncio
+import functools
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import replace
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+root_path = Path(__file__).parent.parent.parent
+sys.path.append(str(root_path))
+
+# DB temporaneo: va impostato prima di importare i modelli
+os.environ["DATABASE_URL"] = f"sqlite:///{Path(tempfile.mkdtemp()) / 'test_browser.db'}"
+
+from src.scraper.browser import BrowserPool, fetch_texts, scrape_listing  # noqa: E402
+from src.scraper.detail import needs_detail_filter  # noqa: E402
+from src.scraper.models import Bando, get_engine, get_session  # noqa: E402
+from src.scraper.registry import Source, _selector_parser, run_html_browser  # noqa: E402
+
+FIXTURES = Path(__file__).parent / "fixtures" / "catalogo"
+EXPECTED_CARDS = 18
+PARSER = {"item": ".view-content .card", "link": "h3 a", "title": "h3", "summary": ".card-text"}
+
+REQUESTS = []
+
+
+class FixtureHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        REQUESTS.append(self.path)
+        super().do_GET()
+
+
+def check(label: str, ok: bool, detail: str = "") -> bool:
+    print(f"{'✅' if ok else '❌'} {label}{f' ({detail})' if detail else ''}")
+    return ok
+
+
+async def listing_and_details(base: str, size: int):
+    async with BrowserPool(size=size) as pool:
+        html = await scrape_listing(pool, f"{base}/index.html", PARSER["item"],
+                                    load_more="#load-more", cookie="RIFIUTO")
+        items = _selector_parser(PARSER)(html or "", f"{base}/index.html")
+        t0 = time.perf_counter()
+        texts = await fetch_texts(pool, [item["url"] for item in items], content="#contenuto", ready="#contenuto .testo")
+        return items, texts, time.perf_counter() - t0, dict(pool.stats)
+
+
+async def unreachable_listing():
+    async with BrowserPool(size=1) as pool:
+        return await scrape_listing(pool, "http://127.0.0.1:1/index.html", PARSER["item"])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=4, help="Contesti del pool")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    handler = functools.partial(FixtureHandler, directory=str(FIXTURES))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    print("=" * 70)
+    print(f"🧪 BROWSER POOL - fixture su {base}")
+    print("=" * 70)
+    results = []
+    try:
+        items, texts, t_parallel, stats = asyncio.run(listing_and_details(base, args.size))
+        results.append(check("Elenco completo (cookie + load more)", len(items) == EXPECTED_CARDS,
+                             f"{len(items)}/{EXPECTED_CARDS} card"))
+        leaked = [p for p in REQUESTS if p.startswith(("/img/", "/fonts/"))]
+        results.append(check("Immagini e font bloccati", not leaked and stats["blocked"] > 0,
+                             f"{stats['blocked']}/{stats['requests']} richieste bloccate, {len(leaked)} arrivate al server"))
+        rendered = [url for url, text in texts.items() if text and "Scheda completa" in text]
+        results.append(check("Dettagli renderizzati", len(rendered) == len(items), f"{len(rendered)}/{len(items)}"))
+
+        _, _, t_serial, _ = asyncio.run(listing_and_details(base, 1))
+        print(f"   ⏱️ Dettagli: {t_parallel:.2f}s con {args.size} contesti, {t_serial:.2f}s con 1 "
+              f"({t_serial / t_parallel:.1f}x)")
+
+        source = Source(
+            name="fixture", type="html-browser", source_name="Fixture", rate_limit=None, concurrency=args.size,
+            options={"url": f"{base}/index.html", "load_more": "#load-more", "cookie": "RIFIUTO",
+                     "content": "#contenuto", "ready": "#contenuto .testo", "parser": PARSER},
+        )
+        saved = run_html_browser(source)
+        results.append(check("Connettore html-browser", saved == EXPECTED_CARDS, f"{saved} bandi salvati"))
+        REQUESTS.clear()
+        saved = run_html_browser(source)
+        reopened = [p for p in REQUESTS if p.startswith("/dettaglio.html")]
+        results.append(check("Secondo giro: nessuna scheda riaperta", saved == 0 and not reopened,
+                             f"{saved} salvati, {len(reopened)} schede richieste"))
+
+        # Schede che non arrivano mai a `ready`: salvate "[RSS ONLY]" ma non da riprovare con requests
+        session = get_session(get_engine())
+        session.query(Bando).delete()
+        session.commit()
+        broken = replace(source, options={**source.options, "ready": "#mai-presente"})
+        saved = run_html_browser(broken)
+        queued = session.query(Bando).filter(needs_detail_filter()).count()
+        session.close()
+        results.append(check("Dettaglio fallito: niente fetch-detail", saved == EXPECTED_CARDS and queued == 0,
+                             f"{saved} salvati, {queued} in coda per fetch-detail"))
+
+        results.append(check("Elenco non raggiungibile: None", asyncio.run(unreachable_listing()) is None))
+    finally:
+        server.shutdown()
+
+    print("-" * 70)
+    print(f"{sum(results)}/{len(results)} ok")
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Tabella di casi per il normalizzatore delle scadenze (src/utils/deadlines.py).
+Il backfill riscrive expires_on / deadline_status di tutta la tabella da
+questo parser: ogni formato visto nelle fonti ha qui il suo caso.
+
+Usage:
+    python scripts/tests/test_deadlines.py
+"""
+
+import sys
+from datetime import date, datetime, timezone
+from pathlib import Path
+
+root_path = Path(__file__).parent.parent.parent
+sys.path.append(str(root_path))
+
+from src.utils.deadlines import DeadlineStatus, extract_deadline, normalize_date  # noqa: E402
+
+DATED, SPORTELLO, UNKNOWN = DeadlineStatus.DATED, DeadlineStatus.SPORTELLO, DeadlineStatus.UNKNOWN
+
+# valore -> (data attesa, stato atteso)
+CASES = [
+    # Solr: UTC, mezzanotte italiana = 23:00 / 22:00 UTC del giorno prima
+    ("2025-03-14T23:00:00Z", date(2025, 3, 15), DATED),
+    ("2025-07-14T22:00:00Z", date(2025, 7, 15), DATED),
+    ("2025-03-14T10:00:00+01:00", date(2025, 3, 14), DATED),
+    # Open Data / LLM
+    ("31/12/2025", date(2025, 12, 31), DATED),
+    ("2025-12-31", date(2025, 12, 31), DATED),
+    ("16 Gennaio 2026", date(2026, 1, 16), DATED),
+    ("1° marzo 2025", date(2025, 3, 1), DATED),
+    ("31.12.2025", date(2025, 12, 31), DATED),
+    # Legacy: frase di chiusura
+    ("entro il 30 giugno 2025 ore 12:00", date(2025, 6, 30), DATED),
+    ("entro le ore 12:00 del 30 giugno 2025", date(2025, 6, 30), DATED),
+    ("Scadenza: 15/09/2025", date(2025, 9, 15), DATED),
+    # Intervallo: la scadenza è la fine
+    ("dal 01/02/2025 al 31/12/2025", date(2025, 12, 31), DATED),
+    ("Domande dal 1 marzo 2025 al 30 aprile 2025", date(2025, 4, 30), DATED),
+    # Solo data di apertura: nessuna scadenza
+    ("Domande dal 1 marzo 2025", None, UNKNOWN),
+    ("a partire dal 10/01/2025", None, UNKNOWN),
+    # A sportello: la data di apertura non è una scadenza
+    ("A sportello", None, SPORTELLO),
+    ("Fino ad esaurimento fondi", None, SPORTELLO),
+    ("Domande dal 1 marzo 2025 fino ad esaurimento fondi", None, SPORTELLO),
+    ("A sportello dal 15/01/2025", None, SPORTELLO),
+    # ...salvo una chiusura esplicita
+    ("A sportello dal 1 marzo 2025 al 31 dicembre 2025", date(2025, 12, 31), DATED),
+    ("Fino a esaurimento fondi e comunque entro il 31/12/2025", date(2025, 12, 31), DATED),
+    ("Sportello aperto fino al 30/06/2026", date(2026, 6, 30), DATED),
+    # Sconosciuta
+    ("N/A", None, UNKNOWN),
+    ("n.d.", None, UNKNOWN),
+    ("", None, UNKNOWN),
+    ("Non specificata", None, UNKNOWN),
+    ("31/02/2025", None, UNKNOWN),
+    ("vedi bando", None, UNKNOWN),
+    (None, None, UNKNOWN),
+    # Tipi non stringa
+    (date(2025, 5, 1), date(2025, 5, 1), DATED),
+    (datetime(2025, 3, 14, 23, 0, tzinfo=timezone.utc), date(2025, 3, 15), DATED),
+]
+
+# ai_analysis -> (data attesa, stato atteso): priorità tra le chiavi
+ANALYSIS_CASES = [
+    ({"scadenza": "2025-12-31", "close_date": "2025-06-30T22:00:00Z"}, date(2025, 12, 31), DATED),
+    ({"scadenza": "N/A", "close_date": "2025-06-30T22:00:00Z"}, date(2025, 7, 1), DATED),
+    ({"scadenza": "A sportello", "Data_Chiusura": "31/12/2025"}, date(2025, 12, 31), DATED),
+    ({"scadenza": "N/A", "scadenza_descrizione": "fino a esaurimento fondi"}, None, SPORTELLO),
+    ({"scadenza_descrizione": "dal 1 marzo 2025 fino a esaurimento fondi"}, None, SPORTELLO),
+    ({}, None, UNKNOWN),
+]
+
+
+def main():
+    failures = 0
+    for value, expected_date, expected_status in CASES:
+        got = normalize_date(value)
+        if got != (expected_date, expected_status):
+            failures += 1
+            print(f"❌ normalize_date({value!r}) = {got}, atteso {(expected_date, expected_status)}")
+    for analysis, expected_date, expected_status in ANALYSIS_CASES:
+        got = extract_deadline(analysis)
+        if got != (expected_date, expected_status):
+            failures += 1
+            print(f"❌ extract_deadline({analysis!r}) = {got}, atteso {(expected_date, expected_status)}")
+
+    total = len(CASES) + len(ANALYSIS_CASES)
+    print(f"{'✅' if not failures else '❌'} {total - failures}/{total} casi ok")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
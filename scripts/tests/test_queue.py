@@ -0,0 +1,211 @@
+"""
+Test della coda su DB (src/scheduler/queue.py) su un SQLite temporaneo.
+I tempi (lease, backoff) sono spostati con UPDATE diretti: nessuna attesa.
+
+1. enqueue con chiave: nessun duplicato finché il job è in coda / in esecuzione
+2. claim: priorità poi FIFO, filtro per task, lease per task (timeouts)
+3. fail -> rimesso in coda con backoff -> ... -> failed a max_attempts
+4. requeue_expired: lease scaduto torna in coda (o failed a tentativi finiti)
+5. fencing: complete / fail del worker che ha perso il lease non valgono
+6. claim concorrenti da più thread: ogni job preso una volta sola
+
+Usage:
+    python scripts/tests/test_queue.py
+"""
+
+import os
+import sys
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+
+root_path = Path(__file__).parent.parent.parent
+sys.path.append(str(root_path))
+
+# DB temporaneo: va impostato prima di importare i modelli
+os.environ["DATABASE_URL"] = f"sqlite:///{Path(tempfile.mkdtemp()) / 'test_queue.db'}"
+
+from src.scheduler import queue  # noqa: E402
+from src.scheduler.queue import DONE, FAILED, QUEUED, RUNNING  # noqa: E402
+from src.scraper.models import Job, get_engine, get_session, init_db  # noqa: E402
+
+RESULTS = []
+
+
+def check(label: str, ok: bool, detail: str = ""):
+    RESULTS.append(ok)
+    print(f"{'✅' if ok else '❌'} {label}{f' ({detail})' if detail else ''}")
+
+
+def reset(session):
+    session.query(Job).delete()
+    session.commit()
+    session.expunge_all()
+
+
+def make_available(session, job_id: int):
+    """Salta il backoff: il job è subito prendibile."""
+    session.query(Job).filter(Job.id == job_id).update({Job.available_at: datetime.utcnow() - timedelta(seconds=1)})
+    session.commit()
+
+
+def expire_lease(session, job_id: int):
+    session.query(Job).filter(Job.id == job_id).update({Job.locked_until: datetime.utcnow() - timedelta(seconds=1)})
+    session.commit()
+
+
+def job(session, job_id: int) -> Job:
+    return session.get(Job, job_id, populate_existing=True)
+
+
+def check_dedup_key(session):
+    first = queue.enqueue(session, "export", key="export")
+    second = queue.enqueue(session, "export", key="export")
+    session.commit()
+    check("Chiave: secondo enqueue ignorato", first is not None and second is None)
+
+    claimed = queue.claim(session, "w1")
+    check("Chiave: ignorato anche con il job in esecuzione", queue.enqueue(session, "export", key="export") is None)
+    queue.complete(session, claimed["id"], "w1")
+    again = queue.enqueue(session, "export", key="export")
+    session.commit()
+    check("Chiave: nuovo job dopo il completamento", again is not None)
+    reset(session)
+
+
+def check_claim_order_and_leases(session):
+    low = queue.enqueue(session, "analyze", priority=0).id
+    high_a = queue.enqueue(session, "fetch-detail", priority=20).id
+    high_b = queue.enqueue(session, "fetch-detail", priority=20).id
+    later = queue.enqueue(session, "fetch-detail", priority=50, delay=3600).id
+    session.commit()
+
+    order = [queue.claim(session, "w1")["id"] for _ in range(3)]
+    check("Claim: priorità poi FIFO, job ritardati esclusi", order == [high_a, high_b, low],
+          f"{order}, ritardato {later}")
+    check("Claim: coda vuota -> None", queue.claim(session, "w1") is None)
+    reset(session)
+
+    a = queue.enqueue(session, "fetch-detail").id
+    b = queue.enqueue(session, "analyze").id
+    session.commit()
+    check("Claim: filtro per task", queue.claim(session, "w1", tasks=["analyze"])["id"] == b)
+    reset(session)
+
+    a = queue.enqueue(session, "fetch-detail").id
+    b = queue.enqueue(session, "analyze").id
+    session.commit()
+    now = datetime.utcnow()
+    for _ in range(2):
+        queue.claim(session, "w1", timeouts={"fetch-detail": 900}, visibility_timeout=60)
+    lease_a = (job(session, a).locked_until - now).total_seconds()
+    lease_b = (job(session, b).locked_until - now).total_seconds()
+    check("Claim: lease dal timeout del task", 895 <= lease_a <= 905 and 55 <= lease_b <= 65,
+          f"fetch-detail {lease_a:.0f}s, analyze {lease_b:.0f}s (default 60s)")
+    reset(session)
+
+
+def check_fail_retry_failed(session):
+    job_id = queue.enqueue(session, "analyze", max_attempts=3).id
+    session.commit()
+    statuses, delays = [], []
+    for attempt in range(1, 4):
+        claimed = queue.claim(session, "w1")
+        if claimed is None or claimed["attempts"] != attempt:
+            check(f"Retry: claim al tentativo {attempt}", False, str(claimed))
+            return
+        t0 = datetime.utcnow()
+        statuses.append(queue.fail(session, job_id, "w1", f"errore {attempt}"))
+        current = job(session, job_id)
+        if current.status == QUEUED:
+            delays.append(round((current.available_at - t0).total_seconds()))
+            check(f"Retry: backoff rispettato al tentativo {attempt}", queue.claim(session, "w2") is None)
+            make_available(session, job_id)
+
+    current = job(session, job_id)
+    check("Retry: queued, queued, failed", statuses == [QUEUED, QUEUED, FAILED], str(statuses))
+    check("Retry: backoff esponenziale", delays == [queue.retry_delay(1), queue.retry_delay(2)], f"{delays}s")
+    check("Retry: failed con ultimo errore e finished_at",
+          current.status == FAILED and current.last_error == "errore 3" and current.finished_at is not None)
+    reset(session)
+
+
+def check_requeue_and_fencing(session):
+    job_id = queue.enqueue(session, "fetch-detail", max_attempts=2).id
+    session.commit()
+    queue.claim(session, "w1")
+    expire_lease(session, job_id)
+    requeued = queue.requeue_expired(session)
+    current = job(session, job_id)
+    check("Lease scaduto: rimesso in coda", requeued == 1 and current.status == QUEUED and current.locked_by is None)
+
+    check("Fencing: complete del worker senza lease rifiutato", not queue.complete(session, job_id, "w1"))
+    claimed = queue.claim(session, "w2")
+    check("Fencing: complete del vecchio worker non tocca il nuovo claim",
+          not queue.complete(session, job_id, "w1") and job(session, job_id).status == RUNNING)
+    check("Fencing: fail del vecchio worker ignorato", queue.fail(session, job_id, "w1", "tardi") is None
+          and job(session, job_id).status == RUNNING)
+    check("Fencing: complete del worker con il lease", claimed["attempts"] == 2 and queue.complete(session, job_id, "w2")
+          and job(session, job_id).status == DONE)
+    check("Lease non scaduto: requeue_expired non lo tocca", queue.requeue_expired(session) == 0)
+    reset(session)
+
+    job_id = queue.enqueue(session, "fetch-detail", max_attempts=1).id
+    session.commit()
+    queue.claim(session, "w1")
+    expire_lease(session, job_id)
+    queue.requeue_expired(session)
+    current = job(session, job_id)
+    check("Lease scaduto all'ultimo tentativo: failed", current.status == FAILED and current.finished_at is not None)
+    reset(session)
+
+
+def check_concurrent_claims(session, jobs: int = 60, workers: int = 4):
+    for _ in range(jobs):
+        queue.enqueue(session, "analyze")
+    session.commit()
+    claimed, lock = [], threading.Lock()
+    engine = get_engine()
+
+    def work(worker_id: str):
+        local = get_session(engine)
+        try:
+            while True:
+                item = queue.claim(local, worker_id)
+                if item is None:
+                    return
+                with lock:
+                    claimed.append(item["id"])
+                queue.complete(local, item["id"], worker_id)
+        finally:
+            local.close()
+
+    threads = [threading.Thread(target=work, args=(f"w{i}",)) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    done = session.query(Job).filter(Job.status == DONE).count()
+    check("Claim concorrenti: ogni job preso una volta", len(claimed) == len(set(claimed)) == jobs and done == jobs,
+          f"{len(claimed)} claim, {len(set(claimed))} distinti, {done} done")
+    reset(session)
+
+
+def main():
+    print("=" * 70)
+    print("🧪 TASK QUEUE - claim, lease, retry, fencing")
+    print("=" * 70)
+    session = init_db()
+    check_dedup_key(session)
+    check_claim_order_and_leases(session)
+    check_fail_retry_failed(session)
+    check_requeue_and_fencing(session)
+    check_concurrent_claims(session)
+    print("-" * 70)
+    print(f"{sum(RESULTS)}/{len(RESULTS)} ok")
+    sys.exit(0 if all(RESULTS) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,8 @@
 """
 analyze_all_v2.py - Massive Clean & Re-Analyze using Gemini 1.5 Flash (SDK Version)
 ===================================================================================
-Iterates through ALL bandi in the database to clean structured data.
-Strict Rate Limiting applied to avoid 429/404 errors.
+Analyzes the bandi selected by the planner (new, changed or prompt-stale
+rows) to clean structured data. Strict Rate Limiting applied to avoid 429/404 errors.
 """
 
 import json
@@ -14,6 +14,10 @@ import warnings
 import time
 from typing import Dict, Any
 from src.scraper.models import init_db, Bando, ProcessingStatus
+from src.analysis.planner import plan_analysis, compute_input_fingerprint
+from src.analysis.validation import (
+    V2_FIELD_SPECS, parse_llm_json, validate_fields, build_repair_prompt, merge_outcome
+)
 import google.generativeai as genai
 from dotenv import load_dotenv
 
@@ -46,17 +50,14 @@ logger = logging.getLogger(__name__)
 # User requested: "gemini-1.5-flash" forced.
 CANDIDATE_MODELS = ["gemini-1.5-flash", "gemini-1.0-pro"]
 
-async def analyze_bando_v2(bando_data: Dict[str, Any], semaphore: asyncio.Semaphore) -> Dict[str, Any]:
-    """Analyzes a single bando using Gemini SDK."""
-    async with semaphore:
-        # RATE LIMIT ENFORCEMENT: 4 seconds sleep = Max 15 requests per minute
-        await asyncio.sleep(4.0)
-        
-        context = f"Titolo: {bando_data['title']}\n"
-        context += f"Descrizione: {str(bando_data['description'])[:3500]}\n"
-        context += f"HTML Content (Partial): {str(bando_data['html'])[:3500]}\n"
+# Re-ask only the invalid fields, at most this many times per grant
+MAX_REPAIR_RETRIES = 2
 
-        prompt = """
+# Bump PROMPT_VERSION whenever PROMPT_V2 changes: rows analyzed with an
+# older version are picked up again by the planner as "prompt-stale".
+PROMPT_VERSION = "v2.0"
+
+PROMPT_V2 = """
         Analizza questo bando. Estrai in formato JSON puro.
         
         INPUT:
@@ -73,8 +74,18 @@ async def analyze_bando_v2(bando_data: Dict[str, Any], semaphore: asyncio.Semaph
             "scadenza": "YYYY-MM-DD" o "N/A"
         }
         """
+
+async def analyze_bando_v2(bando_data: Dict[str, Any], semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+    """Analyzes a single bando using Gemini SDK."""
+    async with semaphore:
+        # RATE LIMIT ENFORCEMENT: 4 seconds sleep = Max 15 requests per minute
+        await asyncio.sleep(4.0)
         
-        full_prompt = prompt + "\nDATI:\n" + context
+        context = f"Titolo: {bando_data['title']}\n"
+        context += f"Descrizione: {str(bando_data['description'])[:3500]}\n"
+        context += f"HTML Content (Partial): {str(bando_data['html'])[:3500]}\n"
+
+        full_prompt = PROMPT_V2 + "\nDATI:\n" + context
         
         last_error = None
 
@@ -92,9 +103,33 @@ async def analyze_bando_v2(bando_data: Dict[str, Any], semaphore: asyncio.Semaph
                     lambda: model.generate_content(full_prompt, generation_config={"response_mime_type": "application/json"})
                 )
                 
-                # Parse JSON
-                result_json = json.loads(response.text)
-                return {"id": bando_data["id"], "success": True, "data": result_json}
+                # Parse + validate field by field
+                outcome = validate_fields(parse_llm_json(response.text))
+                if not outcome.valid:
+                    raise ValueError(f"No valid fields in response: {outcome.invalid}")
+
+                # Repair: ask again only for missing/invalid fields
+                for attempt in range(MAX_REPAIR_RETRIES):
+                    if outcome.is_complete:
+                        break
+                    asked = list(outcome.invalid)
+                    repair_prompt = build_repair_prompt(outcome.invalid, context)
+                    await asyncio.sleep(4.0) # Same rate limit as the main call
+                    try:
+                        repair_response = await loop.run_in_executor(
+                            None,
+                            lambda: model.generate_content(repair_prompt, generation_config={"response_mime_type": "application/json"})
+                        )
+                        retry = validate_fields(parse_llm_json(repair_response.text), expected=asked)
+                    except Exception as e:
+                        logger.warning(f"Repair attempt {attempt+1} failed for {bando_data['id']}: {e}")
+                        continue
+                    outcome = merge_outcome(outcome, retry, asked)
+
+                if not outcome.is_complete:
+                    logger.warning(f"Bando {bando_data['id']}: accepted partial analysis, invalid fields: {outcome.invalid}")
+
+                return {"id": bando_data["id"], "success": True, "data": outcome.valid}
                 
             except Exception as e:
                 last_error = str(e)
@@ -115,6 +150,7 @@ async def process_batch(session, bandi_batch):
     semaphore = asyncio.Semaphore(CONCURRENCY_LIMIT)
     
     batch_data = []
+    fingerprints = {}
     for b in bandi_batch:
         # Get description from existing analysis or raw content
         desc = ""
@@ -134,6 +170,8 @@ async def process_batch(session, bandi_batch):
             "description": desc,
             "html": b.raw_content or ""
         })
+        # Computed before the merge below rewrites ai_analysis
+        fingerprints[b.id] = compute_input_fingerprint(b.title, b.raw_content, b.ai_analysis)
 
     results = await asyncio.gather(*[analyze_bando_v2(b, semaphore) for b in batch_data])
     
@@ -153,41 +191,71 @@ async def process_batch(session, bandi_batch):
                     else:
                         current_analysis = dict(bando.ai_analysis)
                 
-                # Update critical fields
-                current_analysis['regions'] = data.get('regions', [])
-                current_analysis['ateco_codes'] = data.get('ateco_codes', [])
-                current_analysis['is_expired'] = data.get('is_expired', False)
-                current_analysis['search_tags'] = data.get('search_tags', [])
-                current_analysis['marketing_text'] = data.get('marketing_text', "")
-                current_analysis['sintesi'] = data.get('sintesi', current_analysis.get('sintesi', '')) 
-                if data.get('scadenza'):
-                     current_analysis['scadenza'] = data.get('scadenza')
+                # Update critical fields (only the validated ones: a partial
+                # analysis never wipes existing values with defaults)
+                for key in V2_FIELD_SPECS:
+                    if key in data and data[key] is not None:
+                        current_analysis[key] = data[key]
 
                 bando.ai_analysis = current_analysis
-                bando.marketing_text = data.get('marketing_text') 
+                bando.refresh_tier()
+                if data.get('marketing_text'):
+                    bando.marketing_text = data['marketing_text']
                 bando.status = ProcessingStatus.ANALYZED
+                bando.analysis_fingerprint = fingerprints[bando.id]
+                bando.analysis_prompt_version = PROMPT_VERSION
                 updated_count += 1
     
     session.commit()
     logger.info(f"Batch processed. Updated: {updated_count}/{len(bandi_batch)}")
+    return updated_count
+
+def analyze_ids(ids, force: bool = False) -> int:
+    """
+    Analyzes the given bandi (queue task `analyze`, see src/scheduler/tasks.py).
+    Up-to-date rows are skipped, so a retried job only redoes what is missing.
+    """
+    session = init_db()
+    try:
+        todo = plan_analysis(session, PROMPT_VERSION, force=force, ids=ids).ids
+        if not todo:
+            return 0
+        batch = session.query(Bando).filter(Bando.id.in_(todo)).order_by(Bando.id.desc()).all()
+        updated = asyncio.run(process_batch(session, batch))
+        if not updated:
+            # Quota / all models down: let the queue retry with backoff
+            raise RuntimeError(f"Analysis failed for all {len(batch)} bandi")
+        return updated
+    finally:
+        session.close()
 
-def run_v2_analysis(limit: int = 100000):
+def run_v2_analysis(limit: int = 100000, force: bool = False):
     print("Starting Gemini Flash V2 CLEANUP Analysis (SDK Version)...")
     print(f"Models: {CANDIDATE_MODELS}")
+    print(f"Prompt version: {PROMPT_VERSION}")
     session = init_db()
     
-    query = session.query(Bando).order_by(Bando.id.desc())
-    total_count = query.count()
+    total_count = session.query(Bando).count()
     print(f"Total Bandi in DB: {total_count}")
     
+    # Only new, changed or prompt-stale rows need a (paid) LLM call
+    plan = plan_analysis(session, PROMPT_VERSION, force=force)
+    print(f"Analysis plan: {plan.summary()}")
+    
+    ids = plan.ids[:limit]
+    if not ids:
+        print("Nothing to analyze. All bandi are up to date.")
+        return
+    
     BATCH_SIZE = 50 # Process limit logic chunks
-    process_limit = min(total_count, limit)
+    process_limit = len(ids)
     
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
     
     for offset in range(0, process_limit, BATCH_SIZE):
-        batch = query.offset(offset).limit(BATCH_SIZE).all()
+        batch_ids = ids[offset:offset + BATCH_SIZE]
+        batch = session.query(Bando).filter(Bando.id.in_(batch_ids)).order_by(Bando.id.desc()).all()
         if not batch: break
         
         print(f"Processing batch {offset}-{offset+len(batch)} of {process_limit}...")
@@ -197,6 +265,7 @@ if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser()
     parser.add_argument("--limit", type=int, default=100000, help="Max items to process")
+    parser.add_argument("--force", action="store_true", help="Re-analyze up-to-date rows too")
     args = parser.parse_args()
     
-    run_v2_analysis(limit=args.limit)
+    run_v2_analysis(limit=args.limit, force=args.force)
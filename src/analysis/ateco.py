@@ -0,0 +1,270 @@
+"""
+ateco.py - ATECO Hierarchy Index
+================================
+Indice a trie della classificazione ATECO 2007:
+
+    sezione (lettera) -> divisione (2 cifre) -> gruppo (56.1) -> classe (56.10)
+    -> categoria (56.10.1) -> sottocategoria (56.10.11)
+
+Il trie della gerarchia (sezioni + divisioni con nome) è costruito una volta
+all'import (`ATECO_INDEX`). Ogni nodo può anche contenere gli id dei bandi
+associati a quel codice, così lo stesso trie risponde a:
+- lookup di un codice di qualsiasi profondità (nome settore / sezione)
+- reverse lookup: tutti i bandi sotto un prefisso (`grants_under`)
+- bandi applicabili a un codice aziendale specifico (`grants_for`)
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional, Set
+
+# Sezioni ATECO: lettera -> (nome breve, prima divisione, ultima divisione)
+ATECO_SECTIONS = {
+    "A": ("Agricoltura", 1, 3),
+    "B": ("Estrazione mineraria", 5, 9),
+    "C": ("Manifattura", 10, 33),
+    "D": ("Energia", 35, 35),
+    "E": ("Ambiente e rifiuti", 36, 39),
+    "F": ("Costruzioni", 41, 43),
+    "G": ("Commercio", 45, 47),
+    "H": ("Trasporti e logistica", 49, 53),
+    "I": ("Turismo e ristorazione", 55, 56),
+    "J": ("ICT e comunicazione", 58, 63),
+    "K": ("Finanza e assicurazioni", 64, 66),
+    "L": ("Immobiliare", 68, 68),
+    "M": ("Servizi professionali", 69, 75),
+    "N": ("Servizi alle imprese", 77, 82),
+    "O": ("Pubblica amministrazione", 84, 84),
+    "P": ("Istruzione", 85, 85),
+    "Q": ("Sanità e sociale", 86, 88),
+    "R": ("Cultura, sport e tempo libero", 90, 93),
+    "S": ("Altri servizi", 94, 96),
+    "T": ("Famiglie", 97, 98),
+    "U": ("Organizzazioni extraterritoriali", 99, 99),
+}
+
+# Mapping codici ATECO (divisione, 2 cifre) -> settori leggibili
+ATECO_SECTORS = {
+    "10": "Alimentare",
+    "11": "Bevande",
+    "13": "Tessile",
+    "14": "Abbigliamento",
+    "15": "Pelletteria",
+    "16": "Legno",
+    "20": "Chimica",
+    "21": "Farmaceutica",
+    "22": "Plastica",
+    "23": "Materiali da costruzione",
+    "24": "Metallurgia",
+    "25": "Metalmeccanica",
+    "26": "Elettronica",
+    "27": "Apparecchiature elettriche",
+    "28": "Macchinari",
+    "29": "Automotive",
+    "30": "Trasporti",
+    "31": "Mobili",
+    "32": "Manifattura",
+    "41": "Edilizia",
+    "42": "Ingegneria civile",
+    "43": "Costruzioni specializzate",
+    "45": "Commercio auto",
+    "46": "Commercio ingrosso",
+    "47": "Commercio dettaglio",
+    "49": "Trasporto terrestre",
+    "50": "Trasporto marittimo",
+    "51": "Trasporto aereo",
+    "52": "Logistica",
+    "55": "Alloggio",
+    "56": "Ristorazione",
+    "58": "Editoria",
+    "59": "Audiovisivo",
+    "61": "Telecomunicazioni",
+    "62": "Software e IT",
+    "63": "Servizi informatici",
+    "64": "Servizi finanziari",
+    "68": "Immobiliare",
+    "69": "Servizi legali e contabili",
+    "70": "Consulenza aziendale",
+    "71": "Architettura e ingegneria",
+    "72": "Ricerca e sviluppo",
+    "73": "Pubblicità e marketing",
+    "74": "Design",
+    "75": "Veterinaria",
+    "77": "Noleggio",
+    "79": "Turismo",
+    "80": "Vigilanza",
+    "81": "Facility management",
+    "82": "Servizi alle imprese",
+    "85": "Istruzione",
+    "86": "Sanità",
+    "87": "Assistenza sociale",
+    "90": "Arte e spettacolo",
+    "91": "Biblioteche e musei",
+    "93": "Sport e intrattenimento",
+    "95": "Riparazioni",
+    "96": "Servizi alla persona",
+}
+
+DIVISION_TO_SECTION = {
+    f"{division:02d}": letter
+    for letter, (_, first, last) in ATECO_SECTIONS.items()
+    for division in range(first, last + 1)
+}
+
+# "56", "56.1", "56.10", "56.10.1", "56.10.11" (le date "2026-12-31" sono escluse)
+_CODE_RE = re.compile(r'(?<![\d./-])(\d{2})(?:\.(\d)(\d)?)?(?:\.(\d)(\d)?)?(?![\d/-])')
+
+
+def normalize_code(code: str) -> Optional[str]:
+    """
+    Converte un codice ATECO in cifre senza punti ("56.10.1" -> "56101")
+    oppure in una lettera di sezione ("i" -> "I"). None se non valido.
+    """
+    if code is None:
+        return None
+    code = str(code).strip().upper()
+    if code in ATECO_SECTIONS:
+        return code
+    if code.isdigit() and 2 <= len(code) <= 6:
+        # Già normalizzato ("5610")
+        return code if code[:2] in DIVISION_TO_SECTION else None
+    match = _CODE_RE.fullmatch(code)
+    if not match or match.group(1) not in DIVISION_TO_SECTION:
+        return None
+    return "".join(part for part in match.groups() if part)
+
+
+def parse_codes(value) -> List[str]:
+    """
+    Estrae i codici ATECO normalizzati da un campo libero: stringa Open Data
+    ("56.10; 62.01") o lista V2 (["56.10", "Agricoltura"]). Ordine preservato.
+    """
+    if not value:
+        return []
+    if isinstance(value, (list, tuple)):
+        value = " ".join(str(v) for v in value if v)
+
+    codes = []
+    for match in _CODE_RE.finditer(str(value)):
+        if match.group(1) not in DIVISION_TO_SECTION:
+            continue
+        code = "".join(part for part in match.groups() if part)
+        if code not in codes:
+            codes.append(code)
+    return codes
+
+
+def _path(code: str) -> List[str]:
+    """Chiavi del trie per un codice normalizzato: [sezione, divisione, cifra, cifra, ...]."""
+    if code in ATECO_SECTIONS:
+        return [code]
+    return [DIVISION_TO_SECTION[code[:2]], code[:2]] + list(code[2:])
+
+
+class AtecoNode:
+    __slots__ = ("key", "label", "children", "grant_ids", "subtree_ids")
+
+    def __init__(self, key: str = "", label: Optional[str] = None):
+        self.key = key
+        self.label = label
+        self.children: Dict[str, "AtecoNode"] = {}
+        self.grant_ids: Set[int] = set()     # bandi associati esattamente a questo codice
+        self.subtree_ids: Set[int] = set()   # bandi su questo nodo o sui discendenti
+
+
+class AtecoTrie:
+    """Trie sezione -> divisione -> gruppo -> classe -> ... con reverse index dei bandi."""
+
+    def __init__(self):
+        self.root = AtecoNode()
+        for letter, (name, _, _) in ATECO_SECTIONS.items():
+            self.root.children[letter] = AtecoNode(letter, name)
+        for division, letter in DIVISION_TO_SECTION.items():
+            self.root.children[letter].children[division] = AtecoNode(division, ATECO_SECTORS.get(division))
+
+    def insert(self, code: str, grant_id: Optional[int] = None) -> bool:
+        """Aggiunge un codice (e opzionalmente il bando associato). False se il codice non è valido."""
+        code = normalize_code(code)
+        if code is None:
+            return False
+
+        node = self.root
+        for key in _path(code):
+            node = node.children.setdefault(key, AtecoNode(key))
+            if grant_id is not None:
+                node.subtree_ids.add(grant_id)
+        if grant_id is not None:
+            node.grant_ids.add(grant_id)
+        return True
+
+    def _walk(self, code: str) -> List[AtecoNode]:
+        """Nodi esistenti lungo il percorso del codice (dal più generico)."""
+        code = normalize_code(code)
+        if code is None:
+            return []
+        nodes = []
+        node = self.root
+        for key in _path(code):
+            node = node.children.get(key)
+            if node is None:
+                break
+            nodes.append(node)
+        return nodes
+
+    def lookup(self, code: str) -> Optional[dict]:
+        """
+        Descrive un codice di qualsiasi profondità usando il nodo noto più specifico.
+        Ritorna None se il codice non è valido.
+        """
+        nodes = self._walk(code)
+        if not nodes:
+            return None
+        section = nodes[0]
+        division = nodes[1] if len(nodes) > 1 else None
+        label = next((n.label for n in reversed(nodes) if n.label), None)
+        return {
+            "code": normalize_code(code),
+            "section": section.key,
+            "section_name": section.label,
+            "division": division.key if division else None,
+            "label": label,
+        }
+
+    def sector_name(self, code: str) -> Optional[str]:
+        """Nome settore leggibile (divisione se nota, altrimenti sezione)."""
+        info = self.lookup(code)
+        return info["label"] if info else None
+
+    def grants_under(self, prefix: str) -> Set[int]:
+        """Tutti i bandi con codici sotto il prefisso (sezione, divisione, gruppo...)."""
+        code = normalize_code(prefix)
+        nodes = self._walk(prefix)
+        if code is None or len(nodes) != len(_path(code)):
+            return set()
+        return set(nodes[-1].subtree_ids)
+
+    def grants_for(self, code: str) -> Set[int]:
+        """Bandi il cui codice è il codice stesso o un suo antenato (es. bando "56" per azienda "56.10")."""
+        result: Set[int] = set()
+        for node in self._walk(code):
+            result |= node.grant_ids
+        return result
+
+    def matching_grants(self, code: str) -> Set[int]:
+        """Filtro catalogo: bandi applicabili al codice (antenati) o più specifici (discendenti)."""
+        return self.grants_for(code) | self.grants_under(code)
+
+
+# Gerarchia costruita una volta, usata per i lookup di nomi settore
+ATECO_INDEX = AtecoTrie()
+
+
+def build_grant_index(rows: Iterable) -> AtecoTrie:
+    """
+    Costruisce un trie con il reverse index dei bandi.
+    `rows` sono coppie (bando_id, ateco_codes) con ateco_codes in formato libero.
+    """
+    trie = AtecoTrie()
+    for bando_id, ateco_codes in rows:
+        for code in parse_codes(ateco_codes):
+            trie.insert(code, bando_id)
+    return trie
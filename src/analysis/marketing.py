@@ -4,14 +4,29 @@ generate_marketing.py - AI Marketing Text Generator
 Genera testi persuasivi per i bandi arricchiti.
 
 Strategia:
-- Priorità ai 120 bandi "Gold" (con ATECO codes)
+- Priorità ai bandi "Gold" (flag indicizzato has_ateco)
 - Template dinamico che evidenzia importo + settore
 - Salva in marketing_text senza toccare raw_content
+- Rigenera solo i bandi i cui input sono cambiati (marketing_fingerprint)
+
+Modalità batch (--batch):
+- Carica solo id/titolo/ai_analysis in colonne invece di oggetti ORM
+- Calcola i testi per colonne (formattazione importi vettoriale con numpy,
+  lookup ATECO precompilato e memoizzato)
+- Scrive tutti i testi con un unico bulk UPDATE
 """
 
 import json
 import logging
-from scraper.models import Bando, init_db
+import time
+from functools import lru_cache
+
+import numpy as np
+from sqlalchemy import update
+
+from src.scraper.models import Bando, init_db
+from src.utils.fingerprint import fingerprint
+from src.analysis.ateco import ATECO_INDEX, parse_codes
 
 # Setup Logging
 logging.basicConfig(
@@ -37,88 +52,51 @@ def format_currency(value):
         return None
 
 
-def extract_sector_name(ateco_codes: str) -> str:
+def extract_sector_name(ateco_codes) -> str:
     """Estrae un nome settore leggibile dai codici ATECO."""
     if not ateco_codes:
         return None
-    
-    # Mapping codici ATECO -> settori leggibili
-    ATECO_SECTORS = {
-        "10": "Alimentare",
-        "11": "Bevande",
-        "13": "Tessile",
-        "14": "Abbigliamento",
-        "15": "Pelletteria",
-        "16": "Legno",
-        "20": "Chimica",
-        "21": "Farmaceutica",
-        "22": "Plastica",
-        "23": "Materiali da costruzione",
-        "24": "Metallurgia",
-        "25": "Metalmeccanica",
-        "26": "Elettronica",
-        "27": "Apparecchiature elettriche",
-        "28": "Macchinari",
-        "29": "Automotive",
-        "30": "Trasporti",
-        "31": "Mobili",
-        "32": "Manifattura",
-        "41": "Edilizia",
-        "42": "Ingegneria civile",
-        "43": "Costruzioni specializzate",
-        "45": "Commercio auto",
-        "46": "Commercio ingrosso",
-        "47": "Commercio dettaglio",
-        "49": "Trasporto terrestre",
-        "50": "Trasporto marittimo",
-        "51": "Trasporto aereo",
-        "52": "Logistica",
-        "55": "Alloggio",
-        "56": "Ristorazione",
-        "58": "Editoria",
-        "59": "Audiovisivo",
-        "61": "Telecomunicazioni",
-        "62": "Software e IT",
-        "63": "Servizi informatici",
-        "64": "Servizi finanziari",
-        "68": "Immobiliare",
-        "69": "Servizi legali e contabili",
-        "70": "Consulenza aziendale",
-        "71": "Architettura e ingegneria",
-        "72": "Ricerca e sviluppo",
-        "73": "Pubblicità e marketing",
-        "74": "Design",
-        "75": "Veterinaria",
-        "77": "Noleggio",
-        "79": "Turismo",
-        "80": "Vigilanza",
-        "81": "Facility management",
-        "82": "Servizi alle imprese",
-        "85": "Istruzione",
-        "86": "Sanità",
-        "87": "Assistenza sociale",
-        "90": "Arte e spettacolo",
-        "91": "Biblioteche e musei",
-        "93": "Sport e intrattenimento",
-        "95": "Riparazioni",
-        "96": "Servizi alla persona",
-    }
-    
+    return _sector_name_for_codes(tuple(parse_codes(ateco_codes)))
+
+
+@lru_cache(maxsize=4096)
+def _sector_name_for_codes(codes: tuple) -> str:
+    """Lookup memoizzato: molti bandi condividono le stesse liste di codici."""
     sectors_found = []
-    codes = ateco_codes.replace(";", " ").replace(",", " ").split()
     
-    for code in codes[:3]:  # Max 3 settori
-        code_prefix = code[:2] if len(code) >= 2 else code
-        if code_prefix in ATECO_SECTORS:
-            sector = ATECO_SECTORS[code_prefix]
-            if sector not in sectors_found:
-                sectors_found.append(sector)
+    for code in codes:
+        sector = ATECO_INDEX.sector_name(code)
+        if sector and sector not in sectors_found:
+            sectors_found.append(sector)
     
     if sectors_found:
         return ", ".join(sectors_found[:2])  # Max 2 settori nel testo
     return None
 
 
+# Bump when the template below changes: every text gets regenerated
+MARKETING_TEMPLATE_VERSION = "2"
+
+# Campi di ai_analysis letti da generate_marketing_text
+MARKETING_INPUT_FIELDS = (
+    'financial_max', 'financial_min', 'forma_agevolazione', 'support_form',
+    'ateco_codes', 'close_date', 'data_chiusura', 'regione',
+)
+
+
+def marketing_input_fingerprint(analysis: dict) -> str:
+    """Fingerprint dei soli campi che influenzano il testo marketing."""
+    return fingerprint(MARKETING_TEMPLATE_VERSION, {k: analysis.get(k) for k in MARKETING_INPUT_FIELDS})
+
+
+def _gold_query(session, *entities):
+    """Bandi 'Gold' tramite il flag indicizzato (backfill in create_tables / job expire)."""
+    return session.query(*entities).filter(Bando.has_ateco.is_(True))
+
+
+MARKETING_FALLBACK = "💡 Opportunità di finanziamento per PMI - Richiedi una consulenza gratuita per verificare i requisiti"
+
+
 def generate_marketing_text(bando, analysis: dict) -> str:
     """
     Genera un testo marketing persuasivo basato sui dati disponibili.
@@ -170,10 +148,10 @@ def generate_marketing_text(bando, analysis: dict) -> str:
         return " | ".join(parts)
     else:
         # Fallback generico persuasivo
-        return "💡 Opportunità di finanziamento per PMI - Richiedi una consulenza gratuita per verificare i requisiti"
+        return MARKETING_FALLBACK
 
 
-def run_marketing_generation(limit: int = None, dry_run: bool = False):
+def run_marketing_generation(limit: int = None, dry_run: bool = False, force: bool = False):
     """
     Main function to generate marketing text for enriched bandi.
     """
@@ -184,20 +162,17 @@ def run_marketing_generation(limit: int = None, dry_run: bool = False):
     session = init_db()
     
     # Query bandi arricchiti (con ATECO codes = "Gold")
-    query = session.query(Bando).filter(
-        Bando.ai_analysis.like('%ateco%')
-    )
-    
-    if limit:
-        query = query.limit(limit)
-    
-    bandi = query.all()
-    logger.info(f"📊 Trovati {len(bandi)} bandi 'Gold' da processare")
+    # limit conta i testi rigenerati, non le righe lette: con il fingerprint
+    # un LIMIT in SQL ripescherebbe ogni volta gli stessi bandi invariati
+    bandi = _gold_query(session, Bando).order_by(Bando.id).yield_per(1000)
     
     processed = 0
     updated = 0
+    unchanged = 0
     
     for bando in bandi:
+        if limit and updated >= limit:
+            break
         try:
             # Parse ai_analysis
             analysis = {}
@@ -207,12 +182,20 @@ def run_marketing_generation(limit: int = None, dry_run: bool = False):
                 elif isinstance(bando.ai_analysis, dict):
                     analysis = bando.ai_analysis
             
+            # Skip: input invariati dall'ultima generazione
+            input_fp = marketing_input_fingerprint(analysis)
+            if not force and bando.marketing_text and bando.marketing_fingerprint == input_fp:
+                unchanged += 1
+                processed += 1
+                continue
+            
             # Generate marketing text
             marketing_text = generate_marketing_text(bando, analysis)
             
             if marketing_text:
                 if not dry_run:
                     bando.marketing_text = marketing_text
+                    bando.marketing_fingerprint = input_fp
                 
                 updated += 1
                 
@@ -236,6 +219,7 @@ def run_marketing_generation(limit: int = None, dry_run: bool = False):
     print("📊 REPORT FINALE")
     print("=" * 70)
     print(f"   📥 Bandi processati:  {processed}")
+    print(f"   ⏭️ Invariati:         {unchanged}")
     print(f"   ✅ Testi generati:    {updated}")
     print("=" * 70)
     
@@ -243,13 +227,190 @@ def run_marketing_generation(limit: int = None, dry_run: bool = False):
         print("⚠️ DRY RUN - Nessuna modifica salvata")
 
 
+# ---------------------------------------------------------------------------
+# Batch (columnar) mode
+# ---------------------------------------------------------------------------
+
+def _to_number(value) -> float:
+    if value is None:
+        return np.nan
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return np.nan
+
+
+# (soglia inferiore, divisore, formato) - stesse regole di format_currency
+_CURRENCY_TIERS = (
+    (1_000_000, 1_000_000, "%.1fM"),
+    (1_000, 1_000, "%.0fK"),
+    (-np.inf, 1, "%.0f"),
+)
+
+
+def format_currency_column(values) -> np.ndarray:
+    """Versione vettoriale di format_currency: un array di importi -> array di stringhe (o None)."""
+    nums = np.fromiter((_to_number(v) for v in values), dtype=np.float64, count=len(values))
+    out = np.full(len(nums), None, dtype=object)
+    remaining = ~np.isnan(nums)
+    
+    for threshold, divisor, fmt in _CURRENCY_TIERS:
+        mask = remaining & (nums >= threshold)
+        if mask.any():
+            out[mask] = np.char.add("€", np.char.mod(fmt, nums[mask] / divisor)).astype(object)
+        remaining &= ~mask
+    
+    return out
+
+
+@lru_cache(maxsize=256)
+def _forma_label(forma_str: str) -> str:
+    forma_lower = forma_str.lower()
+    if 'fondo' in forma_lower or 'perduto' in forma_lower:
+        return "✅ Contributo a fondo perduto"
+    if 'garanzia' in forma_lower:
+        return "🛡️ Garanzia statale inclusa"
+    if 'credito' in forma_lower or 'fisc' in forma_lower:
+        return "📊 Credito d'imposta"
+    return None
+
+
+def _forma_part(forma) -> str:
+    if isinstance(forma, list) and forma:
+        return _forma_label(forma[0] if isinstance(forma[0], str) else str(forma[0]))
+    return None
+
+
+def _close_date_part(close_date) -> str:
+    if close_date and close_date != 'N/A':
+        return f"⏰ Scadenza: {close_date[:10] if len(close_date) > 10 else close_date}"
+    return None
+
+
+def compute_marketing_texts(analyses: list) -> list:
+    """
+    Calcola i testi marketing per tutte le analisi in una volta, colonna per colonna.
+    Produce lo stesso output di generate_marketing_text riga per riga.
+    """
+    n = len(analyses)
+    if n == 0:
+        return []
+    
+    # 1. Vantaggio economico: importi formattati in un colpo solo
+    fin_max = [a.get('financial_max') for a in analyses]
+    fin_min = [a.get('financial_min') for a in analyses]
+    use_max = np.fromiter((bool(v) for v in fin_max), dtype=bool, count=n)
+    use_min = ~use_max & np.fromiter((bool(v) for v in fin_min), dtype=bool, count=n)
+    
+    amounts = format_currency_column([mx if um else mn for mx, mn, um in zip(fin_max, fin_min, use_max)])
+    has_amount = amounts != None  # noqa: E711 - elementwise on object array
+    
+    money = np.full(n, None, dtype=object)
+    for mask, prefix, suffix in ((use_max & has_amount, "💰 Ottieni fino a ", " per la tua impresa"),
+                                 (use_min & has_amount, "💰 Finanziamento a partire da ", "")):
+        if mask.any():
+            money[mask] = np.char.add(np.char.add(prefix, amounts[mask].astype(str)), suffix).astype(object)
+    
+    # 2. Forma agevolazione, 3. Settore, 4. Scadenza, 5. Regione
+    forma = [_forma_part(a.get('forma_agevolazione') or a.get('support_form', [])) for a in analyses]
+    sector = [extract_sector_name(a.get('ateco_codes', '')) for a in analyses]
+    sector = [f"🏭 Ideale per: {s}" if s else None for s in sector]
+    close = [_close_date_part(a.get('close_date') or a.get('data_chiusura')) for a in analyses]
+    regione = [a.get('regione') for a in analyses]
+    regione = [f"📍 {r}" if r and isinstance(r, str) else None for r in regione]
+    
+    texts = []
+    for row in zip(money, forma, sector, close, regione):
+        parts = [p for p in row if p]
+        texts.append(" | ".join(parts) if parts else MARKETING_FALLBACK)
+    return texts
+
+
+def run_marketing_generation_batch(limit: int = None, dry_run: bool = False, force: bool = False):
+    """
+    Come run_marketing_generation, ma colonnare: nessun oggetto ORM,
+    calcolo vettoriale e un solo bulk UPDATE finale.
+    """
+    print("=" * 70)
+    print("🎯 MARKETING TEXT GENERATOR (BATCH)")
+    print("=" * 70)
+    
+    session = init_db()
+    started = time.perf_counter()
+    
+    # limit conta i bandi da rigenerare (vedi run_marketing_generation)
+    query = _gold_query(
+        session, Bando.id, Bando.title, Bando.ai_analysis, Bando.marketing_text, Bando.marketing_fingerprint
+    ).order_by(Bando.id)
+    
+    ids, titles, analyses, input_fps = [], [], [], []
+    errors = 0
+    unchanged = 0
+    for bando_id, title, raw, current_text, stored_fp in query:
+        if limit and len(ids) >= limit:
+            break
+        try:
+            analysis = json.loads(raw) if isinstance(raw, str) else (raw or {})
+        except json.JSONDecodeError as e:
+            logger.error(f"Error processing bando {bando_id}: {e}")
+            errors += 1
+            continue
+        analysis = analysis if isinstance(analysis, dict) else {}
+        input_fp = marketing_input_fingerprint(analysis)
+        if not force and current_text and stored_fp == input_fp:
+            unchanged += 1
+            continue
+        ids.append(bando_id)
+        titles.append(title or "")
+        analyses.append(analysis)
+        input_fps.append(input_fp)
+    
+    logger.info(f"📊 Trovati {len(ids)} bandi 'Gold' da processare ({unchanged} invariati)")
+    
+    texts = compute_marketing_texts(analyses)
+    
+    for i, (title, text) in enumerate(zip(titles[:5], texts[:5]), start=1):
+        print(f"\n📝 [{i}] {title[:50]}...")
+        print(f"   ➡️ {text}")
+    
+    if not dry_run and ids:
+        session.execute(
+            update(Bando),
+            [{"id": bando_id, "marketing_text": text, "marketing_fingerprint": input_fp}
+             for bando_id, text, input_fp in zip(ids, texts, input_fps)]
+        )
+        session.commit()
+        logger.info("💾 Modifiche salvate nel database (bulk update)")
+    
+    elapsed = time.perf_counter() - started
+    
+    print("\n" + "=" * 70)
+    print("📊 REPORT FINALE")
+    print("=" * 70)
+    print(f"   📥 Bandi processati:  {len(ids) + unchanged + errors}")
+    print(f"   ⏭️ Invariati:         {unchanged}")
+    print(f"   ✅ Testi generati:    {len(texts)}")
+    print(f"   ⏱️ Tempo totale:      {elapsed:.3f}s")
+    print("=" * 70)
+    
+    if dry_run:
+        print("⚠️ DRY RUN - Nessuna modifica salvata")
+    
+    return dict(zip(ids, texts))
+
+
 if __name__ == "__main__":
     import argparse
     
     parser = argparse.ArgumentParser(description="Genera testi marketing per bandi")
-    parser.add_argument("--limit", type=int, help="Limita numero di bandi")
+    parser.add_argument("--limit", type=int, help="Limita numero di bandi rigenerati")
     parser.add_argument("--dry-run", action="store_true", help="Non salvare modifiche")
+    parser.add_argument("--batch", action="store_true", help="Modalità colonnare con bulk update")
+    parser.add_argument("--force", action="store_true", help="Rigenera anche i testi con input invariati")
     
     args = parser.parse_args()
     
-    run_marketing_generation(limit=args.limit, dry_run=args.dry_run)
+    if args.batch:
+        run_marketing_generation_batch(limit=args.limit, dry_run=args.dry_run, force=args.force)
+    else:
+        run_marketing_generation(limit=args.limit, dry_run=args.dry_run, force=args.force)
@@ -0,0 +1,97 @@
+"""
+planner.py - Analysis Work Planner
+==================================
+Decide quali bandi devono (ri)passare dall'analisi AI.
+
+Ogni analisi riuscita salva su `Bando`:
+- analysis_fingerprint: SHA256 dell'input fornito all'analyzer
+- analysis_prompt_version: versione del prompt usato
+
+Un bando va rianalizzato solo se:
+- new:          non è mai stato analizzato (nessun fingerprint)
+- changed:      l'input (titolo / contenuto / descrizione sorgente) è cambiato
+- prompt_stale: è stato analizzato con una versione precedente del prompt
+
+I near-duplicate (`canonical_id` valorizzato, vedi src/scraper/dedup.py)
+non vengono mai analizzati: l'analisi è quella del bando canonico.
+"""
+
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional
+
+from src.scraper.models import Bando, load_analysis
+from src.utils.fingerprint import fingerprint
+
+
+def compute_input_fingerprint(title, raw_content, ai_analysis) -> str:
+    """
+    Fingerprint dell'input dell'analyzer.
+    Include solo i campi sorgente: `sintesi` è scritta dall'analyzer stesso,
+    includerla invaliderebbe il fingerprint a ogni run.
+    """
+    analysis = load_analysis(ai_analysis)
+    return fingerprint(title or "", raw_content or "", analysis.get('body') or "")
+
+
+@dataclass
+class AnalysisPlan:
+    new: List[int] = field(default_factory=list)
+    changed: List[int] = field(default_factory=list)
+    prompt_stale: List[int] = field(default_factory=list)
+    forced: List[int] = field(default_factory=list)
+    up_to_date: int = 0
+    duplicates: int = 0
+
+    @property
+    def ids(self) -> List[int]:
+        """Ids to process, newest first (same order as the old full scan)."""
+        return sorted(self.new + self.changed + self.prompt_stale + self.forced, reverse=True)
+
+    @property
+    def total(self) -> int:
+        return len(self.new) + len(self.changed) + len(self.prompt_stale) + len(self.forced)
+
+    def summary(self) -> str:
+        return (f"{self.total} to analyze "
+                f"(new: {len(self.new)}, changed: {len(self.changed)}, "
+                f"prompt-stale: {len(self.prompt_stale)}, forced: {len(self.forced)}, "
+                f"up-to-date: {self.up_to_date}, near-duplicates: {self.duplicates})")
+
+
+def plan_analysis(session, prompt_version: str, force: bool = False, ids: Optional[Iterable[int]] = None) -> AnalysisPlan:
+    """
+    Seleziona i bandi da analizzare confrontando il fingerprint salvato
+    con quello dell'input corrente. Carica solo le colonne necessarie.
+    Con force=True anche i bandi aggiornati vengono rianalizzati.
+    Con `ids` il piano è limitato a quei bandi (task della coda).
+    """
+    plan = AnalysisPlan()
+
+    rows = session.query(
+        Bando.id,
+        Bando.title,
+        Bando.raw_content,
+        Bando.ai_analysis,
+        Bando.analysis_fingerprint,
+        Bando.analysis_prompt_version,
+        Bando.canonical_id,
+    )
+    if ids is not None:
+        rows = rows.filter(Bando.id.in_(list(ids)))
+    rows = rows.yield_per(500)
+
+    for bando_id, title, raw_content, ai_analysis, stored_fp, stored_version, canonical_id in rows:
+        if canonical_id:
+            plan.duplicates += 1
+        elif not stored_fp:
+            plan.new.append(bando_id)
+        elif compute_input_fingerprint(title, raw_content, ai_analysis) != stored_fp:
+            plan.changed.append(bando_id)
+        elif stored_version != prompt_version:
+            plan.prompt_stale.append(bando_id)
+        elif force:
+            plan.forced.append(bando_id)
+        else:
+            plan.up_to_date += 1
+
+    return plan
@@ -0,0 +1,169 @@
+"""
+validation.py - Structured Output Validation for LLM Responses
+==============================================================
+Stadio di validazione tra la risposta del modello e il database.
+
+1. Parsing: estrae il primo oggetto JSON bilanciato dalla risposta
+   (niente regex greedy: gestisce testo prima/dopo e blocchi ```json).
+2. Repair locale: corregge gli errori più comuni senza chiamare l'LLM
+   (virgolette tipografiche, virgole finali, letterali Python).
+3. Validazione per campo con `AnalysisV2Schema`: i campi validi vengono
+   accettati, quelli mancanti o invalidi vengono riportati a parte.
+4. Repair prompt: richiede al modello SOLO i campi invalidi.
+"""
+
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from pydantic import ValidationError
+
+from src.api.schemas import AnalysisV2Schema
+
+# Campi attesi dal prompt V2, con la specifica mostrata al modello
+V2_FIELD_SPECS = {
+    "regions": '["Lombardia", "Lazio"] o ["Nazionale"]',
+    "ateco_codes": '["56.10", "Agricoltura"] (o [])',
+    "is_expired": "true/false (True se la data di scadenza nel testo è passata)",
+    "marketing_text": '"Riassunto persuasivo di 2 righe (Vantaggio + Call to Action). Usa emoji."',
+    "search_tags": '["Start-up", "Fondo Perduto", "Giovani"]',
+    "sintesi": '"Breve descrizione max 40 parole"',
+    "scadenza": '"YYYY-MM-DD" o "N/A"',
+}
+
+_SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "„": '"', "‘": "'", "’": "'"})
+_TRAILING_COMMA = re.compile(r',\s*([}\]])')
+_PY_LITERALS = re.compile(r'(?<=[:\[,\s])(True|False|None)(?=\s*[,}\]])')
+_PY_TO_JSON = {"True": "true", "False": "false", "None": "null"}
+
+
+@dataclass
+class ValidationOutcome:
+    valid: Dict[str, Any] = field(default_factory=dict)
+    invalid: Dict[str, str] = field(default_factory=dict)  # field -> reason
+
+    @property
+    def is_complete(self) -> bool:
+        return not self.invalid
+
+
+def extract_json_object(text: str) -> Optional[str]:
+    """
+    Ritorna il primo oggetto JSON bilanciato nel testo.
+    Le graffe dentro le stringhe non vengono contate.
+    """
+    start = text.find('{')
+    if start == -1:
+        return None
+
+    depth = 0
+    in_string = False
+    escaped = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == '{':
+            depth += 1
+        elif ch == '}':
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+
+    # Risposta troncata: ritorna quanto c'è, il repair proverà a chiuderla
+    return text[start:]
+
+
+def repair_json(text: str) -> str:
+    """Correzioni locali economiche per JSON quasi valido."""
+    text = text.translate(_SMART_QUOTES)
+    text = _TRAILING_COMMA.sub(r'\1', text)
+    text = _PY_LITERALS.sub(lambda m: _PY_TO_JSON[m.group(1)], text)
+
+    # Chiude strutture lasciate aperte da una risposta troncata
+    if text.count('"') % 2 == 1:
+        text += '"'
+    missing_brackets = max(text.count('[') - text.count(']'), 0)
+    missing_braces = max(text.count('{') - text.count('}'), 0)
+    if missing_brackets or missing_braces:
+        text = text.rstrip().rstrip(',') + ']' * missing_brackets + '}' * missing_braces
+    return text
+
+
+def parse_llm_json(response_text: str) -> Optional[Dict[str, Any]]:
+    """Parsing tollerante della risposta del modello. None se irrecuperabile."""
+    if not response_text:
+        return None
+
+    try:
+        data = json.loads(response_text)
+        return data if isinstance(data, dict) else None
+    except json.JSONDecodeError:
+        pass
+
+    block = extract_json_object(response_text)
+    if block is None:
+        return None
+
+    for candidate in (block, repair_json(block)):
+        try:
+            data = json.loads(candidate)
+            return data if isinstance(data, dict) else None
+        except json.JSONDecodeError:
+            continue
+    return None
+
+
+def validate_fields(data: Optional[Dict[str, Any]], expected=V2_FIELD_SPECS) -> ValidationOutcome:
+    """
+    Valida ogni campo atteso singolarmente: un campo errato non invalida
+    il resto della risposta. I campi non attesi vengono ignorati.
+    """
+    outcome = ValidationOutcome()
+    data = data or {}
+
+    for name in expected:
+        if name not in data:
+            outcome.invalid[name] = "missing"
+            continue
+        try:
+            model = AnalysisV2Schema.model_validate({name: data[name]})
+        except ValidationError as e:
+            outcome.invalid[name] = e.errors()[0].get('msg', 'invalid')
+            continue
+        outcome.valid[name] = getattr(model, name)
+
+    return outcome
+
+
+def build_repair_prompt(invalid: Dict[str, str], context: str) -> str:
+    """Prompt ridotto che chiede al modello solo i campi da correggere."""
+    lines = [f'    "{name}": {V2_FIELD_SPECS.get(name, "...")}' for name in invalid]
+    problems = "\n".join(f"- {name}: {reason}" for name, reason in invalid.items())
+    return (
+        "Analizza questo bando. Estrai in formato JSON puro SOLO questi campi.\n\n"
+        "PROBLEMI NELLA RISPOSTA PRECEDENTE:\n"
+        f"{problems}\n\n"
+        "OUTPUT OBBLIGATORIO (JSON):\n"
+        "{\n" + ",\n".join(lines) + "\n}\n"
+        "\nDATI:\n" + context
+    )
+
+
+def merge_outcome(outcome: ValidationOutcome, retry: ValidationOutcome, asked: List[str]) -> ValidationOutcome:
+    """Unisce il risultato di un repair: aggiorna solo i campi richiesti."""
+    for name in asked:
+        if name in retry.valid:
+            outcome.valid[name] = retry.valid[name]
+            outcome.invalid.pop(name, None)
+        else:
+            outcome.invalid[name] = retry.invalid.get(name, outcome.invalid.get(name, "invalid"))
+    return outcome
@@ -0,0 +1,139 @@
+"""
+detail_cache.py - Cache of serialized grant details (GET /bandi/{id})
+=====================================================================
+Le pagine di dettaglio sono gli URL più condivisi: il body JSON già
+serializzato viene tenuto in cache per id, insieme alla versione della riga.
+
+- Invalidazione per versione: la chiave è l'id, il valore porta con sé
+  `updated_at` (la stessa versione dell'ETag). Una scrittura da fetcher /
+  enricher / analyzer aggiorna updated_at e la copia in cache non viene
+  più servita, anche se la scrittura avviene in un altro processo
+- LRU + TTL in-process (default) oppure backend condiviso Redis-compatibile
+  (Redis, Valkey, KeyDB...) con DETAIL_CACHE_URL=redis://... per più worker.
+  Il backend condiviso richiede `pip install redis`
+- Statistiche hit / miss / hit ratio esposte da GET /metrics/cache
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # backend condiviso opzionale
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+DETAIL_CACHE_SIZE = int(os.getenv("DETAIL_CACHE_SIZE", "2000"))
+DETAIL_CACHE_TTL = int(os.getenv("DETAIL_CACHE_TTL", "600"))
+DETAIL_CACHE_URL = os.getenv("DETAIL_CACHE_URL")
+
+
+class LRUTTLCache:
+    """Dizionario LRU con scadenza per elemento, thread-safe."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DetailCache:
+    """
+    Body serializzati per id, validi solo per la versione con cui sono stati
+    salvati. Tutti i metodi sono async per il backend Redis; quello locale
+    non fa I/O.
+    """
+
+    KEY_PREFIX = "bandi:detail:"
+
+    def __init__(self, maxsize: int = DETAIL_CACHE_SIZE, ttl: int = DETAIL_CACHE_TTL, url: Optional[str] = DETAIL_CACHE_URL):
+        self.ttl = ttl
+        self.local = LRUTTLCache(maxsize, ttl)
+        self.shared = None
+        if url:
+            if aioredis is None:
+                logger.warning("DETAIL_CACHE_URL impostato ma redis non è installato: uso la cache in-process")
+            else:
+                self.shared = aioredis.from_url(url)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _version(version) -> bytes:
+        return "|".join(str(part) for part in version).encode("utf-8")
+
+    async def get(self, bando_id: int, version) -> Optional[bytes]:
+        """Body in cache se salvato con la stessa versione, altrimenti None (miss)."""
+        if self.shared is not None:
+            stored = await self.shared.get(f"{self.KEY_PREFIX}{bando_id}")
+            stored_version, _, body = (stored or b"").partition(b"\n")
+        else:
+            stored_version, body = self.local.get(bando_id) or (None, None)
+
+        if body and stored_version == self._version(version):
+            self.hits += 1
+            return body
+        self.misses += 1
+        return None
+
+    async def put(self, bando_id: int, version, body: bytes):
+        if self.shared is not None:
+            # La politica LRU lato server è maxmemory-policy allkeys-lru
+            await self.shared.set(f"{self.KEY_PREFIX}{bando_id}", self._version(version) + b"\n" + body, ex=self.ttl)
+        else:
+            self.local.set(bando_id, (self._version(version), body))
+
+    async def invalidate(self, bando_id: int):
+        if self.shared is not None:
+            await self.shared.delete(f"{self.KEY_PREFIX}{bando_id}")
+        self.local.delete(bando_id)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": "redis" if self.shared is not None else "memory",
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "size": len(self.local) if self.shared is None else None,
+            "evictions": self.local.evictions if self.shared is None else None,
+            "ttl": self.ttl,
+        }
+
+    async def close(self):
+        if self.shared is not None:
+            await self.shared.aclose() if hasattr(self.shared, "aclose") else await self.shared.close()
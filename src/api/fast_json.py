@@ -0,0 +1,87 @@
+"""
+fast_json.py - Fast JSON responses for trusted DB rows
+======================================================
+Il percorso standard di FastAPI valida ogni elemento con Pydantic
+(response_model) e poi serializza con json della stdlib. Per le righe
+lette dal DB la validazione non aggiunge nulla: qui le colonne diventano
+dict e vengono codificate direttamente.
+
+- orjson se installato (datetime, enum e ai_analysis annidati in C),
+  altrimenti json della stdlib con lo stesso formato compatto
+- Output identico a quello di BandoResponse (stessi campi, stesse date ISO)
+"""
+
+import enum
+import json
+from datetime import date, datetime
+from typing import Iterable, Optional, Tuple
+
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:  # fallback: stdlib json
+    orjson = None
+
+from src.api.schemas import BandoResponse, CARD_FIELDS, CARD_ANALYSIS_FIELDS
+from src.scraper.models import load_analysis
+
+FULL_FIELDS = tuple(BandoResponse.model_fields)
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(data) -> bytes:
+    if orjson is not None:
+        try:
+            return orjson.dumps(data)
+        except TypeError:
+            pass  # es. interi oltre 64 bit dentro ai_analysis
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def bando_rows(bandi: Iterable, columns: Optional[Tuple[str, ...]] = None) -> list:
+    """
+    Dict dei campi selezionati (tutti quelli di BandoResponse se None).
+    La vista card riduce ai_analysis a CARD_ANALYSIS_FIELDS.
+    """
+    columns = columns or FULL_FIELDS
+    rows = []
+    for bando in bandi:
+        row = {name: getattr(bando, name) for name in columns}
+        if columns is CARD_FIELDS and bando.ai_analysis:
+            analysis = load_analysis(bando.ai_analysis)
+            row["ai_analysis"] = {k: analysis[k] for k in CARD_ANALYSIS_FIELDS if k in analysis}
+        rows.append(row)
+    return rows
+
+
+def json_response(content, template: Optional[Response] = None) -> Response:
+    """
+    Risposta già codificata (`content` può essere anche un body già
+    serializzato, es. dalla cache). Restituire una Response salta la validazione
+    di response_model, quindi gli header impostati sul parametro `response`
+    dell'endpoint (ETag, Server-Timing, ...) vanno copiati qui.
+    """
+    if isinstance(content, bytes):
+        response = Response(content, media_type=FastJSONResponse.media_type)
+    else:
+        response = FastJSONResponse(content)
+    if template is not None:
+        for key, value in template.headers.items():
+            if key != "content-length":
+                response.headers[key] = value
+    return response
@@ -0,0 +1,96 @@
+"""
+http_cache.py - Conditional GET for the read endpoints
+======================================================
+- ETag forte derivato dalla versione dei dati (catalogo o singola riga),
+  non dal body: il controllo If-None-Match avviene prima di interrogare e
+  serializzare, un 304 costa una query leggera
+- Una variante per codifica: la risposta effettivamente compressa dal
+  GZipMiddleware (dipende dalla dimensione del body, non solo da
+  Accept-Encoding) riceve il suffisso -gzip da ETagVariantMiddleware;
+  gli stessi byte non compressi hanno sempre lo stesso ETag
+- Cache-Control per endpoint: i browser e il reverse proxy riusano la copia
+  per max-age secondi, poi rivalidano con If-None-Match
+"""
+
+import hashlib
+from typing import Optional
+
+from fastapi import Request, Response
+from starlette.datastructures import MutableHeaders
+
+# Cambia quando cambia la forma delle risposte: invalida tutti gli ETag emessi
+SCHEMA_VERSION = "1"
+
+LIST_CACHE = "public, max-age=60"
+DETAIL_CACHE = "public, max-age=300"
+REGIONS_CACHE = "public, max-age=3600"
+
+GZIP_SUFFIX = "-gzip"
+
+
+def make_etag(request: Request, *parts) -> str:
+    """ETag forte della rappresentazione non compressa: versione dei dati + query string."""
+    query = sorted(request.query_params.multi_items())
+    key = "|".join(str(part) for part in (SCHEMA_VERSION, request.url.path, query, *parts))
+    return '"' + hashlib.sha256(key.encode("utf-8")).hexdigest()[:20] + '"'
+
+
+def _matched_tag(if_none_match: str, etag: str) -> Optional[str]:
+    """
+    Il tag di If-None-Match che corrisponde a `etag` (anche nella variante
+    -gzip: stesso contenuto, altra codifica), None se nessuno.
+    """
+    if if_none_match.strip() == "*":
+        return etag
+    for tag in (tag.strip() for tag in if_none_match.split(",")):
+        # If-None-Match usa il confronto debole: W/"x" equivale a "x"
+        strong = tag[2:] if tag.startswith("W/") else tag
+        if strong in (etag, gzip_etag(etag)):
+            return strong
+    return None
+
+
+def gzip_etag(etag: str) -> str:
+    return etag[:-1] + GZIP_SUFFIX + '"'
+
+
+
+def revalidate(request: Request, response: Response, etag: str, cache_control: str) -> Optional[Response]:
+    """
+    Imposta ETag / Cache-Control sulla risposta. Se il client ha già questa
+    versione ritorna la risposta 304 da restituire subito, altrimenti None.
+    """
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if_none_match = request.headers.get("if-none-match")
+    matched = _matched_tag(if_none_match, etag) if if_none_match else None
+    if matched:
+        # Il 304 non passa dal GZipMiddleware (body vuoto): Vary va messo qui.
+        # ETag = la variante che il client ha in cache
+        return Response(status_code=304, headers={**headers, "ETag": matched, "Vary": "Accept-Encoding"})
+    response.headers.update(headers)
+    return None
+
+
+class ETagVariantMiddleware:
+    """
+    ASGI middleware esterno al GZipMiddleware: se il body è uscito compresso
+    l'ETag diventa la variante -gzip, altrimenti resta quello di make_etag.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_variant(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                etag = headers.get("etag")
+                if etag and etag.endswith('"') and headers.get("content-encoding") == "gzip":
+                    headers["etag"] = gzip_etag(etag)
+            await send(message)
+
+        await self.app(scope, receive, send_with_variant)
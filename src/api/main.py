@@ -1,15 +1,53 @@
-from fastapi import FastAPI, Depends, HTTPException, Query
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import date
+
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi.middleware.gzip import GZipMiddleware
+from sqlalchemy import or_, func, case, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session, load_only
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional, Tuple
+
+from src.scraper.models import get_engine, get_async_engine, get_session, Bando, ProcessingStatus, load_analysis
+from src.api.schemas import BandoResponse, BandoListItem, CompanyProfile, MatchResult, CARD_FIELDS
+from src.api.fast_json import bando_rows, dumps, json_response
+from src.api.detail_cache import DetailCache
+from src.api.http_cache import DETAIL_CACHE, LIST_CACHE, REGIONS_CACHE, ETagVariantMiddleware, make_etag, revalidate
+from src.analysis.ateco import build_grant_index, normalize_code
+from src.utils.regions import REGIONI_ITALIANE, NAZIONALE, extract_regions
+from src.matching.engine import MatchIndex
+from src.search.semantic import SemanticSearcher
+from src.search.hybrid import CANDIDATES_PER_RETRIEVER, SEMANTIC_MIN_SIMILARITY, StageTimer, boost, reciprocal_rank_fusion
+
+logger = logging.getLogger(__name__)
 
-from src.scraper.models import get_engine, get_session, Bando, ProcessingStatus
-from src.api.schemas import BandoResponse
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    One engine per process, shared by all requests:
+    - async engine (aiosqlite / asyncpg) for the read endpoints
+    - sync engine for /match and the in-process index builders
+    """
+    app.state.engine = get_engine()
+    app.state.async_engine = get_async_engine(pool_pre_ping=True)
+    app.state.async_session = async_sessionmaker(app.state.async_engine, expire_on_commit=False)
+    yield
+    await detail_cache.close()
+    await app.state.async_engine.dispose()
+    app.state.engine.dispose()
 
 app = FastAPI(
     title="AlSolved API",
     description="Backend API for AlSolved Grant Hunter Platform",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -18,37 +56,220 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Server-Timing", "X-Cache"],
 )
 
-# Dependency to get DB session
-def get_db():
-    engine = get_engine()
-    db = get_session(engine)
+# JSON lists compress ~5-10x; level 6 keeps CPU per response low
+app.add_middleware(GZipMiddleware, minimum_size=1000, compresslevel=6)
+# Added last = outermost: sees the final Content-Encoding chosen by GZipMiddleware
+app.add_middleware(ETagVariantMiddleware)
+
+# Dependency to get DB session (sync routes, run in the threadpool)
+def get_db(request: Request):
+    db = get_session(request.app.state.engine)
     try:
         yield db
     finally:
         db.close()
 
+# Dependency to get an async DB session (read routes, run on the event loop)
+async def get_async_db(request: Request):
+    async with request.app.state.async_session() as db:
+        yield db
+
+def _with_sync_session(engine, fn):
+    """Runs fn(session) on a short-lived sync session (call through run_in_threadpool)."""
+    db = get_session(engine)
+    try:
+        return fn(db)
+    finally:
+        db.close()
+
+class IndexCache:
+    """In-process index rebuilt from the DB at most every `ttl` seconds."""
+
+    def __init__(self, builder, ttl: int):
+        self.builder = builder
+        self.ttl = ttl
+        self._value = None
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, db: Session):
+        with self._lock:
+            if self._value is None or time.monotonic() - self._built_at > self.ttl:
+                self._value = self.builder(db)
+                self._built_at = time.monotonic()
+            return self._value
+
+def _build_ateco_index(db: Session):
+    rows = db.query(Bando.id, Bando.ai_analysis).filter(Bando.has_ateco.is_(True))
+    return build_grant_index((bando_id, load_analysis(raw).get('ateco_codes')) for bando_id, raw in rows)
+
+ateco_index = IndexCache(_build_ateco_index, ttl=300)
+match_index = IndexCache(MatchIndex.from_session, ttl=300)
+semantic_searcher = SemanticSearcher()
+detail_cache = DetailCache()
+
+async def _catalog_version(db: AsyncSession):
+    """
+    Cheap catalog version: row count (catches deletes) + latest updated_at
+    (index-only lookup, catches inserts and updates).
+    """
+    count, last_update = (await db.execute(select(func.count(Bando.id), func.max(Bando.updated_at)))).one()
+    return f"{count}:{last_update}"
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to AlSolved API. Go to /docs for Swagger UI."}
 
-@app.get("/bandi", response_model=List[BandoResponse])
-def get_bandi(
+def _text_search_filter(search: str):
+    """Lexical match on Title OR Summary OR Marketing Text OR search tags."""
+    search_term = f"%{search}%"
+    return or_(
+        Bando.title.ilike(search_term),
+        Bando.marketing_text.ilike(search_term),
+        func.json_extract(Bando.ai_analysis, '$.titolo_riassuntivo').ilike(search_term),
+        func.json_extract(Bando.ai_analysis, '$.sintesi').ilike(search_term),
+        # New V2 search tags
+         func.json_extract(Bando.ai_analysis, '$.search_tags').ilike(search_term)
+    )
+
+def _sort_expressions():
+    """
+    (expired flag, open date) columns shared by listing sort and search boosts.
+    Both are stored and indexed (see Bando.refresh_deadline / refresh_expired):
+    no JSON date is parsed or compared per row.
+    """
+    return Bando.expired, Bando.opens_on
+
+def _parse_fields(fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """`fields=card` or a comma list of BandoResponse fields. None = full objects."""
+    if not fields:
+        return None
+    if fields.strip() == "card":
+        return CARD_FIELDS
+    selected = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in selected if name not in BandoListItem.model_fields]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return tuple(dict.fromkeys(["id"] + selected))
+
+def _load_columns(columns: Optional[Tuple[str, ...]]):
+    """Query options loading only the selected columns (raw_content stays in the DB)."""
+    if columns is None:
+        return []
+    return [load_only(*[getattr(Bando, name) for name in columns])]
+
+# Semantic retriever (embedding + HNSW, CPU bound) runs off the event loop
+search_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="search")
+
+def _lexical_statement(conditions, search: str, exclude=(), offset: int = 0, limit: int = CANDIDATES_PER_RETRIEVER):
+    """ILIKE matches, title hits first."""
+    stmt = select(Bando.id).where(*conditions, _text_search_filter(search))
+    if exclude:
+        stmt = stmt.where(Bando.id.notin_(list(exclude)))
+    return (
+        stmt.order_by(case((Bando.title.ilike(f"%{search}%"), 0), else_=1), Bando.id.desc())
+        .offset(offset)
+        .limit(limit)
+    )
+
+async def _lexical_ranking(request: Request, conditions, search: str) -> List[int]:
+    """ILIKE retriever on its own async session, concurrent with the semantic one."""
+    async with request.app.state.async_session() as db:
+        return list((await db.execute(_lexical_statement(conditions, search))).scalars())
+
+def _semantic_ranking(search: str) -> List[int]:
+    """Embedding retriever; empty when the index or the local model is unavailable."""
+    try:
+        hits = semantic_searcher.search(search, CANDIDATES_PER_RETRIEVER, min_similarity=SEMANTIC_MIN_SIMILARITY)
+    except Exception as e:
+        logger.warning(f"⚠️ Semantic retriever unavailable: {e}")
+        return []
+    return [bando_id for bando_id, _ in hits or []]
+
+async def _hybrid_search(request: Request, conditions, db: AsyncSession, search: str, page: int, size: int, response: Response, columns=None):
+    """
+    Lexical + semantic retrieval fused with RRF. Active / recent grants get a
+    score boost instead of a hard sort. Stage timings go to Server-Timing.
+    Past the fused candidates, pages continue with the remaining lexical
+    matches in lexical order, so every matching grant is reachable and
+    earlier pages never reshuffle.
+    """
+    timer = StageTimer()
+    loop = asyncio.get_running_loop()
+
+    async def timed(name, awaitable):
+        with timer.stage(name):
+            return await awaitable
+
+    with timer.stage("total"):
+        lexical, semantic = await asyncio.gather(
+            timed("lexical", _lexical_ranking(request, conditions, search)),
+            timed("semantic", loop.run_in_executor(search_pool, _semantic_ranking, search)),
+        )
+
+        with timer.stage("fusion"):
+            fused = reciprocal_rank_fusion({"lexical": lexical, "semantic": semantic})
+
+        with timer.stage("rank"):
+            today = date.today()
+            final_is_expired, open_date_expr = _sort_expressions()
+            # Semantic hits are re-checked against status/region/ATECO filters here
+            stmt = select(Bando.id, final_is_expired, open_date_expr).where(*conditions, Bando.id.in_(list(fused)))
+            rows = (await db.execute(stmt)).all() if fused else []
+            ranked = sorted(rows, key=lambda r: (boost(fused[r[0]], r[1], r[2], today), r[0]), reverse=True)
+
+        with timer.stage("fetch"):
+            skip = (page - 1) * size
+            page_ids = [r[0] for r in ranked[skip:skip + size]]
+            if len(page_ids) < size and len(lexical) == CANDIDATES_PER_RETRIEVER:
+                # Lexical retriever hit its cap: the tail holds every other match
+                tail = _lexical_statement(
+                    conditions, search, exclude=[r[0] for r in ranked],
+                    offset=max(skip - len(ranked), 0), limit=size - len(page_ids),
+                )
+                page_ids += list((await db.execute(tail)).scalars())
+            stmt = select(Bando).options(*_load_columns(columns)).where(Bando.id.in_(page_ids))
+            bandi = {b.id: b for b in (await db.execute(stmt)).scalars()} if page_ids else {}
+            result = bando_rows([bandi[bando_id] for bando_id in page_ids], columns)
+
+    response.headers["Server-Timing"] = timer.header()
+    return result
+
+@app.get("/bandi", response_model=List[BandoListItem], response_model_exclude_unset=True)
+async def get_bandi(
+    request: Request,
+    response: Response,
     page: int = Query(1, description="Page number", ge=1),
     size: int = Query(20, description="Items per page", le=100),
     status: Optional[str] = Query(None, description="Filter by status (new, analyzed)"),
-    search: Optional[str] = Query(None, description="Search text in Title or Summary"),
+    search: Optional[str] = Query(None, description="Search text (keyword + semantic, ranked by relevance)"),
     regione: Optional[str] = Query(None, description="Filter by Region (e.g. Lombardia)"),
-    db: Session = Depends(get_db)
+    ateco: Optional[str] = Query(None, description="Filter by ATECO code or prefix (e.g. C, 56, 56.10)"),
+    expired: Optional[bool] = Query(None, description="Only active (false) or expired (true) grants"),
+    fields: Optional[str] = Query(None, description="'card' (compact list view) or comma-separated fields, e.g. id,title,marketing_text"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Retrieve a list of grants with advanced filtering and pagination.
+    With `search`, results are ranked by hybrid relevance (see _hybrid_search).
+    With `fields`, only the selected columns are loaded and sent.
     """
+    columns = _parse_fields(fields)
 
-    from sqlalchemy import or_, func, case, literal_column
-    
-    query = db.query(Bando)
+    # Conditional GET: today's date is part of the version (expired grants move down)
+    etag = make_etag(
+        request, await _catalog_version(db), date.today().isoformat(),
+        semantic_searcher.version() if search else None,
+    )
+    not_modified = revalidate(request, response, etag, LIST_CACHE)
+    if not_modified:
+        return not_modified
+
+    # Near-duplicates (canonical_id set) are never analyzed: the canonical row is listed instead
+    conditions = [Bando.canonical_id.is_(None)]
     
     # 1. Status Filter
     if status:
@@ -56,27 +277,13 @@ def get_bandi(
             # Try to map 'analyzed' -> ProcessingStatus.ANALYZED
             # Assumes the input string matches the Enum value ('new', 'analyzed', etc.)
             status_enum = ProcessingStatus(status.lower()) 
-            query = query.filter(Bando.status == status_enum)
+            conditions.append(Bando.status == status_enum)
         except ValueError:
             # If invalid status passed, ignore or return empty?
             # Let's return empty to indicate no matches for invalid status
             return []
-    
-    # 2. Text Search (Title OR Summary OR Marketing Text)
-    if search:
-        search_term = f"%{search}%"
-        query = query.filter(
-            or_(
-                Bando.title.ilike(search_term),
-                Bando.marketing_text.ilike(search_term),
-                func.json_extract(Bando.ai_analysis, '$.titolo_riassuntivo').ilike(search_term),
-                func.json_extract(Bando.ai_analysis, '$.sintesi').ilike(search_term),
-                # New V2 search tags
-                 func.json_extract(Bando.ai_analysis, '$.search_tags').ilike(search_term)
-            )
-        )
 
-    # 3. Region Filter (New V2 Array Check)
+    # 2. Region Filter (New V2 Array Check)
     if regione:
         # SQLite: Check if regione is overlapping with the valid regions
         # Simple string-in-string check works because JSON array is stored as string '["Lombardia"]'
@@ -86,7 +293,7 @@ def get_bandi(
         target_region = regione.strip()
         
         # Check standard regions array OR legacy string field
-        query = query.filter(
+        conditions.append(
             or_(
                 # New V2: "regions": ["Lombardia", "Nazionale"] -> matches %"Lombardia"%
                 func.json_extract(Bando.ai_analysis, '$.regions').ilike(f'%"{target_region}"%'),
@@ -95,51 +302,40 @@ def get_bandi(
             )
         )
         
-    # 4. Sorting Logic
-    # Priority: Active > Expired. Then by Date.
-    
-    from datetime import date
-    today = date.today().isoformat()
-    
-    # Extract deadline
-    deadline_expr = func.coalesce(
-        func.json_extract(Bando.ai_analysis, '$.scadenza'), 
-        func.json_extract(Bando.ai_analysis, '$.close_date'),
-        func.json_extract(Bando.ai_analysis, '$.data_chiusura')
-    )
-    
-    # Expired Flag: stored in JSON (V2) or calculated (Legacy)
-    # Check V2 first: $.is_expired == true
-    is_expired_v2 = func.json_extract(Bando.ai_analysis, '$.is_expired')
-    
-    # Calculation for Legacy
-    is_expired_calc = case(
-        (deadline_expr < today, 1),
-        else_=0
-    )
-    
-    # Combined Expired Logic (1 = Expired, 0 = Active)
-    # If is_expired_v2 is not null, use it (cast to int), else use calc
-    final_is_expired = func.coalesce(
-        case((is_expired_v2 == 'true', 1), (is_expired_v2 == True, 1), else_=None),
-        is_expired_calc
-    )
+    # 3. ATECO Filter (prefix trie: broader and more specific codes both match)
+    if ateco:
+        if normalize_code(ateco) is None:
+            return []
+        # Index (re)builds use a sync session in the threadpool, never on the event loop
+        index = await run_in_threadpool(_with_sync_session, request.app.state.engine, ateco_index.get)
+        ateco_ids = index.matching_grants(ateco)
+        if not ateco_ids:
+            return []
+        conditions.append(Bando.id.in_(ateco_ids))
 
-    # Secondary Sort: Open Date (descending)
-    open_date_expr = func.coalesce(
-        func.json_extract(Bando.ai_analysis, '$.open_date'),
-        func.json_extract(Bando.ai_analysis, '$.data_apertura'),
-        Bando.ingested_at
-    )
+    # Active / expired: stored flag, refreshed nightly
+    if expired is not None:
+        conditions.append(Bando.expired.is_(expired))
+
+    # 4. Text Search: hybrid relevance ranking
+    if search:
+        result = await _hybrid_search(request, conditions, db, search, page, size, response, columns)
+        return json_response(result, response)
+        
+    # 5. Sorting Logic
+    # Priority: Active > Expired. Then by Date.
+    final_is_expired, open_date_expr = _sort_expressions()
 
     try:
         skip = (page - 1) * size
-        bandi = query.order_by(
-            final_is_expired.asc(), # 0 (Active) before 1 (Expired)
+        stmt = select(Bando).where(*conditions).options(*_load_columns(columns)).order_by(
+            final_is_expired.asc(), # False (Active) before True (Expired)
             open_date_expr.desc(),  # Newest first
             Bando.id.desc()
-        ).offset(skip).limit(size).all()
-        return bandi
+        ).offset(skip).limit(size)
+        bandi = (await db.execute(stmt)).scalars().all()
+        # Trusted DB rows: skip per-item response_model validation
+        return json_response(bando_rows(bandi, columns), response)
     except Exception as e:
         import traceback
         with open("error_log.txt", "w") as f:
@@ -147,102 +343,99 @@ def get_bandi(
             traceback.print_exc(file=f)
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/bandi/semantic", response_model=List[BandoResponse])
+async def search_bandi_semantic(
+    q: str = Query(..., min_length=2, description="Natural language query (e.g. finanziamenti per capannoni)"),
+    k: int = Query(20, description="Number of results", ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Semantic search over title, sintesi and search_tags using the local embedding index.
+    Results are ordered by similarity. Build the index with `manage.py index`.
+    """
+    hits = await run_in_threadpool(semantic_searcher.search, q, k)
+    if hits is None:
+        raise HTTPException(status_code=503, detail="Semantic index not built yet")
+    if not hits:
+        return []
+
+    stmt = select(Bando).where(Bando.id.in_([bando_id for bando_id, _ in hits]), Bando.canonical_id.is_(None))
+    bandi = {b.id: b for b in (await db.execute(stmt)).scalars()}
+    return json_response(bando_rows(bandi[bando_id] for bando_id, _ in hits if bando_id in bandi))
+
 @app.get("/bandi/{bando_id}", response_model=BandoResponse)
-def get_bando(bando_id: int, db: Session = Depends(get_db)):
+async def get_bando(bando_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
     """
     Get details of a specific grant.
+    The ETag is the row version (updated_at): a 304 never loads the full row,
+    and a cached body is served only if it was stored for the same version.
     """
-    bando = db.query(Bando).filter(Bando.id == bando_id).first()
-    if not bando:
+    version = (await db.execute(select(Bando.updated_at, Bando.ingested_at).where(Bando.id == bando_id))).first()
+    if not version:
         raise HTTPException(status_code=404, detail="Bando not found")
-    return bando
+    not_modified = revalidate(request, response, make_etag(request, *version), DETAIL_CACHE)
+    if not_modified:
+        return not_modified
+
+    body = await detail_cache.get(bando_id, version)
+    response.headers["X-Cache"] = "HIT" if body else "MISS"
+    if body is None:
+        bando = await db.get(Bando, bando_id)
+        body = dumps(bando_rows([bando])[0])
+        await detail_cache.put(bando_id, version, body)
+    return json_response(body, response)
+
+@app.get("/metrics/cache")
+def get_cache_metrics():
+    """Hit ratio and size of the grant detail cache (per worker for the in-memory backend)."""
+    return detail_cache.stats()
+
+
+@app.post("/match", response_model=List[MatchResult])
+def match_company(profile: CompanyProfile, db: Session = Depends(get_db)):
+    """
+    Score a company profile against the whole catalog and return the top-k grants.
+    Region and ATECO act as hard filters; national / unrestricted grants match with partial credit.
+    """
+    index = match_index.get(db)
+    return index.match(profile.to_match_profile(), top_k=profile.top_k, include_expired=profile.include_expired)
+
 
+# /regioni result per catalog version: the full JSON scan runs once per change
+_regions_cache = {}
 
 @app.get("/regioni", response_model=List[str])
-def get_regioni(db: Session = Depends(get_db)):
+async def get_regioni(request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
     """
     Get list of unique regions from all bandi.
     Maps Solr IDs to human-readable region names.
     """
-    import json
-    
-    # Mapping Solr IDs to Italian region names (from incentivi.gov.it)
-    SOLR_ID_TO_REGION = {
-        "218": "Abruzzo",
-        "219": "Basilicata",
-        "220": "Calabria",
-        "221": "Campania",
-        "222": "Emilia-Romagna",
-        "223": "Friuli-Venezia Giulia",
-        "224": "Lazio",
-        "225": "Liguria",
-        "226": "Lombardia",
-        "227": "Marche",
-        "228": "Molise",
-        "229": "Piemonte",
-        "230": "Puglia",
-        "231": "Sardegna",
-        "232": "Sicilia",
-        "233": "Toscana",
-        "234": "Trentino-Alto Adige",
-        "235": "Umbria",
-        "236": "Valle d'Aosta",
-        "237": "Veneto",
-        "587": "Estero",
-    }
-    
-    # Standard Italian regions fallback
-    REGIONI_ITALIANE = [
-        "Nazionale", "Lombardia", "Lazio", "Campania", "Veneto", 
-        "Piemonte", "Emilia-Romagna", "Sicilia", "Toscana", "Puglia"
-    ]
-    
-    # Query all bandi with ai_analysis
-    bandi = db.query(Bando).filter(Bando.ai_analysis.isnot(None)).all()
-    
+    version = await _catalog_version(db)
+    not_modified = revalidate(request, response, make_etag(request, version), REGIONS_CACHE)
+    if not_modified:
+        return not_modified
+    if version not in _regions_cache:
+        # Query all bandi with ai_analysis (only the JSON column is needed)
+        rows = (await db.execute(select(Bando.ai_analysis).where(Bando.ai_analysis.isnot(None)))).scalars().all()
+        _regions_cache.clear()
+        _regions_cache[version] = await run_in_threadpool(_collect_regions, rows)
+    return _regions_cache[version]
+
+def _collect_regions(rows) -> List[str]:
     regions_set = set()
-    
-    for bando in bandi:
-        try:
-            analysis = bando.ai_analysis
-            if isinstance(analysis, str):
-                analysis = json.loads(analysis)
-            
-            # Try different field names for regions
-            regions = analysis.get('regions') or analysis.get('regione') or []
-            
-            if isinstance(regions, list):
-                for r in regions:
-                    if r:
-                        r_str = str(r).strip()
-                        # Map ID to name if it's a numeric ID
-                        if r_str in SOLR_ID_TO_REGION:
-                            regions_set.add(SOLR_ID_TO_REGION[r_str])
-                        elif not r_str.isdigit():
-                            # It's already a name
-                            regions_set.add(r_str)
-            elif isinstance(regions, str) and regions:
-                r_str = regions.strip()
-                if r_str in SOLR_ID_TO_REGION:
-                    regions_set.add(SOLR_ID_TO_REGION[r_str])
-                elif not r_str.isdigit():
-                    regions_set.add(r_str)
-                
-        except (json.JSONDecodeError, AttributeError, TypeError):
-            continue
+    for raw in rows:
+        regions_set |= extract_regions(load_analysis(raw))
     
     # Sort alphabetically
     # Remove "Nazionale" if present to avoid duplication when we add it at the start
-    if "Nazionale" in regions_set:
-        regions_set.remove("Nazionale")
+    regions_set.discard(NAZIONALE)
         
     sorted_regions = sorted(regions_set)
     
     # Add "Nazionale" at the beginning if we have results
     if sorted_regions:
-        sorted_regions.insert(0, "Nazionale")
+        sorted_regions.insert(0, NAZIONALE)
     else:
         return REGIONI_ITALIANE
     
     return sorted_regions
-
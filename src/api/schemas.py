@@ -1,6 +1,9 @@
+import re
 from datetime import datetime
 from typing import Optional, List, Any
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
+
+from src.utils.deadlines import DeadlineStatus, normalize_date
 
 # Schema for the AI Analysis part (nested)
 class AnalysisSchema(BaseModel):
@@ -17,6 +20,49 @@ class AnalysisSchema(BaseModel):
     punteggio_complessita: Optional[str] = None
     match_keywords: List[str] = []
 
+# Schema for the V2 analyzer output (Gemini), validated field by field
+class AnalysisV2Schema(AnalysisSchema):
+    regions: List[str] = []
+    ateco_codes: List[str] = []
+    is_expired: Optional[bool] = None
+    marketing_text: Optional[str] = None
+    search_tags: List[str] = []
+
+    @field_validator('regions', 'ateco_codes', 'search_tags', mode='before')
+    @classmethod
+    def split_string_list(cls, value):
+        # LLMs sometimes return "Lombardia, Lazio" instead of a list
+        if isinstance(value, str):
+            return [part.strip() for part in re.split(r'[;,]', value) if part.strip()]
+        return value
+
+    @field_validator('regions', 'ateco_codes', 'search_tags')
+    @classmethod
+    def drop_empty_items(cls, value):
+        return [item.strip() for item in value if item and item.strip()]
+
+    @field_validator('scadenza')
+    @classmethod
+    def check_scadenza(cls, value):
+        # Local repair: "16 Gennaio 2026", "31/12/2025", "A sportello" don't need a re-ask
+        if value is None:
+            return value
+        deadline, status = normalize_date(value)
+        if deadline:
+            return deadline.isoformat()
+        if status is DeadlineStatus.SPORTELLO:
+            return 'A sportello'
+        if value.strip().upper() in ('N/A', 'ND', 'N.D.'):
+            return 'N/A'
+        raise ValueError('scadenza must be YYYY-MM-DD, N/A or A sportello')
+
+    @field_validator('sintesi', 'marketing_text')
+    @classmethod
+    def non_empty_text(cls, value):
+        if value is not None and not value.strip():
+            raise ValueError('empty text')
+        return value
+
 # Schema for the full Bando response
 class BandoResponse(BaseModel):
     id: int
@@ -34,3 +80,53 @@ class BandoResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+# ai_analysis keys read by GrantCard: the rest stays in the detail view.
+# Includes deadline / is_expired / regions so lists can be sorted and sliced client-side
+CARD_ANALYSIS_FIELDS = (
+    "titolo_riassuntivo", "sintesi", "regions", "regione", "scadenza",
+    "close_date", "data_chiusura", "is_expired", "is_gold", "ateco_codes",
+)
+
+# Columns of the compact card view (GET /bandi?fields=card)
+CARD_FIELDS = ("id", "url", "title", "source_name", "status", "marketing_text", "ai_analysis")
+
+# List item for GET /bandi: every BandoResponse field, only the requested ones are sent
+class BandoListItem(BaseModel):
+    id: int
+    url: Optional[str] = None
+    title: Optional[str] = None
+    source_name: Optional[str] = None
+    status: Any = None
+    ingested_at: Optional[datetime] = None
+    raw_content: Optional[str] = None
+    ai_analysis: Optional[Any] = None
+    marketing_text: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+# Company profile for POST /match (e.g. a HubSpot company)
+class CompanyProfile(BaseModel):
+    regione: Optional[str] = None
+    ateco_codes: List[str] = []
+    beneficiary_types: List[str] = []
+    support_forms: List[str] = []
+    top_k: int = Field(10, ge=1, le=100)
+    include_expired: bool = False
+
+    def to_match_profile(self) -> dict:
+        return {
+            "region": [self.regione] if self.regione else [],
+            "ateco": self.ateco_codes,
+            "beneficiary": self.beneficiary_types,
+            "support_form": self.support_forms,
+        }
+
+class MatchResult(BaseModel):
+    bando_id: int
+    title: str
+    url: str
+    score: float
+    matched: List[str] = []
+    expired: bool = False
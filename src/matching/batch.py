@@ -0,0 +1,351 @@
+"""
+batch.py - Bulk Company Matching (CRM export vs catalog)
+========================================================
+Matching notturno di un intero export HubSpot (CSV o JSONL) contro il catalogo.
+
+Stesse regole di `engine.MatchIndex`, ma in forma matriciale:
+- i bandi diventano matrici sparse bandi x chiavi, una per dimensione
+- le aziende diventano matrici sparse aziende x chiavi
+- per ogni blocco di aziende: prodotto sparso -> match esatti, wildcard per
+  i bandi senza vincoli, filtri hard, score pesato, top-k con argpartition
+- i blocchi vengono distribuiti su un pool di processi
+
+I risultati finiscono nella tabella `matches` (status MATCHED). Bando.status
+non cambia: il match è per azienda, un bando resta ANALYZED per tutti gli altri.
+
+Usage:
+    python scripts/manage.py match-batch data/input/companies.csv --top-k 10 --workers 4
+"""
+
+import csv
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy import insert
+
+from src.analysis.ateco import normalize_code
+from src.matching.engine import (
+    DIMENSIONS, WEIGHTS, WILDCARD_CREDIT, HARD_DIMENSIONS,
+    grant_attributes, is_expired, normalize_key, split_values,
+)
+from src.scraper.models import Bando, Match, ProcessingStatus, init_db, load_analysis
+from src.utils.regions import normalize_region
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Colonne dell'export HubSpot accettate per ogni attributo (prima trovata vince)
+COMPANY_FIELDS = {
+    "id": ("hs_object_id", "record_id", "company_id", "id"),
+    "name": ("name", "company_name"),
+    "region": ("regione", "region", "state"),
+    "ateco": ("codice_ateco", "ateco_codes", "ateco"),
+    "beneficiary": ("tipo_beneficiario", "beneficiary_types", "beneficiary"),
+    "support_form": ("forme_agevolazione", "support_forms", "support_form"),
+}
+
+CHUNK_SIZE = 2000
+
+
+# ---------------------------------------------------------------------------
+# Companies
+# ---------------------------------------------------------------------------
+
+def _field(record: dict, names) -> Optional[str]:
+    for name in names:
+        value = record.get(name)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def load_companies(path) -> List[dict]:
+    """Legge un export aziende CSV o JSONL e lo riduce a profili di matching."""
+    path = Path(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.suffix.lower() in (".jsonl", ".ndjson"):
+            records = [json.loads(line) for line in f if line.strip()]
+        else:
+            records = list(csv.DictReader(f))
+
+    companies = []
+    for i, record in enumerate(records):
+        # HubSpot JSON exports nest attributes under "properties"
+        props = {**record, **record.get("properties", {})} if isinstance(record.get("properties"), dict) else record
+        companies.append({
+            "id": str(_field(props, COMPANY_FIELDS["id"]) or i),
+            "name": _field(props, COMPANY_FIELDS["name"]),
+            "region": split_values(_field(props, COMPANY_FIELDS["region"])),
+            "ateco": split_values(_field(props, COMPANY_FIELDS["ateco"])),
+            "beneficiary": split_values(_field(props, COMPANY_FIELDS["beneficiary"])),
+            "support_form": split_values(_field(props, COMPANY_FIELDS["support_form"])),
+        })
+    return companies
+
+
+# ---------------------------------------------------------------------------
+# Vectorization
+# ---------------------------------------------------------------------------
+
+def _csr(rows: List[List[int]], n_cols: int) -> sparse.csr_matrix:
+    indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(r) for r in rows])
+    indices = np.fromiter((c for r in rows for c in r), dtype=np.int32, count=int(indptr[-1]))
+    data = np.ones(len(indices), dtype=np.float32)
+    return sparse.csr_matrix((data, indices, indptr), shape=(len(rows), n_cols))
+
+
+def _prefixes(code: str) -> List[str]:
+    return [code[:end] for end in range(2, len(code) + 1)]
+
+
+class GrantMatrix:
+    """Catalogo vettorizzato: una matrice sparsa bandi x vocabolario per dimensione."""
+
+    def __init__(self, rows: Iterable, include_expired: bool = False):
+        today = date.today().isoformat()
+        ids, attributes, expired = [], [], []
+        for bando_id, raw in sorted(rows, key=lambda r: r[0]):
+            analysis = load_analysis(raw)
+            ids.append(bando_id)
+            attributes.append(grant_attributes(analysis))
+            expired.append(is_expired(analysis, today))
+
+        self.ids = np.array(ids, dtype=np.int64)
+        self.active = np.ones(len(ids), dtype=bool) if include_expired else ~np.array(expired, dtype=bool)
+        self.vocab: Dict[str, Dict[str, int]] = {}
+        self.matrix: Dict[str, sparse.csr_matrix] = {}
+        self.unconstrained: Dict[str, np.ndarray] = {}
+
+        for dim in DIMENSIONS:
+            keys = [attrs[dim] for attrs in attributes]
+            self.unconstrained[dim] = np.array([not k for k in keys], dtype=bool)
+            if dim == "ateco":
+                # Vocabolario = tutti i prefissi dei codici dei bandi
+                vocab = {p: i for i, p in enumerate(sorted({p for k in keys for code in k for p in _prefixes(code)}))}
+                self.matrix["ateco"] = _csr([[vocab[c] for c in k] for k in keys], len(vocab))
+                self.matrix["ateco_prefix"] = _csr(
+                    [sorted({vocab[p] for c in k for p in _prefixes(c)}) for k in keys], len(vocab)
+                )
+            else:
+                vocab = {key: i for i, key in enumerate(sorted({key for k in keys for key in k}))}
+                self.matrix[dim] = _csr([[vocab[key] for key in k] for k in keys], len(vocab))
+            self.vocab[dim] = vocab
+
+        # Trasposte una volta sola (prodotti aziende @ bandi.T nei worker)
+        self.matrix_t = {name: m.T.tocsr() for name, m in self.matrix.items()}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def vectorize(self, companies: List[dict]) -> Dict[str, sparse.csr_matrix]:
+        """Profili aziendali -> matrici sparse sullo stesso vocabolario dei bandi."""
+        out = {}
+        for dim in DIMENSIONS:
+            vocab = self.vocab[dim]
+            if dim == "ateco":
+                exact_rows, ancestor_rows = [], []
+                for company in companies:
+                    codes = [c for c in (normalize_code(v) for v in company["ateco"]) if c and c.isdigit()]
+                    exact_rows.append(sorted({vocab[c] for c in codes if c in vocab}))
+                    ancestor_rows.append(sorted({vocab[p] for c in codes for p in _prefixes(c) if p in vocab}))
+                out["ateco"] = _csr(exact_rows, len(vocab))
+                out["ateco_ancestors"] = _csr(ancestor_rows, len(vocab))
+            else:
+                rows = []
+                for company in companies:
+                    values = company[dim]
+                    if dim == "region":
+                        values = [normalize_region(v) for v in values]
+                    rows.append(sorted({vocab[k] for k in (normalize_key(v) for v in values) if k in vocab}))
+                out[dim] = _csr(rows, len(vocab))
+        out["specified"] = np.array(
+            [[bool(company[dim]) for dim in DIMENSIONS] for company in companies], dtype=bool
+        ).reshape(len(companies), len(DIMENSIONS))
+        return out
+
+
+# ---------------------------------------------------------------------------
+# Scoring (runs in worker processes)
+# ---------------------------------------------------------------------------
+
+_GRANTS: Optional[GrantMatrix] = None
+
+
+def _init_worker(grants: GrantMatrix):
+    global _GRANTS
+    _GRANTS = grants
+
+
+def score_chunk(companies: Dict[str, sparse.csr_matrix], top_k: int, grants: GrantMatrix = None):
+    """
+    Top-k per un blocco di aziende.
+    Ritorna (posizioni bando [n, k], score [n, k], dimensioni esatte [n, k, D]); score -1 = nessun match.
+    """
+    grants = grants or _GRANTS
+    specified = companies["specified"]
+    n_companies, n_grants = specified.shape[0], len(grants)
+
+    score = np.zeros((n_companies, n_grants), dtype=np.float32)
+    valid = np.broadcast_to(grants.active, (n_companies, n_grants)).copy()
+    exact_by_dim = np.zeros((n_companies, n_grants, len(DIMENSIONS)), dtype=bool)
+    max_score = np.zeros(n_companies, dtype=np.float32)
+
+    for d, dim in enumerate(DIMENSIONS):
+        if dim == "ateco":
+            # Bando antenato del codice aziendale OR bando più specifico
+            hits = companies["ateco_ancestors"] @ grants.matrix_t["ateco"]
+            hits = hits + companies["ateco"] @ grants.matrix_t["ateco_prefix"]
+        else:
+            hits = companies[dim] @ grants.matrix_t[dim]
+        exact = hits.toarray() > 0
+        wildcard = ~exact & grants.unconstrained[dim][None, :]
+        is_set = specified[:, d][:, None]
+
+        exact &= is_set
+        exact_by_dim[:, :, d] = exact
+        score += WEIGHTS[dim] * (exact + WILDCARD_CREDIT * (wildcard & is_set))
+        max_score += WEIGHTS[dim] * specified[:, d]
+        if dim in HARD_DIMENSIONS:
+            valid &= ~is_set | exact | wildcard
+
+    score /= np.where(max_score > 0, max_score, 1.0)[:, None]
+    # A parità di score vince il bando più recente (id più alto), come in MatchIndex
+    ranked = np.where(valid, score + np.arange(n_grants) * 1e-9, -1.0)
+
+    k = min(top_k, n_grants)
+    top = np.argpartition(-ranked, k - 1, axis=1)[:, :k]
+    top_ranked = np.take_along_axis(ranked, top, axis=1)
+    order = np.argsort(-top_ranked, axis=1, kind="stable")
+    top = np.take_along_axis(top, order, axis=1)
+
+    top_scores = np.where(np.take_along_axis(valid, top, axis=1), np.take_along_axis(score, top, axis=1), -1.0)
+    rows = np.arange(n_companies)[:, None]
+    return top, top_scores, exact_by_dim[rows, top]
+
+
+def _score_task(args):
+    companies, top_k = args
+    return score_chunk(companies, top_k)
+
+
+def match_companies(companies: List[dict], grants: GrantMatrix, top_k: int = 10,
+                    workers: int = None, chunk_size: int = CHUNK_SIZE) -> List[tuple]:
+    """
+    Calcola i top-k match per tutte le aziende.
+    Ritorna tuple (company_index, bando_id, score, rank, matched_dims).
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = [companies[i:i + chunk_size] for i in range(0, len(companies), chunk_size)]
+    tasks = [(grants.vectorize(chunk), top_k) for chunk in chunks]
+
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(grants,)) as pool:
+            outputs = list(pool.map(_score_task, tasks))
+    else:
+        outputs = [score_chunk(companies_m, k, grants) for companies_m, k in tasks]
+
+    results = []
+    for chunk_no, (top, top_scores, exact) in enumerate(outputs):
+        base = chunk_no * chunk_size
+        for i in range(top.shape[0]):
+            rank = 0
+            for j in range(top.shape[1]):
+                if top_scores[i, j] < 0:
+                    break
+                rank += 1
+                matched = [dim for d, dim in enumerate(DIMENSIONS) if exact[i, j, d]]
+                results.append((base + i, int(grants.ids[top[i, j]]), round(float(top_scores[i, j]), 4), rank, matched))
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Persistence
+# ---------------------------------------------------------------------------
+
+def save_matches(session, companies: List[dict], results: List[tuple], batch_size: int = 10000):
+    """Sostituisce i match delle aziende elaborate (lo stato del bando non cambia)."""
+    company_ids = [c["id"] for c in companies]
+    for start in range(0, len(company_ids), 900):
+        session.query(Match).filter(Match.company_id.in_(company_ids[start:start + 900])).delete(synchronize_session=False)
+
+    mappings = [
+        {
+            "company_id": companies[idx]["id"],
+            "company_name": companies[idx]["name"],
+            "bando_id": bando_id,
+            "score": score,
+            "rank": rank,
+            "matched_on": matched,
+            "status": ProcessingStatus.MATCHED,
+        }
+        for idx, bando_id, score, rank, matched in results
+    ]
+    for start in range(0, len(mappings), batch_size):
+        session.execute(insert(Match), mappings[start:start + batch_size])
+    session.commit()
+
+
+def run_batch_matching(path, top_k: int = 10, workers: int = None, include_expired: bool = False, dry_run: bool = False):
+    print("=" * 70)
+    print("🎯 BATCH MATCHING - CRM export vs catalogo")
+    print("=" * 70)
+
+    session = init_db()
+    t0 = time.perf_counter()
+
+    companies = load_companies(path)
+    # Near-duplicate esclusi: niente copie dello stesso incentivo in matches
+    grants = GrantMatrix(session.query(Bando.id, Bando.ai_analysis).filter(Bando.canonical_id.is_(None)),
+                         include_expired=include_expired)
+    t_load = time.perf_counter()
+    logger.info(f"📊 {len(companies)} aziende x {len(grants)} bandi")
+
+    if not companies or not len(grants):
+        print("❌ Nessuna azienda o nessun bando. Interrotto.")
+        return []
+
+    results = match_companies(companies, grants, top_k=top_k, workers=workers)
+    t_match = time.perf_counter()
+
+    if not dry_run:
+        save_matches(session, companies, results)
+        logger.info("💾 Match salvati nella tabella matches")
+    t_save = time.perf_counter()
+
+    print("\n" + "=" * 70)
+    print("📊 REPORT FINALE")
+    print("=" * 70)
+    print(f"   🏢 Aziende:        {len(companies)}")
+    print(f"   🔗 Match totali:   {len(results)}")
+    print(f"   ⏱️ Caricamento:    {t_load - t0:.2f}s")
+    print(f"   ⏱️ Matching:       {t_match - t_load:.2f}s")
+    print(f"   ⏱️ Salvataggio:    {t_save - t_match:.2f}s")
+    print("=" * 70)
+
+    if dry_run:
+        print("⚠️ DRY RUN - Nessuna modifica salvata")
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Matching massivo aziende CRM vs catalogo bandi")
+    parser.add_argument("path", help="Export aziende HubSpot (.csv o .jsonl)")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--include-expired", action="store_true")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    run_batch_matching(args.path, top_k=args.top_k, workers=args.workers,
+                       include_expired=args.include_expired, dry_run=args.dry_run)
@@ -0,0 +1,240 @@
+"""
+engine.py - Company <-> Grant Matching Engine
+=============================================
+Matching a imbuto tra un profilo aziendale (HubSpot) e il catalogo bandi.
+
+Il catalogo viene indicizzato una volta in indici invertiti
+chiave -> bitset (int Python, un bit per bando) su quattro dimensioni:
+- region:         regione del bando ("Nazionale" = tutte)
+- ateco:          codici ATECO (prefissi: un bando "56" vale per "56.10")
+- beneficiary:    tipologia beneficiario (PMI, Startup, ID Solr subject_type)
+- support_form:   forma di agevolazione (Fondo perduto, ID Solr support_form)
+
+Per ogni dimensione un bando può:
+- avere un match esatto con il profilo       -> peso pieno
+- non avere vincoli su quella dimensione     -> peso * WILDCARD_CREDIT
+- avere vincoli diversi                      -> 0 (esclusione per region/ateco)
+
+Lo score di un bando dipende solo da quale "livello" ottiene su ogni
+dimensione, quindi i bandi vengono raggruppati per combinazione di livelli
+con operazioni bitwise e la top-k si estrae partendo dal gruppo migliore:
+nessun ciclo su tutto il catalogo per ogni richiesta.
+"""
+
+import itertools
+import re
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Set
+
+from src.analysis.ateco import parse_codes, normalize_code
+from src.scraper.models import Bando, load_analysis
+from src.utils.deadlines import extract_deadline
+from src.utils.regions import NAZIONALE, extract_regions, normalize_region
+
+DIMENSIONS = ("region", "ateco", "beneficiary", "support_form")
+
+WEIGHTS = {
+    "region": 0.35,
+    "ateco": 0.35,
+    "beneficiary": 0.2,
+    "support_form": 0.1,
+}
+
+# Credito per i bandi senza vincoli su una dimensione (es. bando Nazionale)
+WILDCARD_CREDIT = 0.5
+
+# Dimensioni che escludono il bando in caso di vincolo incompatibile
+HARD_DIMENSIONS = ("region", "ateco")
+
+EXACT, WILDCARD, MISS = "exact", "wildcard", "miss"
+
+
+def normalize_key(value) -> Optional[str]:
+    """Chiave testuale normalizzata: minuscole, spazi compattati."""
+    if value is None:
+        return None
+    key = re.sub(r'\s+', ' ', str(value)).strip().lower()
+    return key or None
+
+
+def split_values(value) -> List[str]:
+    """Valori multipli da lista o stringa "PMI, Startup; Grandi imprese"."""
+    if not value:
+        return []
+    if isinstance(value, (list, tuple)):
+        items = value
+    else:
+        items = re.split(r'[;,]', str(value))
+    keys = []
+    for item in items:
+        key = normalize_key(item)
+        if key and key not in keys:
+            keys.append(key)
+    return keys
+
+
+def grant_attributes(analysis: dict) -> Dict[str, Set[str]]:
+    """Chiavi indicizzate per un bando, per dimensione (insieme vuoto = nessun vincolo)."""
+    regions = {normalize_key(r) for r in extract_regions(analysis)}
+    if normalize_key(NAZIONALE) in regions:
+        regions = set()
+
+    beneficiary = set(split_values(analysis.get('subject_type')))
+    beneficiary |= set(split_values(analysis.get('beneficiari')))
+
+    support = set(split_values(analysis.get('support_form')))
+    support |= set(split_values(analysis.get('forma_agevolazione')))
+    support |= set(split_values(analysis.get('tipo_agevolazione')))
+
+    return {
+        "region": regions,
+        "ateco": set(parse_codes(analysis.get('ateco_codes'))),
+        "beneficiary": beneficiary,
+        "support_form": support,
+    }
+
+
+def is_expired(analysis: dict, today: str) -> bool:
+    """Same rule as Bando.compute_deadline: the LLM is_expired flag is stale, only the deadline counts."""
+    deadline, _ = extract_deadline(analysis)
+    return deadline is not None and deadline.isoformat() < today
+
+
+def _iter_bits_desc(bits: int):
+    """Posizioni dei bit accesi, dal più alto (bando più recente) al più basso."""
+    while bits:
+        pos = bits.bit_length() - 1
+        yield pos
+        bits ^= 1 << pos
+
+
+class MatchIndex:
+    """Indici invertiti chiave -> bitset su tutto il catalogo."""
+
+    def __init__(self):
+        self.ids: List[int] = []          # posizione bit -> bando id (ordinati per id)
+        self.titles: List[str] = []
+        self.urls: List[str] = []
+        self.all_bits = 0
+        self.expired_bits = 0
+        self.keys: Dict[str, Dict[str, int]] = {dim: {} for dim in DIMENSIONS}
+        self.unconstrained: Dict[str, int] = {dim: 0 for dim in DIMENSIONS}
+        # ATECO: prefisso -> bandi con almeno un codice sotto quel prefisso
+        self.ateco_subtree: Dict[str, int] = {}
+
+    def add(self, bando_id: int, title: str, url: str, analysis: dict, today: str):
+        pos = len(self.ids)
+        bit = 1 << pos
+        self.ids.append(bando_id)
+        self.titles.append(title or "")
+        self.urls.append(url or "")
+        self.all_bits |= bit
+        if is_expired(analysis, today):
+            self.expired_bits |= bit
+
+        for dim, keys in grant_attributes(analysis).items():
+            if not keys:
+                self.unconstrained[dim] |= bit
+                continue
+            index = self.keys[dim]
+            for key in keys:
+                index[key] = index.get(key, 0) | bit
+                if dim == "ateco":
+                    for end in range(2, len(key) + 1):
+                        self.ateco_subtree[key[:end]] = self.ateco_subtree.get(key[:end], 0) | bit
+
+    @classmethod
+    def build(cls, rows: Iterable) -> "MatchIndex":
+        """`rows`: tuple (id, title, url, ai_analysis) in qualsiasi ordine."""
+        index = cls()
+        today = date.today().isoformat()
+        for bando_id, title, url, raw in sorted(rows, key=lambda r: r[0]):
+            index.add(bando_id, title, url, load_analysis(raw), today)
+        return index
+
+    @classmethod
+    def from_session(cls, session) -> "MatchIndex":
+        # Near-duplicate esclusi: un incentivo compare una volta sola nel top-k
+        rows = session.query(Bando.id, Bando.title, Bando.url, Bando.ai_analysis).filter(Bando.canonical_id.is_(None))
+        return cls.build(rows)
+
+    def __len__(self):
+        return len(self.ids)
+
+    # --- Query ---------------------------------------------------------
+
+    def _exact_bits(self, dim: str, values: List[str]) -> int:
+        bits = 0
+        if dim == "ateco":
+            for code in values:
+                code = normalize_code(code)
+                if not code or not code.isdigit():
+                    continue
+                # Antenati (bando "56" per azienda "56.10") + discendenti (bando "56.10" per azienda "56")
+                for end in range(2, len(code) + 1):
+                    bits |= self.keys["ateco"].get(code[:end], 0)
+                bits |= self.ateco_subtree.get(code, 0)
+            return bits
+
+        index = self.keys[dim]
+        for value in values:
+            key = normalize_key(normalize_region(value) if dim == "region" else value)
+            if key:
+                bits |= index.get(key, 0)
+        return bits
+
+    def match(self, profile: Dict[str, List[str]], top_k: int = 10, include_expired: bool = False) -> List[dict]:
+        """
+        `profile`: dimensione -> lista di valori dell'azienda
+        (es. {"region": ["Lombardia"], "ateco": ["56.10"]}). Dimensioni vuote ignorate.
+        """
+        candidates = self.all_bits
+        if not include_expired:
+            candidates &= ~self.expired_bits
+
+        # Per ogni dimensione specificata: bitset dei livelli exact / wildcard / miss
+        levels = {}
+        for dim in DIMENSIONS:
+            values = profile.get(dim) or []
+            if not values:
+                continue
+            exact = self._exact_bits(dim, values) & candidates
+            wildcard = self.unconstrained[dim] & candidates & ~exact
+            miss = candidates & ~exact & ~wildcard
+            if dim in HARD_DIMENSIONS:
+                candidates &= exact | wildcard
+                miss = 0
+            levels[dim] = {EXACT: exact, WILDCARD: wildcard, MISS: miss}
+
+        credit = {EXACT: 1.0, WILDCARD: WILDCARD_CREDIT, MISS: 0.0}
+        dims = list(levels)
+        groups = []
+        for combo in itertools.product((EXACT, WILDCARD, MISS), repeat=len(dims)):
+            bits = candidates
+            for dim, level in zip(dims, combo):
+                bits &= levels[dim][level]
+                if not bits:
+                    break
+            if bits:
+                score = sum(WEIGHTS[dim] * credit[level] for dim, level in zip(dims, combo))
+                groups.append((score, combo, bits))
+
+        # Normalizza sul massimo ottenibile con le dimensioni fornite
+        max_score = sum(WEIGHTS[dim] for dim in dims) or 1.0
+        groups.sort(key=lambda g: g[0], reverse=True)
+
+        results = []
+        for score, combo, bits in groups:
+            matched = [dim for dim, level in zip(dims, combo) if level == EXACT]
+            for pos in _iter_bits_desc(bits):
+                results.append({
+                    "bando_id": self.ids[pos],
+                    "title": self.titles[pos],
+                    "url": self.urls[pos],
+                    "score": round(score / max_score, 4),
+                    "matched": matched,
+                    "expired": bool(self.expired_bits >> pos & 1),
+                })
+                if len(results) >= top_k:
+                    return results
+        return results
@@ -0,0 +1,77 @@
+"""
+jobs.py - Scheduled Jobs
+========================
+Un job per fonte / fase, ognuno con il proprio intervallo: una fonte lenta
+non ritarda più quelle veloci (prima: un unico `while True` seriale in
+scripts/legacy/monitor.py).
+
+Le fonti (Solr, RSS, Open Data, portali HTML) sono un job `source:<nome>`
+ciascuna, con lo schedule dichiarato in src/scraper/sources.toml. Gli
+intervalli degli altri job si cambiano da env (SCHEDULE_<JOB>_MINUTES, es.
+SCHEDULE_ANALYZE_MINUTES=30) senza toccare il codice. I job sono referenziati
+come "modulo:funzione" (+ args): il job store persistente salva solo il riferimento.
+
+sources.toml è letto solo da job_definitions() / get_job_definition(), mai
+all'import: un errore nel file non blocca chi importa questo modulo.
+"""
+
+import os
+import sys
+
+from src.utils.paths import BASE_DIR
+
+
+def run_analysis_job():
+    from src.analysis.analyzer import run_v2_analysis
+    return run_v2_analysis(limit=int(os.getenv("SCHEDULE_ANALYZE_LIMIT", "500")))
+
+
+def run_export_job():
+    sys.path.append(str(BASE_DIR / "scripts"))
+    from export_json import export_to_json
+    stats = export_to_json()
+    return {k: stats[k] for k in ("changed", "removed", "written", "deleted")}
+
+
+def run_index_job():
+    from src.search.semantic import run_index_sync
+    return run_index_sync()
+
+
+def run_expiry_job():
+    from src.scraper.expiry import run_expiry_refresh
+    return run_expiry_refresh()
+
+
+def _minutes(job_id: str, default: int) -> dict:
+    return {"trigger": "interval", "minutes": int(os.getenv(f"SCHEDULE_{job_id.upper()}_MINUTES", default))}
+
+
+def source_jobs() -> dict:
+    from src.scraper.registry import load_sources
+    return {
+        f"source:{source.name}": {"func": "src.scraper.registry:run_source", "args": [source.name], **source.schedule}
+        for source in load_sources() if source.enabled
+    }
+
+
+# id -> funzione + trigger APScheduler (senza le fonti: vedi job_definitions)
+JOB_DEFINITIONS = {
+    "analyze": {"func": "src.scheduler.jobs:run_analysis_job", **_minutes("analyze", 60)},
+    "export": {"func": "src.scheduler.jobs:run_export_job", **_minutes("export", 15)},
+    "index": {"func": "src.scheduler.jobs:run_index_job", **_minutes("index", 60)},
+    # Notturno: expired cambia al cambio di data
+    "expire": {"func": "src.scheduler.jobs:run_expiry_job", "trigger": "cron", "hour": 1, "minute": 5},
+}
+
+
+def job_definitions() -> dict:
+    """Tutti i job: uno per fonte abilitata in sources.toml + JOB_DEFINITIONS."""
+    return {**source_jobs(), **JOB_DEFINITIONS}
+
+
+def get_job_definition(job_id: str) -> dict:
+    """Un job; sources.toml è letto solo per i job source:<nome>. KeyError se sconosciuto."""
+    if job_id in JOB_DEFINITIONS:
+        return JOB_DEFINITIONS[job_id]
+    return source_jobs()[job_id]
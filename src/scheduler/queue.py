@@ -0,0 +1,167 @@
+"""
+queue.py - DB-backed Task Queue
+===============================
+Coda di task sulla tabella `jobs` dello stesso database: nessun broker
+esterno (Celery/Redis). Più worker, su più processi o macchine, si
+dividono i task in sicurezza:
+
+- Claim atomico: un solo UPDATE ... WHERE id = (SELECT ... LIMIT 1) RETURNING
+  - PostgreSQL: la subquery usa FOR UPDATE SKIP LOCKED, i worker non si
+    bloccano a vicenda sulla stessa riga
+  - SQLite: le scritture sono serializzate dal lock del database, lo stesso
+    UPDATE è atomico (il FOR UPDATE non viene emesso)
+- Priorità: priority più alta prima, poi FIFO
+- Visibility timeout: il claim assegna un lease (locked_until); un worker
+  morto a metà task non lo rinnova e il job torna in coda (requeue_expired)
+- Retry: backoff esponenziale fino a max_attempts, poi status 'failed'
+- Fencing: complete/fail valgono solo per il worker che ha ancora il lease
+
+Gli stati sono stringhe come in job_runs: queued, running, done, failed.
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import and_, case, func, select, update
+
+from src.scraper.models import Job
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+DEFAULT_VISIBILITY_TIMEOUT = 600  # secondi
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 3600
+
+
+def enqueue(session, task: str, payload: dict = None, priority: int = 0, max_attempts: int = 3,
+            key: Optional[str] = None, delay: float = 0) -> Optional[Job]:
+    """
+    Aggiunge un job (flush, il commit è del chiamante). Con `key`, se esiste già
+    un job in coda o in esecuzione con la stessa chiave non ne crea un altro.
+    """
+    if key is not None:
+        pending = session.query(Job.id).filter(Job.key == key, Job.status.in_((QUEUED, RUNNING))).first()
+        if pending:
+            return None
+    job = Job(
+        task=task, payload=payload or {}, priority=priority, max_attempts=max_attempts, key=key,
+        status=QUEUED, available_at=datetime.utcnow() + timedelta(seconds=delay),
+    )
+    session.add(job)
+    session.flush()
+    return job
+
+
+def claim(session, worker_id: str, tasks: Optional[Iterable[str]] = None,
+          visibility_timeout: float = DEFAULT_VISIBILITY_TIMEOUT, timeouts: Optional[Dict[str, float]] = None) -> Optional[dict]:
+    """
+    Prende il prossimo job disponibile e lo segna 'running' per `worker_id`.
+    `timeouts` (task -> secondi) sovrascrive il visibility timeout per task.
+    Restituisce {id, task, payload, attempts, max_attempts} o None se la coda è vuota.
+    """
+    now = datetime.utcnow()
+    lease = now + timedelta(seconds=visibility_timeout)
+    if timeouts:
+        lease = case({task: now + timedelta(seconds=s) for task, s in timeouts.items()}, value=Job.task, else_=lease)
+    candidate = (
+        select(Job.id)
+        .where(Job.status == QUEUED, Job.available_at <= now)
+        .order_by(Job.priority.desc(), Job.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+    if tasks:
+        candidate = candidate.where(Job.task.in_(list(tasks)))
+
+    row = session.execute(
+        update(Job)
+        .where(Job.id == candidate.scalar_subquery(), Job.status == QUEUED)
+        .values(
+            status=RUNNING, locked_by=worker_id, locked_until=lease,
+            attempts=Job.attempts + 1, started_at=now,
+        )
+        .returning(Job.id, Job.task, Job.payload, Job.attempts, Job.max_attempts)
+        .execution_options(synchronize_session=False)
+    ).first()
+    session.commit()
+    return dict(row._mapping) if row else None
+
+
+def complete(session, job_id: int, worker_id: str, result=None) -> bool:
+    done = session.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.locked_by == worker_id, Job.status == RUNNING)
+        .values(
+            status=DONE, finished_at=datetime.utcnow(), locked_until=None, last_error=None,
+            result=None if result is None else repr(result)[:500],
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    session.commit()
+    if not done:
+        logger.warning(f"⚠️ Job {job_id}: lease perso prima del completamento (visibility timeout?)")
+    return bool(done)
+
+
+def retry_delay(attempts: int) -> float:
+    return min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS)
+
+
+def fail(session, job_id: int, worker_id: str, error: str) -> Optional[str]:
+    """Errore del task: torna in coda con backoff, o 'failed' se i tentativi sono finiti."""
+    job = session.get(Job, job_id, populate_existing=True)
+    if job is None or job.locked_by != worker_id or job.status != RUNNING:
+        session.rollback()
+        return None
+    job.last_error = error
+    job.locked_until = None
+    if job.attempts >= job.max_attempts:
+        job.status = FAILED
+        job.finished_at = datetime.utcnow()
+    else:
+        job.status = QUEUED
+        job.available_at = datetime.utcnow() + timedelta(seconds=retry_delay(job.attempts))
+    session.commit()
+    return job.status
+
+
+def requeue_expired(session) -> int:
+    """
+    Job 'running' con lease scaduto (worker terminato o bloccato): tornano in
+    coda, o 'failed' se hanno esaurito i tentativi.
+    """
+    now = datetime.utcnow()
+    expired = and_(Job.status == RUNNING, Job.locked_until < now)
+    failed = session.execute(
+        update(Job).where(expired, Job.attempts >= Job.max_attempts)
+        .values(status=FAILED, finished_at=now, locked_until=None, last_error="visibility timeout expired")
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    requeued = session.execute(
+        update(Job).where(expired)
+        .values(status=QUEUED, locked_by=None, locked_until=None, available_at=now,
+                last_error="visibility timeout expired")
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    session.commit()
+    if failed or requeued:
+        logger.warning(f"⏰ Lease scaduti: {requeued} job rimessi in coda, {failed} falliti")
+    return failed + requeued
+
+
+def purge_finished(session, older_than_days: int = 7) -> int:
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    deleted = session.query(Job).filter(Job.status.in_((DONE, FAILED)), Job.finished_at < cutoff).delete(synchronize_session=False)
+    session.commit()
+    return deleted
+
+
+def queue_stats(session) -> dict:
+    """{task: {status: count}}"""
+    stats = {}
+    for task, status, count in session.query(Job.task, Job.status, func.count(Job.id)).group_by(Job.task, Job.status):
+        stats.setdefault(task, {})[status] = count
+    return stats
@@ -0,0 +1,236 @@
+"""
+service.py - Scheduler Service
+==============================
+APScheduler BackgroundScheduler configurato per i job di jobs.py:
+
+- Job store persistente (SQLAlchemyJobStore sulla stessa DATABASE_URL):
+  next_run_time sopravvive ai riavvii, un job in ritardo parte al restart
+- Thread pool con un worker per job: job indipendenti girano in parallelo
+- max_instances=1 + coalesce: un job ancora in corso non viene rilanciato,
+  le esecuzioni perse durante un fermo diventano una sola
+- Listener -> tabella job_runs: ogni esecuzione con stato e durata,
+  anche quelle saltate per sovrapposizione o perse (misfire)
+
+Un solo processo scheduler per database: APScheduler 3 non coordina più
+scheduler sullo stesso job store.
+
+Usage:
+    python scripts/manage.py scheduler             # avvia (blocca)
+    python scripts/manage.py scheduler --history   # ultime esecuzioni
+    python scripts/manage.py scheduler --run solr  # esegue un job ora
+"""
+
+import logging
+import time
+from datetime import datetime, timezone
+from traceback import format_exc
+from typing import Optional
+
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED
+from apscheduler.executors.pool import ThreadPoolExecutor
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+from apscheduler.util import ref_to_obj
+
+from src.scheduler.jobs import JOB_DEFINITIONS, get_job_definition, job_definitions
+from src.scraper.models import JobRun, create_tables, get_engine, get_session
+
+logger = logging.getLogger(__name__)
+
+MISFIRE_GRACE_SECONDS = 600
+TIMEZONE = "Europe/Rome"
+TRIGGERS = {"interval": IntervalTrigger, "cron": CronTrigger}
+
+
+def _utc_naive(moment):
+    if moment is None:
+        return None
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+class RunRecorder:
+    """Scrive una riga job_runs per esecuzione (thread-safe: una sessione per scrittura)."""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def _write(self, fn):
+        session = get_session(self.engine)
+        try:
+            result = fn(session)
+            session.commit()
+            return result
+        except Exception as e:
+            session.rollback()
+            logger.error(f"❌ job_runs write failed: {e}")
+        finally:
+            session.close()
+
+    def close_stale(self) -> int:
+        """Righe 'running' rimaste da un processo terminato male."""
+        def mark(session):
+            return session.query(JobRun).filter(JobRun.status == "running").update(
+                {"status": "interrupted", "finished_at": datetime.utcnow()}
+            )
+        return self._write(mark) or 0
+
+    def run(self, job_id: str, scheduled=None):
+        """Esegue il job nel thread corrente registrando inizio, fine, durata ed esito."""
+        def insert(session):
+            run = JobRun(job_id=job_id, status="running", scheduled_at=_utc_naive(scheduled), started_at=datetime.utcnow())
+            session.add(run)
+            session.flush()
+            return run.id
+        run_id = self._write(insert)
+        started = time.perf_counter()
+        result, error = None, None
+        try:
+            definition = get_job_definition(job_id)
+            result = ref_to_obj(definition["func"])(*definition.get("args", ()))
+            return result
+        except Exception:
+            error = format_exc()
+            raise
+        finally:
+            duration = time.perf_counter() - started
+
+            def update(session):
+                run = session.get(JobRun, run_id)
+                run.finished_at = datetime.utcnow()
+                run.duration_s = round(duration, 3)
+                run.status = "error" if error else "success"
+                run.error = error
+                run.result = None if result is None else repr(result)[:500]
+            if run_id is not None:
+                self._write(update)
+            logger.info(f"⏱️ Job {job_id}: {'❌ error' if error else '✅ done'} in {duration:.1f}s")
+
+    def skipped(self, job_id: str, scheduled, status: str, error: Optional[str] = None):
+        now = datetime.utcnow()
+        self._write(lambda session: session.add(JobRun(
+            job_id=job_id, status=status, scheduled_at=_utc_naive(scheduled), started_at=now, finished_at=now, error=error,
+        )))
+        logger.warning(f"⏭️ Job {job_id}: {status}")
+
+    def __call__(self, event):
+        """Listener APScheduler per le esecuzioni che non partono."""
+        if event.code == EVENT_JOB_MAX_INSTANCES:
+            # Il run precedente è ancora in corso: nessuna sovrapposizione
+            for scheduled in event.scheduled_run_times:
+                self.skipped(event.job_id, scheduled, "skipped", "previous run still in progress")
+        elif event.code == EVENT_JOB_MISSED:
+            self.skipped(event.job_id, event.scheduled_run_time, "missed")
+
+
+_recorder: Optional[RunRecorder] = None
+
+
+def _get_recorder() -> RunRecorder:
+    global _recorder
+    if _recorder is None:
+        _recorder = RunRecorder(get_engine())
+    return _recorder
+
+
+def execute(job_id: str):
+    """
+    Entry point salvato nel job store per ogni job ("service:execute", args=[id]):
+    la funzione vera è risolta da get_job_definition() a ogni esecuzione.
+    """
+    return _get_recorder().run(job_id)
+
+
+def build_scheduler(engine=None, max_workers: Optional[int] = None) -> BackgroundScheduler:
+    engine = engine or get_engine()
+    create_tables(engine)
+
+    scheduler = BackgroundScheduler(
+        jobstores={"default": SQLAlchemyJobStore(engine=engine, tablename="apscheduler_jobs")},
+        executors={"default": ThreadPoolExecutor(max_workers=max_workers or len(JOB_DEFINITIONS))},
+        job_defaults={"coalesce": True, "max_instances": 1, "misfire_grace_time": MISFIRE_GRACE_SECONDS},
+        timezone=TIMEZONE,
+    )
+    global _recorder
+    _recorder = RunRecorder(engine)
+    scheduler.add_listener(_recorder, EVENT_JOB_MAX_INSTANCES | EVENT_JOB_MISSED)
+    return scheduler
+
+
+def sync_jobs(scheduler: BackgroundScheduler, definitions: Optional[dict] = None):
+    """
+    Allinea il job store a job_definitions(). Un job con lo stesso trigger
+    mantiene il next_run_time salvato; i job non più definiti vengono rimossi.
+    """
+    definitions = definitions if definitions is not None else job_definitions()
+    stored = {job.id: job for job in scheduler.get_jobs()}
+    for job_id, definition in definitions.items():
+        definition = dict(definition)
+        definition.pop("func")
+        definition.pop("args", None)  # passati da RunRecorder.run, non dal job store
+        trigger = TRIGGERS[definition.pop("trigger")](timezone=TIMEZONE, **definition)
+        job = stored.pop(job_id, None)
+        if job is not None and str(job.trigger) == str(trigger):
+            continue
+        scheduler.add_job("src.scheduler.service:execute", trigger, args=[job_id], id=job_id, name=job_id, replace_existing=True)
+        logger.info(f"📅 Job {job_id}: {trigger}")
+    for job_id in stored:
+        scheduler.remove_job(job_id)
+        logger.info(f"🗑️ Job {job_id} rimosso (non più definito)")
+
+
+def run_scheduler():
+    print("=" * 70)
+    print("📅 SCHEDULER - job periodici")
+    print("=" * 70)
+    definitions = job_definitions()
+    scheduler = build_scheduler(max_workers=len(definitions))
+    stale = _get_recorder().close_stale()
+    if stale:
+        logger.warning(f"⚠️ {stale} esecuzioni interrotte dal riavvio")
+
+    scheduler.start(paused=True)
+    sync_jobs(scheduler, definitions)
+    scheduler.resume()
+    for job in scheduler.get_jobs():
+        print(f"   {job.id:<10} prossima esecuzione: {job.next_run_time}")
+
+    try:
+        while True:
+            time.sleep(1)
+    except (KeyboardInterrupt, SystemExit):
+        print("\n🛑 Arresto: attendo la fine dei job in corso...")
+        scheduler.shutdown(wait=True)
+
+
+def run_job_now(job_id: str):
+    """Esegue subito un job nel processo corrente, registrandolo in job_runs."""
+    try:
+        get_job_definition(job_id)
+    except KeyError:
+        raise SystemExit(f"Job sconosciuto: {job_id} (disponibili: {', '.join(job_definitions())})")
+    create_tables(get_engine())
+    return _get_recorder().run(job_id, scheduled=datetime.now(timezone.utc))
+
+
+def print_history(limit: int = 30):
+    engine = get_engine()
+    create_tables(engine)
+    session = get_session(engine)
+    runs = session.query(JobRun).order_by(JobRun.id.desc()).limit(limit).all()
+    print(f"{'job':<10} {'status':<12} {'started (UTC)':<20} {'duration':>10}  result")
+    for run in runs:
+        started = run.started_at.strftime("%Y-%m-%d %H:%M:%S") if run.started_at else "-"
+        duration = f"{run.duration_s:.1f}s" if run.duration_s is not None else "-"
+        # Per gli errori basta l'ultima riga del traceback
+        detail = run.result or (run.error.strip().splitlines()[-1] if run.error else "")
+        print(f"{run.job_id:<10} {run.status:<12} {started:<20} {duration:>10}  {detail}"[:160])
+    session.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    run_scheduler()
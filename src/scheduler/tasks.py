@@ -0,0 +1,110 @@
+"""
+tasks.py - Queue Tasks
+======================
+Task eseguibili dai worker della coda (`manage.py worker`) e i producer
+che li accodano (`manage.py enqueue`).
+
+- fetch-detail  {"ids": [...]}  deep fetch delle pagine di dettaglio
+- analyze       {"ids": [...]}  analisi AI (solo i bandi ancora da analizzare)
+- export        {}              export JSON incrementale (uno alla volta: key "export")
+
+I task sono idempotenti: un job ripetuto dopo un errore o un lease scaduto
+salta il lavoro già fatto (detail_fetched_at, fingerprint dell'analisi).
+"""
+
+import hashlib
+import sys
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List
+
+from src.scheduler.queue import enqueue
+from src.scraper.models import Bando
+from src.utils.paths import BASE_DIR
+
+
+@dataclass(frozen=True)
+class TaskSpec:
+    func: Callable[[dict], Any]
+    visibility_timeout: int  # secondi: oltre, il job torna in coda
+    max_attempts: int = 3
+    priority: int = 0
+    batch_size: int = 1
+
+
+def fetch_detail_task(payload: dict):
+    from src.scraper.detail import fetch_details
+    return fetch_details(payload["ids"])
+
+
+def analyze_task(payload: dict):
+    # Import lazy: l'analyzer richiede GEMINI_API_KEY all'import
+    from src.analysis.analyzer import analyze_ids
+    return analyze_ids(payload["ids"], force=payload.get("force", False))
+
+
+def export_task(payload: dict):
+    sys.path.append(str(BASE_DIR / "scripts"))
+    from export_json import export_to_json
+    stats = export_to_json(full=payload.get("full", False))
+    return {k: stats[k] for k in ("changed", "removed", "written", "deleted")}
+
+
+TASKS: Dict[str, TaskSpec] = {
+    # Il dettaglio alimenta l'analisi: prima nella coda
+    "fetch-detail": TaskSpec(fetch_detail_task, visibility_timeout=900, priority=20, batch_size=50),
+    # ~4 s per bando (rate limit Gemini) + eventuali repair
+    "analyze": TaskSpec(analyze_task, visibility_timeout=1800, priority=10, batch_size=20),
+    "export": TaskSpec(export_task, visibility_timeout=900, priority=0),
+}
+
+
+def _chunks(ids: List[int], size: int):
+    for offset in range(0, len(ids), size):
+        yield ids[offset:offset + size]
+
+
+def _batch_key(task: str, ids: List[int]) -> str:
+    digest = hashlib.sha256(",".join(map(str, ids)).encode()).hexdigest()[:16]
+    return f"{task}:{digest}"
+
+
+def _enqueue_batches(session, task: str, ids: List[int], batch_size: int = None, priority: int = None, **extra) -> int:
+    spec = TASKS[task]
+    created = 0
+    for chunk in _chunks(ids, batch_size or spec.batch_size):
+        job = enqueue(
+            session, task, {"ids": chunk, **extra}, key=_batch_key(task, chunk),
+            priority=spec.priority if priority is None else priority, max_attempts=spec.max_attempts,
+        )
+        created += job is not None
+    session.commit()
+    return created
+
+
+def enqueue_fetch_details(session, batch_size: int = None, priority: int = None) -> int:
+    from src.scraper.detail import needs_detail_filter
+    ids = [bando_id for (bando_id,) in session.query(Bando.id).filter(needs_detail_filter()).order_by(Bando.id.desc())]
+    return _enqueue_batches(session, "fetch-detail", ids, batch_size, priority)
+
+
+def enqueue_analysis(session, batch_size: int = None, priority: int = None, force: bool = False) -> int:
+    from src.analysis.analyzer import PROMPT_VERSION
+    from src.analysis.planner import plan_analysis
+    ids = plan_analysis(session, PROMPT_VERSION, force=force).ids
+    extra = {"force": True} if force else {}
+    return _enqueue_batches(session, "analyze", ids, batch_size, priority, **extra)
+
+
+def enqueue_export(session, priority: int = None, full: bool = False) -> int:
+    spec = TASKS["export"]
+    job = enqueue(session, "export", {"full": full}, key="export",
+                  priority=spec.priority if priority is None else priority, max_attempts=spec.max_attempts)
+    session.commit()
+    return int(job is not None)
+
+
+PRODUCERS = {
+    "fetch-detail": enqueue_fetch_details,
+    "analyze": enqueue_analysis,
+    "export": enqueue_export,
+}
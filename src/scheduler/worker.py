@@ -0,0 +1,145 @@
+"""
+worker.py - Queue Workers
+=========================
+Processi che prendono i job dalla tabella `jobs` (src/scheduler/queue.py)
+e li eseguono. Si scala aggiungendo processi (--concurrency N) o macchine
+che puntano alla stessa DATABASE_URL: il claim atomico garantisce che ogni
+job venga preso da un solo worker.
+
+- Un processo per worker (spawn): engine e sessione propri, niente GIL
+  condiviso tra parsing HTML, export e chiamate LLM
+- SIGTERM / Ctrl+C: il worker finisce il job corrente e si ferma
+- Ogni REAP_INTERVAL secondi rimette in coda i job con lease scaduto
+- --burst: esce quando la coda è vuota (cron, CI, backfill)
+
+Nota: ogni worker `analyze` applica il proprio rate limit verso Gemini,
+N worker analyze = N volte le richieste al minuto.
+
+Usage:
+    python scripts/manage.py worker --concurrency 4
+    python scripts/manage.py worker --tasks analyze --burst
+"""
+
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from traceback import format_exc
+from typing import List, Optional
+
+from src.scheduler import queue
+from src.scheduler.tasks import TASKS
+from src.scraper.models import create_tables, get_engine, get_session
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 1.0      # secondi, raddoppia fino a MAX_POLL_INTERVAL a coda vuota
+MAX_POLL_INTERVAL = 15.0
+REAP_INTERVAL = 60.0
+
+
+class Worker:
+    def __init__(self, tasks: Optional[List[str]] = None, worker_id: Optional[str] = None, burst: bool = False):
+        unknown = set(tasks or ()) - set(TASKS)
+        if unknown:
+            raise ValueError(f"Task sconosciuti: {', '.join(sorted(unknown))} (disponibili: {', '.join(TASKS)})")
+        self.tasks = list(tasks) if tasks else list(TASKS)
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.burst = burst
+        self.timeouts = {name: TASKS[name].visibility_timeout for name in self.tasks}
+        self.stopping = False
+        self.processed = 0
+
+    def stop(self, *_):
+        if not self.stopping:
+            logger.info(f"🛑 Worker {self.worker_id}: stop richiesto, termino il job corrente")
+        self.stopping = True
+
+    def run(self) -> int:
+        engine = get_engine()
+        session = get_session(engine)
+        idle = POLL_INTERVAL
+        last_reap = 0.0
+        logger.info(f"👷 Worker {self.worker_id} avviato (task: {', '.join(self.tasks)})")
+        try:
+            while not self.stopping:
+                if time.monotonic() - last_reap > REAP_INTERVAL:
+                    queue.requeue_expired(session)
+                    last_reap = time.monotonic()
+
+                job = queue.claim(session, self.worker_id, self.tasks, timeouts=self.timeouts)
+                if job is None:
+                    if self.burst:
+                        break
+                    time.sleep(idle)
+                    idle = min(idle * 2, MAX_POLL_INTERVAL)
+                    continue
+                idle = POLL_INTERVAL
+                self.execute(session, job)
+        finally:
+            session.close()
+            engine.dispose()
+        logger.info(f"👋 Worker {self.worker_id}: {self.processed} job eseguiti")
+        return self.processed
+
+    def execute(self, session, job: dict):
+        label = f"{job['task']} #{job['id']} (tentativo {job['attempts']}/{job['max_attempts']})"
+        logger.info(f"▶️ {label}")
+        started = time.perf_counter()
+        try:
+            result = TASKS[job["task"]].func(job["payload"] or {})
+        except Exception as e:
+            session.rollback()
+            status = queue.fail(session, job["id"], self.worker_id, format_exc())
+            logger.error(f"❌ {label}: {e} -> {status}")
+        else:
+            queue.complete(session, job["id"], self.worker_id, result)
+            logger.info(f"✅ {label} in {time.perf_counter() - started:.1f}s: {result}")
+        self.processed += 1
+
+
+def _worker_main(tasks: Optional[List[str]], burst: bool):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    worker = Worker(tasks, burst=burst)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run()
+
+
+def run_workers(concurrency: int = 1, tasks: Optional[List[str]] = None, burst: bool = False):
+    print("=" * 70)
+    print(f"👷 QUEUE WORKERS - concurrency {concurrency}")
+    print("=" * 70)
+    create_tables(get_engine())
+
+    if concurrency <= 1:
+        _worker_main(tasks, burst)
+        return
+
+    ctx = multiprocessing.get_context("spawn")
+    processes = [ctx.Process(target=_worker_main, args=(tasks, burst), name=f"worker-{i + 1}") for i in range(concurrency)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        # Ctrl+C arriva anche ai figli (stesso process group): attendo che chiudano il job corrente
+        for process in processes:
+            process.join()
+
+
+def print_queue_stats():
+    engine = get_engine()
+    create_tables(engine)
+    session = get_session(engine)
+    stats = queue.queue_stats(session)
+    session.close()
+    if not stats:
+        print("Coda vuota.")
+        return
+    print(f"{'task':<14} {'queued':>8} {'running':>8} {'done':>8} {'failed':>8}")
+    for task, counts in sorted(stats.items()):
+        print(f"{task:<14} " + " ".join(f"{counts.get(s, 0):>8}" for s in (queue.QUEUED, queue.RUNNING, queue.DONE, queue.FAILED)))
@@ -0,0 +1,187 @@
+"""
+browser.py - Headless Browser Pool
+==================================
+Portali renderizzati in JavaScript (catalogo incentivi.gov.it, portali
+regionali senza API). Prima: un Chromium nuovo a ogni giro, time.sleep fissi,
+wait_for_selector duplicati e una card alla volta
+(scripts/legacy/gov_html_ingest.py).
+
+- BrowserPool:      un solo Chromium e `size` contesti riusati tra le pagine
+                    (il consenso cookie resta nel contesto); immagini, font,
+                    media e analytics bloccati prima che partano
+- scrape_listing(): pagina elenco con "carica altri" -> HTML renderizzato;
+                    si attende l'evento (selettore presente, numero di card
+                    cresciuto), mai un tempo fisso
+- fetch_texts():    pagine di dettaglio in parallelo, una per contesto libero
+
+Il connettore `html-browser` del registro fonti (registry.py) usa questi
+pezzi: elenco -> scarto dei bandi noti -> dettaglio solo dei nuovi.
+"""
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+from playwright.async_api import Error as PlaywrightError
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from playwright.async_api import async_playwright
+
+from src.scraper.detail import USER_AGENT, html_to_text
+from src.utils.ratelimit import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+NAV_TIMEOUT = 30000       # ms, goto
+SELECTOR_TIMEOUT = 15000  # ms, attese su selettori / condizioni
+MAX_CLICKS = 50           # "carica altri" al massimo per elenco
+
+BLOCKED_RESOURCES = {"image", "font", "media"}
+BLOCKED_HOSTS = (
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net",
+    "facebook.net", "hotjar.com", "matomo.cloud", "webanalytics.italia.it",
+)
+
+
+class BrowserPool:
+    """
+    Un Chromium, `size` BrowserContext. page() presta un contesto libero:
+    al massimo `size` pagine aperte insieme, i contesti (cookie, cache HTTP)
+    sopravvivono tra una pagina e l'altra.
+    """
+
+    def __init__(self, size: int = 4, headless: bool = True, blocked_hosts=BLOCKED_HOSTS):
+        self.size = size
+        self.headless = headless
+        self.blocked_hosts = tuple(blocked_hosts)
+        self.stats = {"requests": 0, "blocked": 0, "pages": 0}
+        self._playwright = None
+        self._browser = None
+        self._contexts: Optional[asyncio.Queue] = None
+
+    async def start(self) -> "BrowserPool":
+        self._playwright = await async_playwright().start()
+        self._browser = await self._playwright.chromium.launch(headless=self.headless)
+        self._contexts = asyncio.Queue()
+        for _ in range(self.size):
+            context = await self._browser.new_context(user_agent=USER_AGENT, locale="it-IT", service_workers="block")
+            context.set_default_navigation_timeout(NAV_TIMEOUT)
+            context.set_default_timeout(SELECTOR_TIMEOUT)
+            await context.route("**/*", self._route)
+            self._contexts.put_nowait(context)
+        return self
+
+    async def close(self):
+        if self._browser is not None:
+            await self._browser.close()
+        if self._playwright is not None:
+            await self._playwright.stop()
+        self._browser = self._playwright = None
+
+    async def __aenter__(self) -> "BrowserPool":
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def is_blocked(self, resource_type: str, url: str) -> bool:
+        host = urlparse(url).hostname or ""
+        return resource_type in BLOCKED_RESOURCES or any(host == h or host.endswith("." + h) for h in self.blocked_hosts)
+
+    async def _route(self, route):
+        request = route.request
+        self.stats["requests"] += 1
+        if self.is_blocked(request.resource_type, request.url):
+            self.stats["blocked"] += 1
+            await route.abort("blockedbyclient")
+        else:
+            await route.continue_()
+
+    @asynccontextmanager
+    async def page(self):
+        context = await self._contexts.get()
+        page = await context.new_page()
+        self.stats["pages"] += 1
+        try:
+            yield page
+        finally:
+            await page.close()
+            self._contexts.put_nowait(context)
+
+
+async def _accept_overlay(page, label: str):
+    """
+    Banner cookie: il click parte solo se il banner compare e copre
+    un'azione (locator handler), poi Playwright attende che sparisca.
+    """
+    button = page.get_by_role("button", name=label, exact=True).or_(page.get_by_text(label, exact=True)).first
+
+    async def click():
+        await button.click()
+
+    await page.add_locator_handler(button, click)
+
+
+async def scrape_listing(pool: BrowserPool, url: str, item: str, load_more: Optional[str] = None,
+                         cookie: Optional[str] = None, max_clicks: int = MAX_CLICKS) -> Optional[str]:
+    """
+    Apre l'elenco, clicca `load_more` finché è visibile e fa crescere il
+    numero di `item`; ritorna l'HTML renderizzato (None se la pagina non si
+    apre o non compare nulla).
+    """
+    async with pool.page() as page:
+        if cookie:
+            await _accept_overlay(page, cookie)
+        try:
+            await page.goto(url, wait_until="domcontentloaded")
+        except PlaywrightError as e:
+            # Timeout / errore di rete: salta questa pagina, non l'intera fonte
+            logger.warning(f"⚠️ Elenco {url} non raggiungibile: {e}")
+            return None
+        try:
+            await page.wait_for_selector(item)
+        except PlaywrightTimeoutError:
+            logger.warning(f"⚠️ Nessun '{item}' su {url}")
+            return None
+
+        button = page.locator(load_more).first if load_more else None
+        for _ in range(max_clicks):
+            if button is None or not await button.is_visible():
+                break
+            count = await page.locator(item).count()
+            try:
+                await button.click()
+                await page.wait_for_function(
+                    "([selector, count]) => document.querySelectorAll(selector).length > count",
+                    arg=[item, count],
+                )
+            except PlaywrightError as e:
+                # Si tiene quanto caricato finora
+                logger.warning(f"⚠️ {url}: '{load_more}' non ha caricato altre card: {e}")
+                break
+        return await page.content()
+
+
+async def fetch_texts(pool: BrowserPool, urls: List[str], content: str = "body", ready: Optional[str] = None,
+                      limiter: Optional[RateLimiter] = None) -> Dict[str, Optional[str]]:
+    """
+    Pagine di dettaglio in parallelo (una per contesto): url -> testo di `content`.
+    `ready`: selettore che compare a rendering finito (default: `content`).
+    """
+    loop = asyncio.get_running_loop()
+
+    async def fetch_one(url: str) -> Optional[str]:
+        if limiter is not None:
+            await loop.run_in_executor(None, limiter.wait)
+        async with pool.page() as page:
+            try:
+                await page.goto(url, wait_until="domcontentloaded")
+                await page.wait_for_selector(ready or content, state="attached")
+                return html_to_text(await page.inner_html(content))
+            except PlaywrightError as e:
+                logger.warning(f"Deep Fetch failed for {url}: {e}")
+                return None
+
+    texts = await asyncio.gather(*[fetch_one(url) for url in urls])
+    return dict(zip(urls, texts))
@@ -0,0 +1,180 @@
+"""
+dedup.py - Near-Duplicate Detection (MinHash / LSH)
+===================================================
+Lo stesso incentivo arriva da Solr, RSS e portali HTML con URL diversi:
+`url_hash` non basta a riconoscerlo e ogni copia verrebbe analizzata (a pagamento).
+
+- Testo normalizzato: titolo + contenuto, minuscolo, senza punteggiatura
+- Shingle di 3 parole -> firma MinHash a NUM_PERM permutazioni
+- LSH: la firma è divisa in BANDS bande da ROWS valori; due bandi che
+  condividono almeno una banda sono candidati (soglia ~ (1/BANDS)^(1/ROWS) ≈ 0.71)
+- Verifica: Jaccard stimata dalle firme >= SIMILARITY_THRESHOLD
+
+Le bande sono persistite in `lsh_bands` (indice su band_key): il controllo
+all'ingest è una lookup per chiave, non un confronto con tutto il catalogo.
+Quando il deep fetch (detail.py) sostituisce l'estratto con la pagina intera
+firma e bande vengono ricalcolate.
+Un bando riconosciuto come copia riceve `canonical_id` e non passa dall'analisi AI.
+"""
+
+import hashlib
+import logging
+import re
+import struct
+from typing import List, Optional
+
+import numpy as np
+
+from src.scraper.models import Bando, LshBand
+
+logger = logging.getLogger(__name__)
+
+NUM_PERM = 128
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+SIMILARITY_THRESHOLD = 0.8
+
+# Hash universali (a*x + b) mod P su shingle a 32 bit: P primo > 2^32, a*x sta in uint64
+_PRIME = np.uint64(4294967311)
+_rng = np.random.RandomState(1)
+_A = _rng.randint(1, 2**32 - 1, size=NUM_PERM, dtype=np.uint64)
+_B = _rng.randint(0, 2**32 - 1, size=NUM_PERM, dtype=np.uint64)
+
+# Marcatori aggiunti dagli ingestor, non fanno parte del contenuto
+_NOISE = re.compile(r'\[rss only\]|apertura: \S+|chiusura: \S+')
+_NON_WORD = re.compile(r'[^\w]+')
+
+
+def normalize_text(title: Optional[str], content: Optional[str]) -> List[str]:
+    """Parole normalizzate di titolo + contenuto."""
+    text = f"{title or ''} {content or ''}".lower()
+    text = _NOISE.sub(' ', text)
+    return [w for w in _NON_WORD.sub(' ', text).split() if w]
+
+
+def shingles(words: List[str], size: int = SHINGLE_SIZE) -> np.ndarray:
+    """Hash a 32 bit degli shingle di `size` parole (testi corti: un solo shingle)."""
+    if len(words) < size:
+        grams = {" ".join(words)} if words else set()
+    else:
+        grams = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+    return np.array(
+        [struct.unpack('<I', hashlib.blake2b(g.encode('utf-8'), digest_size=4).digest())[0] for g in grams],
+        dtype=np.uint64,
+    )
+
+
+def minhash_signature(title: Optional[str], content: Optional[str]) -> Optional[List[int]]:
+    """Firma MinHash (NUM_PERM interi). None se il testo è vuoto."""
+    values = shingles(normalize_text(title, content))
+    if not len(values):
+        return None
+    hashed = (values[:, None] * _A[None, :] + _B[None, :]) % _PRIME
+    return hashed.min(axis=0).astype(np.int64).tolist()
+
+
+def band_keys(signature: List[int]) -> List[str]:
+    """Una chiave per banda: numero banda + hash delle ROWS righe."""
+    keys = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS:(band + 1) * ROWS]
+        digest = hashlib.blake2b(struct.pack(f'<{ROWS}q', *rows), digest_size=8).hexdigest()
+        keys.append(f"{band:02d}{digest}")
+    return keys
+
+
+def estimate_similarity(a: List[int], b: List[int]) -> float:
+    """Jaccard stimata: frazione di permutazioni con lo stesso minimo."""
+    return float(np.mean(np.asarray(a) == np.asarray(b)))
+
+
+def find_canonical(session, signature: List[int], exclude_id: Optional[int] = None) -> Optional[int]:
+    """
+    Id del bando canonico di cui `signature` è una copia, o None.
+    Se il candidato più simile è a sua volta una copia, ritorna il suo canonico.
+    """
+    keys = band_keys(signature)
+    candidate_ids = {
+        bando_id for (bando_id,) in
+        session.query(LshBand.bando_id).filter(LshBand.band_key.in_(keys)).distinct()
+    }
+    candidate_ids.discard(exclude_id)
+    if not candidate_ids:
+        return None
+
+    best_id, best_score = None, 0.0
+    rows = (
+        session.query(Bando.id, Bando.canonical_id, Bando.minhash)
+        .filter(Bando.id.in_(candidate_ids))
+        .order_by(Bando.id)
+    )
+    for bando_id, canonical_id, other in rows:
+        if not other:
+            continue
+        score = estimate_similarity(signature, other)
+        if score >= SIMILARITY_THRESHOLD and score > best_score:
+            best_id, best_score = canonical_id or bando_id, score
+    return best_id
+
+
+def register(session, bando: Bando, signature: Optional[List[int]] = None) -> Optional[int]:
+    """
+    Calcola la firma di un bando, lo collega al canonico se è una copia e
+    salva le sue bande LSH. Il bando deve avere un id (session.flush()).
+    Richiamato quando raw_content cambia (deep fetch): le bande precedenti
+    vengono sostituite. Ritorna il canonical_id assegnato (None = bando originale).
+    """
+    session.query(LshBand).filter(LshBand.bando_id == bando.id).delete(synchronize_session=False)
+    signature = signature or minhash_signature(bando.title, bando.raw_content)
+    if signature is None:
+        bando.minhash = None
+        return None
+
+    canonical_id = find_canonical(session, signature, exclude_id=bando.id)
+    bando.minhash = signature
+    bando.canonical_id = canonical_id
+    session.add_all(LshBand(band_key=key, bando_id=bando.id) for key in band_keys(signature))
+    if canonical_id:
+        # Le sue eventuali copie passano al nuovo canonico (niente catene)
+        session.query(Bando).filter(Bando.canonical_id == bando.id).update(
+            {Bando.canonical_id: canonical_id}, synchronize_session=False
+        )
+        logger.info(f"🔁 Near-duplicate: bando {bando.id} -> canonico {canonical_id}")
+    return canonical_id
+
+
+def backfill_signatures(session, batch_size: int = 500) -> int:
+    """
+    Indicizza i bandi esistenti senza firma, dal più vecchio: a parità di
+    contenuto il canonico è il primo bando importato. Ritorna i duplicati trovati.
+    """
+    ids = [bando_id for (bando_id,) in session.query(Bando.id).filter(Bando.minhash.is_(None)).order_by(Bando.id)]
+    duplicates = 0
+    for start in range(0, len(ids), batch_size):
+        for bando in session.query(Bando).filter(Bando.id.in_(ids[start:start + batch_size])).order_by(Bando.id).all():
+            if register(session, bando):
+                duplicates += 1
+            session.flush()
+        session.commit()
+    return duplicates
+
+
+def run_dedup():
+    """Indicizza tutto il catalogo e riporta i duplicati trovati."""
+    from src.scraper.models import init_db
+
+    print("=" * 70)
+    print("🔁 NEAR-DUPLICATE INDEX - MinHash / LSH")
+    print("=" * 70)
+    session = init_db()
+    duplicates = backfill_signatures(session)
+    total = session.query(Bando).filter(Bando.canonical_id.isnot(None)).count()
+    print(f"   🔁 Nuovi duplicati:  {duplicates}")
+    print(f"   📚 Duplicati totali: {total}")
+    return duplicates
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    run_dedup()
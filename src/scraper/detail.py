@@ -0,0 +1,113 @@
+"""
+detail.py - Deep Fetch delle pagine di dettaglio
+================================================
+Solr e RSS danno solo un estratto (card HTML, descrizione del feed): il
+testo completo del bando è nella pagina di dettaglio. Qui la pagina viene
+scaricata e ripulita (script, menu, footer) e il testo sostituisce
+raw_content, così l'analisi AI lavora sul bando intero.
+
+- fetch_detail_text(url): una pagina -> testo (None se vuota / bloccata)
+- html_to_text(html):     pulizia condivisa con le pagine renderizzate (browser.py)
+- fetch_details(ids):     task `fetch-detail` della coda (src/scheduler/tasks.py)
+
+Ogni bando tentato riceve detail_fetched_at: una pagina che non dà testo
+utile non viene riscaricata a ogni giro.
+"""
+
+import logging
+from datetime import datetime
+from typing import Iterable, Optional
+
+import requests
+from bs4 import BeautifulSoup
+from sqlalchemy import and_, func, or_
+
+from src.scraper.dedup import register as register_near_duplicate
+from src.scraper.models import Bando, init_db
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+DETAIL_TIMEOUT = 10
+MIN_TEXT_CHARS = 200      # sotto: pagina vuota o soft block
+MAX_TEXT_CHARS = 50000    # cap per il DB
+SHORT_CONTENT_CHARS = 1000  # raw_content più corto = solo estratto, serve il dettaglio
+RSS_ONLY_MARKER = "[RSS ONLY]"
+
+
+def fetch_detail_text(url: str, http: Optional[requests.Session] = None) -> Optional[str]:
+    """Scarica la pagina ed estrae il testo visibile."""
+    # PDF: serve OCR / parsing dedicato, non qui
+    if not url or url.lower().endswith('.pdf'):
+        return None
+    try:
+        resp = (http or requests).get(url, headers={'User-Agent': USER_AGENT}, timeout=DETAIL_TIMEOUT)
+        if resp.status_code != 200:
+            return None
+        return html_to_text(resp.text)
+    except Exception as e:
+        logger.warning(f"Deep Fetch failed for {url}: {e}")
+    return None
+
+
+def html_to_text(html: str) -> Optional[str]:
+    """Testo visibile senza script, menu e footer (anche per l'HTML renderizzato dal browser)."""
+    soup = BeautifulSoup(html, 'html.parser')
+    for garbage in soup(['script', 'style', 'nav', 'footer', 'header', 'aside']):
+        garbage.decompose()
+    text = soup.get_text(separator=' ', strip=True)
+    if len(text) < MIN_TEXT_CHARS:
+        return None
+    return text[:MAX_TEXT_CHARS]
+
+
+def needs_detail_filter():
+    """Bandi con solo l'estratto di Solr / RSS e mai passati dal deep fetch."""
+    return and_(
+        Bando.detail_fetched_at.is_(None),
+        Bando.canonical_id.is_(None),
+        or_(
+            Bando.raw_content.is_(None),
+            func.length(Bando.raw_content) < SHORT_CONTENT_CHARS,
+            Bando.raw_content.startswith(RSS_ONLY_MARKER),
+        ),
+    )
+
+
+def merge_content(current: Optional[str], text: str) -> str:
+    """Mantiene la riga di metadati del fetcher Solr ("Apertura: ... | Chiusura: ...")."""
+    if current and current.startswith(("Apertura:", "Chiusura:")):
+        header = current.split("\n", 1)[0]
+        return f"{header}\n\n{text}"
+    return text
+
+
+def fetch_details(ids: Iterable[int], force: bool = False) -> dict:
+    """
+    Deep fetch di un gruppo di bandi; un solo commit alla fine.
+    I bandi già tentati vengono saltati (un job ripetuto non riscarica tutto).
+    """
+    session = init_db()
+    http = requests.Session()
+    stats = {"fetched": 0, "empty": 0, "near_duplicates": 0}
+    try:
+        query = session.query(Bando).filter(Bando.id.in_(list(ids)))
+        if not force:
+            query = query.filter(Bando.detail_fetched_at.is_(None))
+        for bando in query:
+            text = fetch_detail_text(bando.url, http)
+            bando.detail_fetched_at = datetime.utcnow()
+            if text and len(text) > len(bando.raw_content or ""):
+                # raw_content cambia: il planner lo ri-analizza (fingerprint diverso)
+                bando.raw_content = merge_content(bando.raw_content, text)
+                # Firma / bande LSH dal testo completo, non più dall'estratto
+                if register_near_duplicate(session, bando):
+                    stats["near_duplicates"] += 1
+                stats["fetched"] += 1
+            else:
+                stats["empty"] += 1
+        session.commit()
+    finally:
+        session.close()
+        http.close()
+    return stats
@@ -92,22 +92,23 @@ def extract_financial_values(item: dict) -> tuple:
     return financial_min, financial_max
 
 
-def run_enrichment(dry_run: bool = False):
+def run_enrichment(dry_run: bool = False, opendata_path: Path = OPENDATA_PATH):
     """
     Main enrichment function.
     Carica Open Data JSON e arricchisce i record nel database.
     """
+    opendata_path = Path(opendata_path)
     print("=" * 70)
     print("🔄 DATA ENRICHMENT - Open Data Merge")
     print("=" * 70)
     
     # 1. Load Open Data JSON
-    if not OPENDATA_PATH.exists():
-        logger.error(f"❌ File non trovato: {OPENDATA_PATH}")
+    if not opendata_path.exists():
+        logger.error(f"❌ File non trovato: {opendata_path}")
         logger.info("   Incolla i dati Open Data in: data/incentivi_opendata.json")
         return
     
-    with open(OPENDATA_PATH, 'r', encoding='utf-8') as f:
+    with open(opendata_path, 'r', encoding='utf-8') as f:
         try:
             opendata = json.load(f)
         except json.JSONDecodeError as e:
@@ -211,6 +212,7 @@ def run_enrichment(dry_run: bool = False):
             
             if updated and not dry_run:
                 bando.ai_analysis = json.dumps(current_analysis, ensure_ascii=False)
+                bando.refresh_tier()
                 records_enriched += 1
             elif updated:
                 records_enriched += 1
@@ -236,6 +238,8 @@ def run_enrichment(dry_run: bool = False):
     if dry_run:
         print("⚠️ DRY RUN - Nessuna modifica salvata")
 
+    return records_enriched
+
 
 if __name__ == "__main__":
     import argparse
@@ -0,0 +1,44 @@
+"""
+expiry.py - Nightly Deadline Refresh
+====================================
+Job notturno (cron / manage.py expire):
+1. calcola opens_on / expires_on / deadline_status / expired per le righe che
+   non li hanno ancora (--full: ri-normalizza tutta la tabella, vedi
+   src/utils/deadlines.py), e has_ateco / tier per quelle senza flag
+2. un solo UPDATE massivo porta `expired` a TRUE per i bandi la cui
+   scadenza è passata da ieri (e a FALSE se una scadenza è stata prorogata)
+
+Da quel momento l'API ordina e filtra su colonne indicizzate, senza
+confrontare date in formato stringa riga per riga.
+"""
+
+import logging
+import time
+from datetime import date
+
+from src.scraper.models import init_db, backfill_deadlines, backfill_tiers, refresh_expired
+
+logger = logging.getLogger(__name__)
+
+
+def run_expiry_refresh(today: date = None, full: bool = False):
+    print("=" * 70)
+    print("⏰ DEADLINE REFRESH - expires_on / expired")
+    print("=" * 70)
+    t0 = time.perf_counter()
+
+    session = init_db()
+    backfilled = backfill_deadlines(session, full=full)
+    tiers = backfill_tiers(session)
+    flipped = refresh_expired(session, today)
+
+    print(f"   🧮 Righe aggiornate: {backfilled}")
+    print(f"   🏷️ Tier calcolati:   {tiers}")
+    print(f"   🔁 Stato cambiato:   {flipped}")
+    print(f"   ⏱️ Tempo:            {(time.perf_counter() - t0) * 1000:.0f} ms")
+    return flipped
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    run_expiry_refresh()
@@ -23,6 +23,7 @@ import logging
 import re
 from bs4 import BeautifulSoup
 from src.scraper.models import Bando, ProcessingStatus, init_db
+from src.scraper.dedup import register as register_near_duplicate
 
 # Setup Logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -51,11 +52,11 @@ HEADERS = {
 }
 
 
-def fetch_all_grants(max_rows=10000):
+def fetch_all_grants(max_rows=10000, solr_url=SOLR_URL, query="index_id:incentivi"):
     """Fetch all grants from Solr API in one request."""
     
     params = {
-        "q": "index_id:incentivi",
+        "q": query,
         "q.op": "OR",
         "wt": "json",
         "rows": max_rows,
@@ -63,11 +64,11 @@ def fetch_all_grants(max_rows=10000):
         "sort": "ds_last_update desc",
     }
     
-    logger.info(f"📡 Calling Solr API: {SOLR_URL}")
+    logger.info(f"📡 Calling Solr API: {solr_url}")
     logger.info(f"   Requesting up to {max_rows} rows...")
     
     try:
-        resp = requests.get(SOLR_URL, params=params, headers=HEADERS, timeout=60)
+        resp = requests.get(solr_url, params=params, headers=HEADERS, timeout=60)
         resp.raise_for_status()
         
         data = resp.json()
@@ -123,8 +124,9 @@ def extract_description_from_html(html_snippet):
     return text[:500] if text else "No description available"
 
 
-def run_bulk_import(dry_run=False, limit=None):
-    """Main import function."""
+def run_bulk_import(dry_run=False, limit=None, solr_url=SOLR_URL, query="index_id:incentivi",
+                    max_rows=10000, source_name="Incentivi.gov.it [Solr]"):
+    """Main import function (defaults: incentivi.gov.it, see src/scraper/sources.toml)."""
     print("=" * 70)
     print("🚀 BULK IMPORT V4 - SOLR DIRECT API")
     print("=" * 70)
@@ -134,7 +136,7 @@ def run_bulk_import(dry_run=False, limit=None):
         session = init_db()
     
     # Fetch all grants from Solr
-    docs = fetch_all_grants()
+    docs = fetch_all_grants(max_rows=max_rows, solr_url=solr_url, query=query)
     
     if not docs:
         print("❌ No grants fetched. Aborting.")
@@ -147,6 +149,7 @@ def run_bulk_import(dry_run=False, limit=None):
     
     total_saved = 0
     total_skipped = 0
+    total_near_duplicates = 0
     total_errors = 0
     
     print(f"\n📊 Processing {len(docs)} grants...")
@@ -209,7 +212,7 @@ def run_bulk_import(dry_run=False, limit=None):
                 url_hash=url_hash,
                 title=title,
                 raw_content=description,
-                source_name="Incentivi.gov.it [Solr]",
+                source_name=source_name,
                 status=ProcessingStatus.NEW,
                 ai_analysis=json.dumps({
                     "regions": doc.get("regions", []),
@@ -222,7 +225,13 @@ def run_bulk_import(dry_run=False, limit=None):
                 }) if doc.get("regions") else None
             )
             
+            new_bando.refresh_tier()
             session.add(new_bando)
+            session.flush()
+            
+            # Same incentive already imported from another source? Link it, skip AI analysis
+            if register_near_duplicate(session, new_bando):
+                total_near_duplicates += 1
             total_saved += 1
             
             # Commit in batches of 100
@@ -242,6 +251,7 @@ def run_bulk_import(dry_run=False, limit=None):
     print(f"\n🏁 IMPORT COMPLETE!")
     print(f"   ✅ Saved: {total_saved}")
     print(f"   ⏭️ Skipped (duplicates): {total_skipped}")
+    print(f"   🔁 Near-duplicates linked: {total_near_duplicates}")
     print(f"   ❌ Errors: {total_errors}")
     print("=" * 70)
     
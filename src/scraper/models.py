@@ -1,11 +1,14 @@
 import hashlib
-from datetime import datetime
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, JSON, Enum
+import json
+from datetime import date, datetime
+from sqlalchemy import create_engine, inspect, make_url, text, update, and_, Column, Index, Integer, String, Text, Date, DateTime, JSON, Enum, Boolean, Float, ForeignKey
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import enum
 import os
 
+from src.utils.deadlines import extract_deadline, extract_open_date
+
 Base = declarative_base()
 
 class ProcessingStatus(enum.Enum):
@@ -14,6 +17,22 @@ class ProcessingStatus(enum.Enum):
     MATCHED = "matched"
     ERROR = "error"
 
+def load_analysis(raw) -> dict:
+    """ai_analysis may be stored as a dict or as a JSON string (enricher): always return a dict."""
+    if not raw:
+        return {}
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw)
+        except json.JSONDecodeError:
+            return {}
+    return raw if isinstance(raw, dict) else {}
+
+class GrantTier(enum.Enum):
+    GOLD = "gold"       # ATECO codes available (sector targeting possible)
+    SILVER = "silver"   # Financial data available
+    BRONZE = "bronze"   # Only basic metadata
+
 class Bando(Base):
     __tablename__ = 'bandi'
 
@@ -30,6 +49,7 @@ class Bando(Base):
     
     # Metadata
     ingested_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True) # any ORM/Core write
     status = Column(Enum(ProcessingStatus), default=ProcessingStatus.NEW)
     
     # AI Extractions (JSONB for flexibility)
@@ -38,6 +58,36 @@ class Bando(Base):
     # Marketing Layer - Testo persuasivo per conversione
     marketing_text = Column(Text, nullable=True) 
 
+    # Analysis bookkeeping: what produced the current ai_analysis
+    analysis_fingerprint = Column(String(64), nullable=True) # SHA256 of the analyzer input
+    analysis_prompt_version = Column(String(32), nullable=True, index=True)
+
+    # Indexed flags derived from ai_analysis (kept in sync by refresh_tier)
+    has_ateco = Column(Boolean, nullable=True, index=True)
+    tier = Column(String(16), nullable=True, index=True) # GrantTier value
+
+    # SHA256 of the inputs used for the current marketing_text
+    marketing_fingerprint = Column(String(64), nullable=True)
+
+    # Deadline columns derived from ai_analysis (kept in sync by refresh_deadline).
+    # `expired` is flipped nightly by refresh_expired: listing sort/filter never parse dates per row
+    opens_on = Column(Date, nullable=True, index=True)
+    expires_on = Column(Date, nullable=True, index=True)
+    deadline_status = Column(String(16), nullable=True, index=True) # DeadlineStatus value
+    expired = Column(Boolean, nullable=True, index=True)
+
+    # Last deep fetch of the detail page (see src/scraper/detail.py)
+    detail_fetched_at = Column(DateTime, nullable=True)
+
+    # Near-duplicate detection (see src/scraper/dedup.py)
+    minhash = Column(JSON, nullable=True) # MinHash signature of title + content
+    canonical_id = Column(Integer, ForeignKey('bandi.id'), nullable=True, index=True) # set on copies: skip AI analysis
+
+    __table_args__ = (
+        # GET /bandi default order: active first, newest first
+        Index('ix_bandi_listing', expired, opens_on.desc(), id.desc()),
+    )
+
     def __repr__(self):
         return f"<Bando(title='{self.title}', source='{self.source_name}')>"
 
@@ -45,15 +95,251 @@ class Bando(Base):
     def generate_hash(url):
         return hashlib.sha256(url.encode('utf-8')).hexdigest()
 
+    @staticmethod
+    def compute_tier(ai_analysis):
+        """Returns (has_ateco, tier) for a raw ai_analysis value (dict or JSON string)."""
+        analysis = load_analysis(ai_analysis)
+        if not analysis:
+            return False, GrantTier.BRONZE.value
+
+        ateco = analysis.get('ateco_codes')
+        if isinstance(ateco, str):
+            ateco = ateco.strip()
+        has_ateco = bool(ateco)
+
+        if has_ateco:
+            tier = GrantTier.GOLD
+        elif analysis.get('financial_max') or analysis.get('financial_min'):
+            tier = GrantTier.SILVER
+        else:
+            tier = GrantTier.BRONZE
+        return has_ateco, tier.value
+
+    @staticmethod
+    def compute_deadline(ai_analysis, ingested_at=None, today=None):
+        """
+        Returns (opens_on, expires_on, deadline_status, expired) for a raw ai_analysis
+        value, whatever the source format (see src/utils/deadlines.py).
+        The LLM `is_expired` flag is ignored: it is frozen at analysis time.
+        """
+        analysis = load_analysis(ai_analysis)
+        expires_on, status = extract_deadline(analysis)
+        opens_on = extract_open_date(analysis) or (ingested_at or datetime.utcnow()).date()
+        expired = expires_on is not None and expires_on < (today or date.today())
+        return opens_on, expires_on, status.value, expired
+
+    def refresh_deadline(self):
+        self.opens_on, self.expires_on, self.deadline_status, self.expired = Bando.compute_deadline(self.ai_analysis, self.ingested_at)
+
+    def refresh_tier(self):
+        """Call after every write to ai_analysis (refreshes every derived column)."""
+        self.has_ateco, self.tier = Bando.compute_tier(self.ai_analysis)
+        self.refresh_deadline()
+
+class Match(Base):
+    """Company <-> grant match produced by the batch matcher (one row per top-k result)."""
+    __tablename__ = 'matches'
+
+    id = Column(Integer, primary_key=True)
+    company_id = Column(String(64), nullable=False, index=True) # HubSpot company id
+    company_name = Column(String, nullable=True)
+    bando_id = Column(Integer, ForeignKey('bandi.id'), nullable=False, index=True)
+    score = Column(Float, nullable=False)
+    rank = Column(Integer, nullable=False)
+    matched_on = Column(JSON, nullable=True) # dimensions with an exact match
+    status = Column(Enum(ProcessingStatus), default=ProcessingStatus.MATCHED)
+    matched_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<Match(company='{self.company_id}', bando={self.bando_id}, score={self.score})>"
+
+class LshBand(Base):
+    """One LSH band of a Bando MinHash signature: grants sharing a band_key are near-duplicate candidates."""
+    __tablename__ = 'lsh_bands'
+
+    id = Column(Integer, primary_key=True)
+    band_key = Column(String(24), nullable=False, index=True) # band number + band hash
+    bando_id = Column(Integer, ForeignKey('bandi.id'), nullable=False, index=True)
+
+class FeedState(Base):
+    """Conditional-fetch state of an RSS feed (see src/scraper/rss.py)."""
+    __tablename__ = 'feed_states'
+
+    id = Column(Integer, primary_key=True)
+    feed_url = Column(String, unique=True, nullable=False)
+    etag = Column(String, nullable=True)
+    last_modified = Column(String, nullable=True) # raw Last-Modified header, sent back as If-Modified-Since
+    last_guid = Column(String, nullable=True) # newest entry already ingested
+    last_published = Column(DateTime, nullable=True)
+    changed_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<FeedState(feed='{self.feed_url}', guid='{self.last_guid}')>"
+
+class JobRun(Base):
+    """One execution (or skipped / missed run) of a scheduled job (see src/scheduler)."""
+    __tablename__ = 'job_runs'
+
+    id = Column(Integer, primary_key=True)
+    job_id = Column(String(64), nullable=False, index=True)
+    status = Column(String(16), nullable=False, index=True) # running, success, error, skipped, missed, interrupted
+    scheduled_at = Column(DateTime, nullable=True)
+    started_at = Column(DateTime, nullable=True, index=True)
+    finished_at = Column(DateTime, nullable=True)
+    duration_s = Column(Float, nullable=True)
+    result = Column(String, nullable=True) # repr of the return value (e.g. rows saved)
+    error = Column(Text, nullable=True)
+
+    def __repr__(self):
+        return f"<JobRun(job='{self.job_id}', status='{self.status}', duration={self.duration_s})>"
+
+class Job(Base):
+    """A queued task (fetch-detail, analyze, export) claimed by `manage.py worker` (see src/scheduler/queue.py)."""
+    __tablename__ = 'jobs'
+
+    id = Column(Integer, primary_key=True)
+    task = Column(String(64), nullable=False, index=True)
+    payload = Column(JSON, nullable=True)
+    key = Column(String(128), nullable=True, index=True) # dedup: one queued/running job per key
+    priority = Column(Integer, nullable=False, default=0) # higher first
+    status = Column(String(16), nullable=False, default="queued") # queued, running, done, failed
+
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    available_at = Column(DateTime, nullable=False, default=datetime.utcnow) # retry backoff
+    locked_by = Column(String(128), nullable=True) # worker id holding the lease
+    locked_until = Column(DateTime, nullable=True, index=True) # visibility timeout
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    result = Column(String, nullable=True)
+    last_error = Column(Text, nullable=True)
+
+    __table_args__ = (
+        # claim: next queued job by priority
+        Index('ix_jobs_claim', status, priority.desc(), id),
+    )
+
+    def __repr__(self):
+        return f"<Job(task='{self.task}', status='{self.status}', attempts={self.attempts})>"
+
+def backfill_tiers(session, batch_size: int = 1000) -> int:
+    """Computes has_ateco/tier for rows written before the flags existed."""
+    rows = session.query(Bando.id, Bando.ai_analysis).filter(Bando.tier.is_(None)).all()
+    for start in range(0, len(rows), batch_size):
+        mappings = []
+        for bando_id, ai_analysis in rows[start:start + batch_size]:
+            has_ateco, tier = Bando.compute_tier(ai_analysis)
+            mappings.append({"id": bando_id, "has_ateco": has_ateco, "tier": tier})
+        session.execute(update(Bando), mappings)
+    session.commit()
+    return len(rows)
+
 # Database Connection
 # Use SQLite for local testing if no env var is set
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///data/db/bandi.db")
 
+DEADLINE_COLUMNS = ("opens_on", "expires_on", "deadline_status", "expired")
+
+def backfill_deadlines(session, full: bool = False, batch_size: int = 5000) -> int:
+    """
+    Computes the deadline columns for rows written before they existed
+    (full=True: re-normalizes the whole table, e.g. after a parser change).
+    Only rows whose values actually change are written, in bulk. Returns rows updated.
+    """
+    query = session.query(Bando.id, Bando.ai_analysis, Bando.ingested_at, *[getattr(Bando, c) for c in DEADLINE_COLUMNS])
+    if not full:
+        query = query.filter(Bando.deadline_status.is_(None))
+
+    today = date.today()
+    mappings = []
+    updated = 0
+    for bando_id, ai_analysis, ingested_at, *current in query.all():
+        computed = Bando.compute_deadline(ai_analysis, ingested_at, today)
+        if tuple(current) != computed:
+            mappings.append({"id": bando_id, **dict(zip(DEADLINE_COLUMNS, computed))})
+        if len(mappings) >= batch_size:
+            session.execute(update(Bando), mappings)
+            updated += len(mappings)
+            mappings = []
+    if mappings:
+        session.execute(update(Bando), mappings)
+        updated += len(mappings)
+    session.commit()
+    return updated
+
+def refresh_expired(session, today=None) -> int:
+    """
+    Flips `expired` for grants whose deadline passed (or moved) since the last run,
+    in one bulk UPDATE on the indexed expires_on column. Returns rows changed.
+    """
+    today = today or date.today()
+    is_past = and_(Bando.expires_on.isnot(None), Bando.expires_on < today)
+    result = session.execute(
+        update(Bando)
+        .where(Bando.expired.isnot(None), Bando.expired != is_past) # NULL = not backfilled yet
+        .values(expired=is_past)
+        .execution_options(synchronize_session=False)
+    )
+    session.commit()
+    return result.rowcount
+
 def get_engine():
     return create_engine(DATABASE_URL)
 
+# asyncio drivers for the same database (API read path)
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+def async_database_url(url: str = None) -> str:
+    """DATABASE_URL rewritten for the asyncio driver (aiosqlite / asyncpg)."""
+    url = make_url(url or DATABASE_URL)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No async driver configured for {url.get_backend_name()}")
+    return url.set(drivername=driver).render_as_string(hide_password=False)
+
+def get_async_engine(**kwargs):
+    from sqlalchemy.ext.asyncio import create_async_engine
+    return create_async_engine(async_database_url(), **kwargs)
+
 def create_tables(engine):
     Base.metadata.create_all(engine)
+    migrate_schema(engine)
+    # has_ateco/tier of rows written before the flags existed: /bandi?ateco= and
+    # the marketing generator filter on has_ateco, NULL would hide those rows
+    session = get_session(engine)
+    try:
+        backfill_tiers(session)
+    finally:
+        session.close()
+
+def migrate_schema(engine):
+    """
+    Adds columns and indexes introduced after a table was first created.
+    create_all() never alters existing tables, so older databases are
+    upgraded in place here (additive changes only).
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+
+            existing_columns = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                col_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}'))
+
+            existing_indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(conn)
 
 def get_session(engine):
     Session = sessionmaker(bind=engine)
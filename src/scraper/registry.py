@@ -0,0 +1,364 @@
+"""
+registry.py - Source Registry & Runner
+======================================
+Le fonti non sono più liste nel codice (sources_rss in bi_ingest.run_cycle,
+SOLR_URL nel fetcher, URL Playwright in gov_html_ingest): sono dichiarate in
+src/scraper/sources.toml (o nel file indicato da SOURCES_FILE).
+
+- load_sources():  TOML -> lista di Source validate
+- CONNECTORS:      tipo -> funzione che importa una fonte
+                   (solr, rss, html-selector, html-browser, opendata-json)
+- run_sources():   esegue le fonti abilitate in parallelo, una per thread,
+                   ognuna con il proprio rate limit e la propria concorrenza;
+                   `depends_on` ordina le fonti che dipendono da altre
+- Lo scheduler crea un job `source:<nome>` per fonte (schedule_minutes / cron)
+
+Usage:
+    python scripts/manage.py sources                 # elenco
+    python scripts/manage.py sources --run           # tutte, in parallelo
+    python scripts/manage.py sources --run mimit-rss,invitalia-rss
+"""
+
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urljoin
+
+try:
+    import tomllib
+except ModuleNotFoundError:  # Python < 3.11
+    import tomli as tomllib
+
+import requests
+from apscheduler.util import ref_to_obj
+from bs4 import BeautifulSoup
+
+from src.utils.paths import BASE_DIR
+from src.utils.ratelimit import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+SOURCES_FILE = Path(os.getenv("SOURCES_FILE", Path(__file__).parent / "sources.toml"))
+
+COMMON_KEYS = {"name", "type", "enabled", "source_name", "rate_limit", "concurrency",
+               "schedule_minutes", "cron", "depends_on"}
+REQUIRED_OPTIONS = {
+    "solr": ("url",),
+    "rss": (),  # url o urls
+    "html-selector": ("url", "parser"),
+    "html-browser": ("url", "parser"),
+    "opendata-json": (),  # path o url
+}
+# Una sola richiesta per giro (API / download): rate_limit e concurrency non
+# si applicano, quelli di [defaults] sono ignorati e quelli espliciti rifiutati
+SINGLE_REQUEST = {"solr", "opendata-json"}
+THROTTLE_KEYS = {"rate_limit", "concurrency"}
+PAGE_TIMEOUT = 15
+
+
+@dataclass(frozen=True)
+class Source:
+    name: str
+    type: str
+    source_name: str
+    enabled: bool = True
+    rate_limit: Optional[float] = None
+    concurrency: int = 4
+    schedule: dict = field(default_factory=dict)  # trigger APScheduler
+    depends_on: tuple = ()
+    options: dict = field(default_factory=dict)  # chiavi specifiche del connettore
+
+
+def _schedule(entry: dict) -> dict:
+    if "cron" in entry:
+        return {"trigger": "cron", **entry["cron"]}
+    return {"trigger": "interval", "minutes": int(entry.get("schedule_minutes", 60))}
+
+
+def parse_sources(config: dict) -> List[Source]:
+    defaults = config.get("defaults", {})
+    sources, names = [], set()
+    for raw in config.get("source", []):
+        entry = {**defaults, **raw}
+        name, kind = entry.get("name"), entry.get("type")
+        if not name:
+            raise ValueError(f"Fonte senza nome: {raw}")
+        if name in names:
+            raise ValueError(f"Fonte duplicata: {name}")
+        if kind not in CONNECTORS:
+            raise ValueError(f"Fonte {name}: tipo '{kind}' sconosciuto (disponibili: {', '.join(CONNECTORS)})")
+        if kind in SINGLE_REQUEST:
+            explicit = THROTTLE_KEYS & set(raw)
+            if explicit:
+                raise ValueError(f"Fonte {name}: {', '.join(sorted(explicit))} non supportati dal tipo {kind}")
+            entry = {k: v for k, v in entry.items() if k not in THROTTLE_KEYS}
+        options = {k: v for k, v in entry.items() if k not in COMMON_KEYS}
+        missing = [k for k in REQUIRED_OPTIONS[kind] if k not in options]
+        if kind == "rss" and not ({"url", "urls"} & set(options)):
+            missing.append("url")
+        if kind == "opendata-json" and not ({"path", "url"} & set(options)):
+            missing.append("path")
+        if missing:
+            raise ValueError(f"Fonte {name}: mancano {', '.join(missing)}")
+        names.add(name)
+        sources.append(Source(
+            name=name, type=kind, source_name=entry.get("source_name", name),
+            enabled=bool(entry.get("enabled", True)), rate_limit=entry.get("rate_limit") or None,
+            concurrency=int(entry.get("concurrency", 1 if kind in SINGLE_REQUEST else 4)), schedule=_schedule(entry),
+            depends_on=tuple(entry.get("depends_on", ())), options=options,
+        ))
+    for source in sources:
+        unknown = set(source.depends_on) - names
+        if unknown:
+            raise ValueError(f"Fonte {source.name}: depends_on sconosciuti {sorted(unknown)}")
+    return sources
+
+
+def load_sources(path: Path = None) -> List[Source]:
+    with open(path or SOURCES_FILE, "rb") as f:
+        return parse_sources(tomllib.load(f))
+
+
+def get_source(name: str, path: Path = None) -> Source:
+    for source in load_sources(path):
+        if source.name == name:
+            return source
+    raise KeyError(f"Fonte sconosciuta: {name}")
+
+
+# --- Connettori -------------------------------------------------------------
+
+def run_solr(source: Source):
+    from src.scraper.fetcher import run_bulk_import
+    opts = source.options
+    return run_bulk_import(
+        solr_url=opts["url"], query=opts.get("query", "index_id:incentivi"),
+        max_rows=int(opts.get("max_rows", 10000)), source_name=source.source_name,
+    )
+
+
+def run_rss(source: Source):
+    from src.scraper.rss import run_rss_ingestion
+    urls = source.options.get("urls") or [source.options["url"]]
+    return run_rss_ingestion(
+        [(url, source.source_name) for url in urls],
+        concurrency=source.concurrency, rate_limit=source.rate_limit,
+    )
+
+
+def _selector_parser(spec: dict):
+    """Parser da selettori CSS: item (contenitore), link, title, summary (opzionale)."""
+    def parse(html: str, base_url: str) -> List[dict]:
+        items = []
+        for node in BeautifulSoup(html, "html.parser").select(spec["item"]):
+            link = node.select_one(spec["link"]) if spec.get("link") else node.find("a")
+            if link is None or not link.get("href"):
+                continue
+            title_node = node.select_one(spec["title"]) if spec.get("title") else link
+            summary_node = node.select_one(spec["summary"]) if spec.get("summary") else None
+            items.append({
+                "url": urljoin(base_url, link["href"]),
+                "title": (title_node or link).get_text(" ", strip=True),
+                "summary": summary_node.get_text(" ", strip=True) if summary_node else "",
+            })
+        return items
+    return parse
+
+
+def _listing_urls(opts: dict) -> List[str]:
+    url = opts["url"]
+    if "{page}" not in url:
+        return [url]
+    first = int(opts.get("first_page", 1))
+    return [url.format(page=page) for page in range(first, first + int(opts.get("pages", 1)))]
+
+
+def _entries(items: List[dict], source: Source, seen: set) -> list:
+    from src.scraper.rss import FeedEntry
+    from src.scraper.models import Bando
+    entries = []
+    for item in items:
+        if item["url"] in seen:
+            continue
+        seen.add(item["url"])
+        entries.append(FeedEntry(
+            url=item["url"], url_hash=Bando.generate_hash(item["url"]), title=item.get("title") or item["url"],
+            summary=item.get("summary", ""), source_name=source.source_name,
+        ))
+    return entries
+
+
+def run_html_selector(source: Source):
+    from src.scraper.detail import USER_AGENT
+    from src.scraper.rss import ingest_entries
+
+    spec = source.options["parser"]
+    parse = ref_to_obj(spec) if isinstance(spec, str) else _selector_parser(spec)
+    limiter = RateLimiter(source.rate_limit)
+    http = requests.Session()
+    http.headers["User-Agent"] = USER_AGENT
+
+    entries, seen = [], set()
+    try:
+        for url in _listing_urls(source.options):
+            limiter.wait()
+            try:
+                resp = http.get(url, timeout=PAGE_TIMEOUT)
+                resp.raise_for_status()
+            except requests.RequestException as e:
+                logger.warning(f"⚠️ {source.name}: {url}: {e}")
+                break
+            new = _entries(parse(resp.text, url), source, seen)
+            if not new:
+                break  # pagina vuota o ripetuta: fine elenco
+            entries.extend(new)
+    finally:
+        http.close()
+
+    logger.info(f"🔎 {source.name}: {len(entries)} link trovati")
+    stats = ingest_entries(entries, concurrency=source.concurrency, rate_limit=source.rate_limit)
+    return stats["saved"]
+
+
+def run_html_browser(source: Source):
+    """
+    Portale renderizzato in JavaScript: elenco e dettagli da un pool di
+    contesti Chromium (src/scraper/browser.py), aperto una volta per giro.
+    Opzioni oltre a url / parser: load_more, cookie, max_clicks (elenco),
+    content, ready (dettaglio); item se parser è "modulo:funzione".
+    """
+    import asyncio
+    from src.scraper.browser import MAX_CLICKS, BrowserPool, fetch_texts, scrape_listing
+    from src.scraper.rss import ingest_entries
+
+    opts = source.options
+    spec = opts["parser"]
+    parse = ref_to_obj(spec) if isinstance(spec, str) else _selector_parser(spec)
+    # Card da attendere nel browser: dal parser a selettori o dall'opzione `item`
+    item = opts["item"] if isinstance(spec, str) else spec["item"]
+    limiter = RateLimiter(source.rate_limit)
+
+    pool = BrowserPool(size=source.concurrency)
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(pool.start())
+        entries, seen = [], set()
+        for url in _listing_urls(opts):
+            limiter.wait()
+            html = loop.run_until_complete(scrape_listing(
+                pool, url, item, load_more=opts.get("load_more"), cookie=opts.get("cookie"),
+                max_clicks=int(opts.get("max_clicks", MAX_CLICKS)),
+            ))
+            new = _entries(parse(html, url), source, seen) if html else []
+            if not new:
+                break  # pagina vuota o ripetuta: fine elenco
+            entries.extend(new)
+        logger.info(f"🔎 {source.name}: {len(entries)} link trovati")
+
+        def fetch(urls):
+            return loop.run_until_complete(fetch_texts(
+                pool, urls, content=opts.get("content", "body"), ready=opts.get("ready"), limiter=limiter,
+            ))
+
+        stats = ingest_entries(entries, concurrency=source.concurrency, fetch=fetch)
+    finally:
+        loop.run_until_complete(pool.close())
+        loop.close()
+    logger.info(f"🚫 {source.name}: {pool.stats['blocked']}/{pool.stats['requests']} richieste bloccate, "
+                f"{pool.stats['pages']} pagine")
+    return stats["saved"]
+
+
+def run_opendata(source: Source):
+    from src.scraper.enricher import run_enrichment
+    opts = source.options
+    path = BASE_DIR / opts.get("path", f"data/input/{source.name}.json")
+    if "url" in opts:
+        resp = requests.get(opts["url"], timeout=120)
+        resp.raise_for_status()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(resp.content)
+    return run_enrichment(opendata_path=path)
+
+
+CONNECTORS = {
+    "solr": run_solr,
+    "rss": run_rss,
+    "html-selector": run_html_selector,
+    "html-browser": run_html_browser,
+    "opendata-json": run_opendata,
+}
+
+
+# --- Runner -----------------------------------------------------------------
+
+def run_source(name: str):
+    """Una fonte (job `source:<nome>` dello scheduler)."""
+    source = get_source(name)
+    return CONNECTORS[source.type](source)
+
+
+def run_sources(names: Optional[List[str]] = None, max_parallel: Optional[int] = None) -> Dict[str, dict]:
+    """
+    Esegue le fonti (tutte quelle abilitate, o `names`) in parallelo.
+    Una fonte parte quando quelle in depends_on (se selezionate) sono finite;
+    l'errore di una fonte non ferma le altre.
+    """
+    sources = [s for s in load_sources() if (s.name in names if names else s.enabled)]
+    if names:
+        unknown = set(names) - {s.name for s in sources}
+        if unknown:
+            raise KeyError(f"Fonti sconosciute: {', '.join(sorted(unknown))}")
+    selected = {s.name for s in sources}
+    print("=" * 70)
+    print(f"🗂️ SOURCES - {len(sources)} fonti in parallelo")
+    print("=" * 70)
+
+    results: Dict[str, dict] = {}
+    pending = list(sources)
+    running = {}
+
+    def execute(source: Source):
+        t0 = time.perf_counter()
+        try:
+            return {"status": "ok", "result": CONNECTORS[source.type](source), "seconds": time.perf_counter() - t0}
+        except Exception as e:
+            logger.exception(f"❌ Fonte {source.name} fallita")
+            return {"status": "error", "error": str(e), "seconds": time.perf_counter() - t0}
+
+    with ThreadPoolExecutor(max_workers=max_parallel or max(len(sources), 1)) as pool:
+        while pending or running:
+            for source in list(pending):
+                if all(dep in results or dep not in selected for dep in source.depends_on):
+                    pending.remove(source)
+                    running[pool.submit(execute, source)] = source
+            if not running:
+                raise ValueError(f"depends_on circolare: {', '.join(s.name for s in pending)}")
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future).name] = future.result()
+
+    print("-" * 70)
+    for source in sources:
+        outcome = results[source.name]
+        detail = outcome.get("result") if outcome["status"] == "ok" else outcome["error"]
+        icon = "✅" if outcome["status"] == "ok" else "❌"
+        print(f"   {icon} {source.name:<20} {source.type:<14} {outcome['seconds']:6.1f}s  {detail}")
+    return results
+
+
+def print_sources():
+    print(f"{'name':<20} {'type':<14} {'enabled':<8} {'rate/s':>7} {'conc':>5}  schedule")
+    for s in load_sources():
+        schedule = {k: v for k, v in s.schedule.items() if k != "trigger"}
+        print(f"{s.name:<20} {s.type:<14} {str(s.enabled):<8} {s.rate_limit or '-':>7} {s.concurrency:>5}  "
+              f"{s.schedule['trigger']} {schedule}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    run_sources()
@@ -0,0 +1,383 @@
+"""
+rss.py - Concurrent RSS Ingestion
+=================================
+Sostituisce Ingestor.fetch_rss di scripts/legacy/bi_ingest.py, che per ogni
+feed, una voce alla volta, scaricava la pagina (timeout 10 s) e faceva un
+commit per riga.
+
+1. Tutti i feed in parallelo (asyncio + requests nel thread pool)
+2. Le voci già note (url_hash nel DB o già viste in questo giro) vengono
+   scartate con una sola query, prima di qualsiasi download
+3. Deep fetch delle pagine nuove con un pool limitato:
+   asyncio.Semaphore(DEEP_FETCH_CONCURRENCY) + run_in_executor
+4. Scrittura a blocchi di BATCH_SIZE (un commit per blocco), con la
+   verifica near-duplicate di src/scraper/dedup.py
+
+Se il deep fetch fallisce resta la descrizione del feed ("[RSS ONLY]") e
+detail_fetched_at vuoto: il task fetch-detail della coda riproverà. Non per
+il deep fetch alternativo di ingest_entries (`fetch`, es. browser headless):
+quelle pagine richiedono JavaScript e fetch-detail (requests) non le
+renderizza, quindi il tentativo fallito imposta comunque detail_fetched_at.
+
+Fetch condizionale (tabella feed_states, una riga per feed):
+- ETag / Last-Modified salvati e rimandati come If-None-Match /
+  If-Modified-Since: un feed invariato costa una risposta 304 vuota
+- GUID e data della voce più recente già importata: la lettura del feed
+  si ferma alla prima voce nota, le voci vecchie non vengono riverificate
+- Lo stato è tenuto in memoria nel processo (scheduler): un giro senza
+  novità non apre nemmeno una connessione al DB. Lo stato viene scritto
+  solo dopo il commit dei bandi, nella stessa transazione
+
+Usage:
+    python scripts/manage.py rss
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import feedparser
+import requests
+
+from src.scraper.dedup import register as register_near_duplicate
+from src.scraper.detail import RSS_ONLY_MARKER, USER_AGENT, fetch_detail_text
+from src.scraper.models import Bando, FeedState, ProcessingStatus, create_tables, get_engine, get_session
+from src.utils.ratelimit import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+FEEDS = [
+    ("https://www.mimit.gov.it/it/notizie-stampa?format=feed&type=rss", "MIMIT (News)"),
+    ("https://www.invitalia.it/xml/rss/notizie", "Invitalia (News)"),
+]
+
+FEED_TIMEOUT = 15
+DEEP_FETCH_CONCURRENCY = 8
+BATCH_SIZE = 50
+
+_local = threading.local()
+
+_engine = None
+# feed_url -> FeedSnapshot, caricato dal DB al primo giro del processo
+_feed_states: Optional[Dict[str, "FeedSnapshot"]] = None
+# run_sources esegue più fonti RSS in thread paralleli: init e update dei
+# globali sopra passano da qui
+_state_lock = threading.Lock()
+
+
+def _http() -> requests.Session:
+    """Una requests.Session per thread del pool (connessioni keep-alive riusate)."""
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+        _local.session.headers["User-Agent"] = USER_AGENT
+    return _local.session
+
+
+def _fetch_detail(url: str, limiter: Optional[RateLimiter] = None) -> Optional[str]:
+    # Nel thread del pool: usa la Session di quel thread
+    if limiter is not None:
+        limiter.wait()
+    return fetch_detail_text(url, _http())
+
+
+@dataclass(frozen=True)
+class FeedSnapshot:
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    last_guid: Optional[str] = None
+    last_published: Optional[datetime] = None
+
+
+@dataclass
+class FeedEntry:
+    url: str
+    url_hash: str
+    title: str
+    summary: str
+    source_name: str
+    guid: Optional[str] = None
+    published: Optional[datetime] = None
+    content: Optional[str] = None
+
+
+def _get_engine():
+    global _engine
+    with _state_lock:
+        if _engine is None:
+            engine = get_engine()
+            create_tables(engine)
+            _engine = engine
+        return _engine
+
+
+def load_feed_states(session) -> Dict[str, FeedSnapshot]:
+    """
+    Stato dei feed dal DB solo la prima volta, poi dalla cache di processo.
+    Ritorna una copia: la cache si aggiorna solo con update_feed_states().
+    """
+    global _feed_states
+    with _state_lock:
+        if _feed_states is None:
+            _feed_states = {
+                row.feed_url: FeedSnapshot(row.etag, row.last_modified, row.last_guid, row.last_published)
+                for row in session.query(FeedState)
+            }
+        return dict(_feed_states)
+
+
+def update_feed_states(changed: Dict[str, FeedSnapshot]):
+    """Dopo il commit: i feed cambiati entrano nella cache di processo."""
+    with _state_lock:
+        if _feed_states is not None:
+            _feed_states.update(changed)
+
+
+def save_feed_states(session, changed: Dict[str, FeedSnapshot]):
+    """Upsert degli stati cambiati (il commit è del chiamante)."""
+    rows = {row.feed_url: row for row in session.query(FeedState).filter(FeedState.feed_url.in_(list(changed)))}
+    for url, snapshot in changed.items():
+        row = rows.get(url) or FeedState(feed_url=url)
+        row.etag, row.last_modified = snapshot.etag, snapshot.last_modified
+        row.last_guid, row.last_published = snapshot.last_guid, snapshot.last_published
+        session.add(row)
+
+
+def reset_feed_cache():
+    global _feed_states
+    with _state_lock:
+        _feed_states = None
+
+
+def fetch_feed(url: str, state: FeedSnapshot) -> Tuple[Optional[list], FeedSnapshot]:
+    """
+    GET condizionale di un feed. Ritorna (voci feedparser, nuovo stato HTTP):
+    voci None se il feed non è cambiato (304) o in caso di errore.
+    """
+    headers = {}
+    if state.etag:
+        headers["If-None-Match"] = state.etag
+    if state.last_modified:
+        headers["If-Modified-Since"] = state.last_modified
+    try:
+        resp = _http().get(url, headers=headers, timeout=FEED_TIMEOUT)
+        if resp.status_code == 304:
+            return None, state
+        resp.raise_for_status()
+    except Exception as e:
+        logger.warning(f"⚠️ Feed {url}: {e}")
+        return None, state
+    http_state = replace(state, etag=resp.headers.get("ETag"), last_modified=resp.headers.get("Last-Modified"))
+    return feedparser.parse(resp.content).entries, http_state
+
+
+def _published(entry) -> Optional[datetime]:
+    parsed = entry.get('published_parsed') or entry.get('updated_parsed')
+    return datetime(*parsed[:6]) if parsed else None
+
+
+def entry_summary(entry) -> str:
+    content = entry.get('content') or [{'value': ''}]
+    return f"{entry.get('description', '')} {content[0].get('value', '')}".strip()
+
+
+def parse_entries(raw_entries, source_name: str, state: FeedSnapshot = FeedSnapshot()) -> List[FeedEntry]:
+    """
+    Voci nuove del feed, dalla più recente: la lettura si ferma alla prima
+    voce già importata (stesso GUID, o pubblicata non dopo l'ultima nota).
+    """
+    if raw_entries and all(_published(e) for e in raw_entries):
+        # Feed in ordine cronologico crescente: la più recente va letta per prima
+        raw_entries = sorted(raw_entries, key=_published, reverse=True)
+    entries = []
+    for entry in raw_entries:
+        url = entry.get('link')
+        guid = entry.get('id') or url
+        published = _published(entry)
+        if guid and guid == state.last_guid:
+            break
+        if published and state.last_published and published <= state.last_published:
+            break
+        if not url:
+            continue
+        entries.append(FeedEntry(
+            url=url, url_hash=Bando.generate_hash(url), title=entry.get('title') or url,
+            summary=entry_summary(entry), source_name=source_name, guid=guid, published=published,
+        ))
+    return entries
+
+
+def advance_watermark(state: FeedSnapshot, entries: List[FeedEntry]) -> FeedSnapshot:
+    """La voce più recente tra quelle nuove diventa il nuovo watermark del feed."""
+    if not entries:
+        return state
+    dated = [e for e in entries if e.published]
+    newest = max(dated, key=lambda e: e.published) if dated else entries[0]
+    return replace(state, last_guid=newest.guid, last_published=newest.published or state.last_published)
+
+
+def drop_known(session, entries: List[FeedEntry]) -> List[FeedEntry]:
+    """Scarta le voci già nel DB (una query) e i duplicati tra feed."""
+    hashes = list({e.url_hash for e in entries})
+    known = set()
+    for offset in range(0, len(hashes), 500):
+        chunk = hashes[offset:offset + 500]
+        known.update(h for (h,) in session.query(Bando.url_hash).filter(Bando.url_hash.in_(chunk)))
+    fresh, seen = [], set(known)
+    for entry in entries:
+        if entry.url_hash not in seen:
+            seen.add(entry.url_hash)
+            fresh.append(entry)
+    return fresh
+
+
+async def _gather_feeds(loop, executor, feeds, states: Dict[str, FeedSnapshot]):
+    """Ritorna (voci nuove, stati dei feed cambiati)."""
+    results = await asyncio.gather(*[
+        loop.run_in_executor(executor, fetch_feed, url, states.get(url, FeedSnapshot())) for url, _ in feeds
+    ])
+    entries, changed = [], {}
+    for (url, source_name), (raw_entries, http_state) in zip(feeds, results):
+        if raw_entries is None:
+            logger.info(f"📡 {source_name}: invariato")
+            continue
+        parsed = parse_entries(raw_entries, source_name, states.get(url, FeedSnapshot()))
+        logger.info(f"📡 {source_name}: {len(parsed)} voci nuove su {len(raw_entries)}")
+        entries.extend(parsed)
+        new_state = advance_watermark(http_state, parsed)
+        if new_state != states.get(url):
+            changed[url] = new_state
+    return entries, changed
+
+
+async def _deep_fetch(loop, executor, entries: List[FeedEntry], concurrency: int, limiter: Optional[RateLimiter] = None):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch_one(entry: FeedEntry):
+        async with semaphore:
+            entry.content = await loop.run_in_executor(executor, _fetch_detail, entry.url, limiter)
+
+    await asyncio.gather(*[fetch_one(entry) for entry in entries])
+
+
+def save_entries(session, entries: List[FeedEntry], batch_size: int = BATCH_SIZE, retry_detail: bool = True) -> dict:
+    """retry_detail=False: anche le voci senza testo ricevono detail_fetched_at (niente fetch-detail)."""
+    stats = {"saved": 0, "rss_only": 0, "near_duplicates": 0}
+    now = datetime.utcnow()
+    for offset in range(0, len(entries), batch_size):
+        batch = []
+        for entry in entries[offset:offset + batch_size]:
+            bando = Bando(
+                url=entry.url, url_hash=entry.url_hash, title=entry.title,
+                raw_content=entry.content or f"{RSS_ONLY_MARKER} {entry.summary}",
+                source_name=entry.source_name, status=ProcessingStatus.NEW,
+                detail_fetched_at=now if entry.content or not retry_detail else None,
+            )
+            bando.refresh_tier()
+            batch.append(bando)
+            stats["rss_only"] += entry.content is None
+        session.add_all(batch)
+        session.flush()
+        # Stesso incentivo già importato da Solr / altro feed? Collegato, niente analisi AI
+        for bando in batch:
+            if register_near_duplicate(session, bando):
+                stats["near_duplicates"] += 1
+        session.commit()
+        stats["saved"] += len(batch)
+    return stats
+
+
+def ingest_entries(entries: List[FeedEntry], concurrency: int = DEEP_FETCH_CONCURRENCY,
+                   rate_limit: Optional[float] = None, dry_run: bool = False,
+                   fetch: Optional[Callable[[List[str]], Dict[str, Optional[str]]]] = None) -> dict:
+    """
+    Voci raccolte da un'altra fonte (es. connettore html-selector): stesse
+    fasi dell'RSS, scarto delle note -> deep fetch limitato -> scrittura a blocchi.
+    `fetch`: deep fetch alternativo (urls -> testi), es. il browser headless.
+    """
+    session = get_session(_get_engine())
+    loop = asyncio.new_event_loop()
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    try:
+        fresh = drop_known(session, entries)
+        if fetch is not None:
+            texts = fetch([entry.url for entry in fresh]) if fresh else {}
+            for entry in fresh:
+                entry.content = texts.get(entry.url)
+        else:
+            loop.run_until_complete(_deep_fetch(loop, executor, fresh, concurrency, RateLimiter(rate_limit)))
+        if dry_run:
+            return {"saved": 0, "rss_only": 0, "near_duplicates": 0, "fresh": len(fresh)}
+        return {**save_entries(session, fresh, retry_detail=fetch is None), "fresh": len(fresh)}
+    finally:
+        executor.shutdown(wait=True)
+        loop.close()
+        session.close()
+
+
+def run_rss_ingestion(feeds=None, concurrency: int = DEEP_FETCH_CONCURRENCY, dry_run: bool = False,
+                      rate_limit: Optional[float] = None) -> int:
+    """rate_limit: pagine di dettaglio al secondo (None = solo il limite di concorrenza)."""
+    print("=" * 70)
+    print("📡 RSS INGESTION - feed paralleli + deep fetch")
+    print("=" * 70)
+    feeds = feeds or FEEDS
+    t0 = time.perf_counter()
+
+    session = get_session(_get_engine())
+    try:
+        states = load_feed_states(session)
+    finally:
+        session.close()
+
+    loop = asyncio.new_event_loop()
+    executor = ThreadPoolExecutor(max_workers=max(concurrency, len(feeds)))
+    session = None
+    try:
+        entries, changed = loop.run_until_complete(_gather_feeds(loop, executor, feeds, states))
+        if not entries and not changed:
+            # Nessuna novità: nessuna query
+            print(f"   💤 Nessun feed cambiato ({time.perf_counter() - t0:.2f}s)")
+            return 0
+
+        session = get_session(_get_engine())
+        fresh = drop_known(session, entries)
+        t_feeds = time.perf_counter()
+        print(f"   📰 Voci nuove nei feed: {len(entries)} | da importare: {len(fresh)} ({t_feeds - t0:.1f}s)")
+
+        loop.run_until_complete(_deep_fetch(loop, executor, fresh, concurrency, RateLimiter(rate_limit)))
+        t_fetch = time.perf_counter()
+        print(f"   🌐 Deep fetch: {sum(e.content is not None for e in fresh)}/{len(fresh)} pagine ({t_fetch - t_feeds:.1f}s)")
+
+        if dry_run:
+            return 0
+
+        stats = save_entries(session, fresh)
+        if changed:
+            # Watermark avanzato solo dopo che i bandi sono salvati
+            save_feed_states(session, changed)
+            session.commit()
+            update_feed_states(changed)
+    finally:
+        executor.shutdown(wait=True)
+        loop.close()
+        if session is not None:
+            session.close()
+
+    print(f"   ✅ Salvati: {stats['saved']} (solo RSS: {stats['rss_only']}, near-duplicate: {stats['near_duplicates']})")
+    print(f"   ⏱️ Tempo totale: {time.perf_counter() - t0:.1f}s")
+    return stats["saved"]
+
+
+if __name__ == "__main__":
+    import argparse
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=DEEP_FETCH_CONCURRENCY, help="Pagine scaricate in parallelo")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    run_rss_ingestion(concurrency=args.concurrency, dry_run=args.dry_run)
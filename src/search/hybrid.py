@@ -0,0 +1,90 @@
+"""
+hybrid.py - Hybrid Lexical + Semantic Ranking
+=============================================
+Fusione dei risultati di più retriever per la ricerca catalogo:
+
+- Reciprocal Rank Fusion: score(d) = Σ w_r / (RRF_K + rank_r(d))
+  (usa solo le posizioni, quindi score lessicali e coseni non vanno calibrati)
+- Boost (non più ordinamento rigido): bando attivo e data di apertura recente
+  aggiungono un bonus allo score fuso
+- StageTimer: durata di ogni stadio, esposta nell'header `Server-Timing`
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+# Costante RRF standard: smorza il peso delle primissime posizioni
+RRF_K = 60
+
+RETRIEVER_WEIGHTS = {
+    "lexical": 1.0,
+    "semantic": 1.0,
+}
+
+# Candidati per retriever prima della fusione
+CANDIDATES_PER_RETRIEVER = 200
+
+# Coseno minimo di un candidato semantico: sotto, il retriever riempirebbe
+# la fusione con bandi non pertinenti (il top-k HNSW ritorna sempre k vicini)
+SEMANTIC_MIN_SIMILARITY = float(os.getenv("SEMANTIC_MIN_SIMILARITY", "0.35"))
+
+# Boost nell'ordine di grandezza di uno score RRF (1 / 61 ≈ 0.016)
+ACTIVE_BOOST = 0.01
+RECENCY_BOOST = 0.005
+RECENCY_HALF_LIFE_DAYS = 90
+
+
+def reciprocal_rank_fusion(rankings: Dict[str, List[int]], weights: Dict[str, float] = RETRIEVER_WEIGHTS) -> Dict[int, float]:
+    """`rankings`: retriever -> id ordinati dal più rilevante. Ritorna id -> score fuso."""
+    scores: Dict[int, float] = {}
+    for name, ids in rankings.items():
+        weight = weights.get(name, 1.0)
+        for rank, bando_id in enumerate(ids, start=1):
+            scores[bando_id] = scores.get(bando_id, 0.0) + weight / (RRF_K + rank)
+    return scores
+
+
+def _as_date(value) -> Optional[date]:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str) and len(value) >= 10:
+        try:
+            return date.fromisoformat(value[:10])
+        except ValueError:
+            return None
+    return None
+
+
+def boost(score: float, is_expired, open_date, today: date) -> float:
+    """Score fuso + bonus per bando attivo + bonus decrescente con l'età."""
+    if not is_expired:
+        score += ACTIVE_BOOST
+    opened = _as_date(open_date)
+    if opened is not None:
+        age = max((today - opened).days, 0)
+        score += RECENCY_BOOST / (1 + age / RECENCY_HALF_LIFE_DAYS)
+    return score
+
+
+class StageTimer:
+    """Raccoglie la durata degli stadi di una richiesta (anche da thread diversi)."""
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = (time.perf_counter() - start) * 1000
+
+    def header(self) -> str:
+        """Valore per l'header Server-Timing (visibile anche nei DevTools del browser)."""
+        return ", ".join(f"{name};dur={ms:.1f}" for name, ms in self.stages.items())
@@ -0,0 +1,354 @@
+"""
+semantic.py - Local Embedding Index
+===================================
+Ricerca semantica sul catalogo ("finanziamenti per capannoni") senza API esterne.
+
+- Embedding: modello sentence-transformers multilingua eseguito in locale su CPU,
+  applicato a titolo + sintesi + search_tags di ogni bando.
+- Storage: matrice float32 memory-mapped (`vectors.f32`, una riga per slot),
+  vettori normalizzati -> prodotto scalare = similarità coseno.
+- ANN: indice HNSW (hnswlib) con label = slot della matrice.
+- Incrementale: per ogni bando viene salvato il fingerprint del testo indicizzato;
+  `sync()` ricalcola l'embedding solo per bandi nuovi o modificati e
+  marca come cancellati quelli rimossi dal DB.
+
+File nella directory dell'indice (default data/index/semantic):
+    vectors.f32   matrice [capacity, dim] float32 (memmap)
+    hnsw.bin      indice HNSW
+    meta.json     modello, dimensione, slot -> bando id, fingerprint per bando
+
+Usage:
+    python scripts/manage.py index
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import hnswlib
+import numpy as np
+
+from src.scraper.models import Bando, load_analysis
+from src.utils.fingerprint import fingerprint
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+INDEX_DIR = Path(os.getenv("SEMANTIC_INDEX_DIR", "data/index/semantic"))
+
+# Parametri HNSW: M/ef_construction in costruzione, ef in query (recall vs latenza)
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 128
+
+INITIAL_CAPACITY = 1024
+ENCODE_BATCH_SIZE = 64
+
+# Modello non caricabile (download / torch assenti): nuovo tentativo solo dopo
+# questo intervallo, nel frattempo le ricerche falliscono subito
+EMBEDDER_RETRY_SECONDS = int(os.getenv("EMBEDDER_RETRY_SECONDS", "300"))
+
+
+def grant_text(title, ai_analysis) -> str:
+    """Testo indicizzato per un bando: titolo, sintesi e search_tags."""
+    analysis = load_analysis(ai_analysis)
+    tags = analysis.get('search_tags') or []
+    if isinstance(tags, str):
+        tags = [tags]
+    parts = [title or "", analysis.get('sintesi') or "", ", ".join(str(t) for t in tags if t)]
+    return "\n".join(p.strip() for p in parts if p and p.strip())
+
+
+class Embedder:
+    """Modello di embedding locale, caricato una volta per processo."""
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL):
+        # Import lazy: torch viene caricato solo da chi calcola embedding
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self._encode_query = lru_cache(maxsize=1024)(self._encode_one)
+
+    def encode(self, texts: List[str], batch_size: int = ENCODE_BATCH_SIZE) -> np.ndarray:
+        vectors = self.model.encode(texts, batch_size=batch_size, normalize_embeddings=True,
+                                    convert_to_numpy=True, show_progress_bar=False)
+        return vectors.astype(np.float32, copy=False)
+
+    def _encode_one(self, text: str) -> np.ndarray:
+        return self.encode([text])[0]
+
+    def encode_query(self, text: str) -> np.ndarray:
+        """Embedding di una query, con cache per le ricerche ripetute."""
+        return self._encode_query(text.strip().lower())
+
+
+class SemanticIndex:
+    """Matrice memmap + HNSW persistiti su disco, aggiornabili in modo incrementale."""
+
+    def __init__(self, path: Path = INDEX_DIR, model_name: str = EMBEDDING_MODEL, dim: int = 384):
+        self.path = Path(path)
+        self.model_name = model_name
+        self.dim = dim
+        self.slot_ids: List[int] = []            # slot -> bando id (-1 = libero)
+        self.fingerprints: Dict[int, str] = {}   # bando id -> fingerprint del testo
+        self.slots: Dict[int, int] = {}          # bando id -> slot
+        self.vectors: Optional[np.memmap] = None
+        self.hnsw: Optional[hnswlib.Index] = None
+        self._lock = threading.Lock()
+
+    # --- Persistence ---------------------------------------------------
+
+    @property
+    def meta_path(self) -> Path:
+        return self.path / "meta.json"
+
+    @classmethod
+    def load(cls, path: Path = INDEX_DIR, readonly: bool = False) -> Optional["SemanticIndex"]:
+        """Carica un indice esistente; None se non è mai stato costruito."""
+        path = Path(path)
+        meta_path = path / "meta.json"
+        if not meta_path.exists():
+            return None
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+
+        index = cls(path, meta["model"], meta["dim"])
+        index.slot_ids = meta["slot_ids"]
+        index.fingerprints = {int(k): v for k, v in meta["fingerprints"].items()}
+        index.slots = {bando_id: slot for slot, bando_id in enumerate(index.slot_ids) if bando_id >= 0}
+        index.vectors = np.memmap(path / "vectors.f32", dtype=np.float32, mode="r" if readonly else "r+",
+                                  shape=(meta["capacity"], meta["dim"]))
+        index.hnsw = hnswlib.Index(space="ip", dim=meta["dim"])
+        index.hnsw.load_index(str(path / "hnsw.bin"), max_elements=meta["capacity"])
+        index.hnsw.set_ef(HNSW_EF_SEARCH)
+        return index
+
+    def _create(self, capacity: int):
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.vectors = np.memmap(self.path / "vectors.f32", dtype=np.float32, mode="w+",
+                                 shape=(capacity, self.dim))
+        self.hnsw = hnswlib.Index(space="ip", dim=self.dim)
+        self.hnsw.init_index(max_elements=capacity, ef_construction=HNSW_EF_CONSTRUCTION, M=HNSW_M)
+        self.hnsw.set_ef(HNSW_EF_SEARCH)
+
+    def _grow(self, needed: int):
+        """Raddoppia la capacità di memmap e HNSW quando gli slot non bastano."""
+        capacity = self.vectors.shape[0]
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2)
+        self.vectors.flush()
+        # r+ con shape più grande estende il file: le righe esistenti restano
+        self.vectors = np.memmap(self.path / "vectors.f32", dtype=np.float32, mode="r+",
+                                 shape=(new_capacity, self.dim))
+        self.hnsw.resize_index(new_capacity)
+
+    def _reset(self, model_name: str, dim: int):
+        self.model_name = model_name
+        self.dim = dim
+        self.slot_ids, self.fingerprints, self.slots = [], {}, {}
+        self.vectors = None
+        self.hnsw = None
+
+    def save(self):
+        """Scrive hnsw.bin e meta.json in modo atomico (i lettori non vedono mai file a metà)."""
+        self.vectors.flush()
+        tmp_hnsw = self.path / "hnsw.bin.tmp"
+        self.hnsw.save_index(str(tmp_hnsw))
+        os.replace(tmp_hnsw, self.path / "hnsw.bin")
+
+        meta = {
+            "model": self.model_name,
+            "dim": self.dim,
+            "capacity": int(self.vectors.shape[0]),
+            "slot_ids": self.slot_ids,
+            "fingerprints": {str(k): v for k, v in self.fingerprints.items()},
+        }
+        tmp_meta = self.path / "meta.json.tmp"
+        with open(tmp_meta, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_meta, self.meta_path)
+
+    # --- Updates -------------------------------------------------------
+
+    def upsert(self, ids: List[int], vectors: np.ndarray, fingerprints: List[str]):
+        """Inserisce o sostituisce i vettori dei bandi indicati."""
+        if not ids:
+            return
+        with self._lock:
+            if self.vectors is None:
+                self._create(max(INITIAL_CAPACITY, len(ids)))
+
+            free = [slot for slot, bando_id in enumerate(self.slot_ids) if bando_id < 0]
+            slots = []
+            for bando_id in ids:
+                slot = self.slots.get(bando_id)
+                if slot is None:
+                    if free:
+                        slot = free.pop()
+                        self.hnsw.unmark_deleted(slot)
+                    else:
+                        slot = len(self.slot_ids)
+                        self.slot_ids.append(-1)
+                    self.slot_ids[slot] = bando_id
+                    self.slots[bando_id] = slot
+                slots.append(slot)
+
+            self._grow(len(self.slot_ids))
+            self.vectors[slots] = vectors
+            # hnswlib sostituisce il vettore se la label esiste già
+            self.hnsw.add_items(vectors, np.array(slots, dtype=np.int64))
+            self.fingerprints.update(zip(ids, fingerprints))
+
+    def remove(self, ids: List[int]):
+        with self._lock:
+            for bando_id in ids:
+                slot = self.slots.pop(bando_id, None)
+                self.fingerprints.pop(bando_id, None)
+                if slot is not None:
+                    self.slot_ids[slot] = -1
+                    self.hnsw.mark_deleted(slot)
+
+    def sync(self, session, embedder: Embedder) -> Tuple[int, int]:
+        """
+        Allinea l'indice al DB: embedding solo per bandi nuovi o con testo modificato.
+        Ritorna (aggiornati, rimossi).
+        """
+        if self.model_name != embedder.model_name or self.dim != embedder.dim:
+            if self.slot_ids:
+                logger.warning(f"⚠️ Modello cambiato ({self.model_name} -> {embedder.model_name}): ricostruzione completa")
+            self._reset(embedder.model_name, embedder.dim)
+
+        pending_ids, pending_texts, pending_fps = [], [], []
+        seen = set()
+        rows = session.query(Bando.id, Bando.title, Bando.ai_analysis).yield_per(500)
+        for bando_id, title, raw in rows:
+            text = grant_text(title, raw)
+            if not text:
+                continue  # testo svuotato: il vettore vecchio va rimosso sotto
+            seen.add(bando_id)
+            fp = fingerprint(text)
+            if self.fingerprints.get(bando_id) != fp:
+                pending_ids.append(bando_id)
+                pending_texts.append(text)
+                pending_fps.append(fp)
+
+        # Bandi cancellati dal DB o senza più testo indicizzabile
+        removed = [bando_id for bando_id in self.slots if bando_id not in seen]
+        self.remove(removed)
+
+        for start in range(0, len(pending_ids), ENCODE_BATCH_SIZE * 16):
+            end = start + ENCODE_BATCH_SIZE * 16
+            vectors = embedder.encode(pending_texts[start:end])
+            self.upsert(pending_ids[start:end], vectors, pending_fps[start:end])
+            logger.info(f"🧠 Embedding: {min(end, len(pending_ids))}/{len(pending_ids)}")
+
+        if pending_ids or removed or not self.meta_path.exists():
+            if self.vectors is None:
+                self._create(INITIAL_CAPACITY)
+            self.save()
+        return len(pending_ids), len(removed)
+
+    # --- Query ---------------------------------------------------------
+
+    def __len__(self):
+        return len(self.slots)
+
+    def search(self, query_vector: np.ndarray, k: int = 20) -> List[Tuple[int, float]]:
+        """Top-k (bando_id, similarità coseno) per un vettore query normalizzato."""
+        k = min(k, len(self.slots))
+        if k == 0:
+            return []
+        labels, distances = self.hnsw.knn_query(query_vector.reshape(1, -1), k=k)
+        # space="ip": distance = 1 - prodotto scalare
+        return [(self.slot_ids[int(slot)], round(1.0 - float(dist), 4))
+                for slot, dist in zip(labels[0], distances[0])]
+
+
+class SemanticSearcher:
+    """
+    Lato API: modello caricato una volta, indice ricaricato solo quando
+    un sync pubblica un nuovo meta.json (confronto mtime, nessun polling del DB).
+    Un caricamento fallito del modello non viene ripetuto a ogni richiesta
+    (EMBEDDER_RETRY_SECONDS).
+    """
+
+    def __init__(self, path: Path = INDEX_DIR):
+        self.path = Path(path)
+        self._embedder: Optional[Embedder] = None
+        self._index: Optional[SemanticIndex] = None
+        self._mtime: Optional[float] = None
+        self._lock = threading.Lock()
+        self._load_error: Optional[Exception] = None
+        self._retry_at = 0.0
+
+    def _current(self) -> Optional[SemanticIndex]:
+        meta_path = self.path / "meta.json"
+        mtime = meta_path.stat().st_mtime if meta_path.exists() else None
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    self._index = SemanticIndex.load(self.path, readonly=True)
+                    self._mtime = mtime
+        return self._index
+
+    def version(self) -> Optional[float]:
+        """mtime dell'ultimo meta.json pubblicato (entra negli ETag delle ricerche)."""
+        meta_path = self.path / "meta.json"
+        return meta_path.stat().st_mtime if meta_path.exists() else None
+
+    def _get_embedder(self, model_name: str) -> Embedder:
+        if self._embedder is None:
+            with self._lock:
+                if self._embedder is None:
+                    if time.monotonic() < self._retry_at:
+                        raise RuntimeError(f"embedding model unavailable: {self._load_error}")
+                    try:
+                        self._embedder = Embedder(model_name)
+                    except Exception as e:
+                        self._load_error = e
+                        self._retry_at = time.monotonic() + EMBEDDER_RETRY_SECONDS
+                        logger.error(f"❌ Embedding model {model_name} not loaded, retry in {EMBEDDER_RETRY_SECONDS}s: {e}")
+                        raise
+        return self._embedder
+
+    def search(self, query: str, k: int = 20, min_similarity: Optional[float] = None) -> Optional[List[Tuple[int, float]]]:
+        """None se l'indice non è ancora stato costruito. min_similarity: scarta i vicini meno simili."""
+        index = self._current()
+        if index is None:
+            return None
+        hits = index.search(self._get_embedder(index.model_name).encode_query(query), k)
+        if min_similarity is not None:
+            hits = [(bando_id, score) for bando_id, score in hits if score >= min_similarity]
+        return hits
+
+
+def run_index_sync(path: Path = INDEX_DIR):
+    """Aggiornamento incrementale dell'indice semantico (da cron / manage.py)."""
+    from src.scraper.models import init_db
+
+    print("=" * 70)
+    print("🧠 SEMANTIC INDEX - sync incrementale")
+    print("=" * 70)
+
+    session = init_db()
+    embedder = Embedder()
+    index = SemanticIndex.load(path) or SemanticIndex(path, embedder.model_name, embedder.dim)
+    updated, removed = index.sync(session, embedder)
+
+    print(f"   ✅ Aggiornati: {updated}")
+    print(f"   🗑️ Rimossi:    {removed}")
+    print(f"   📚 Totale:     {len(index)}")
+    return updated, removed
+
+
+if __name__ == "__main__":
+    run_index_sync()
@@ -0,0 +1,160 @@
+"""
+deadlines.py - Normalizzazione delle date di apertura / scadenza
+================================================================
+Le scadenze arrivano in formati diversi a seconda della fonte:
+
+- Solr (fetcher):        close_date "2025-03-14T23:00:00Z" (UTC, mezzanotte italiana)
+- Open Data (enricher):  Data_Chiusura "31/12/2025"
+- LLM (analyzer):        scadenza "2025-12-31", "N/A", "A sportello", "16 Gennaio 2026"
+- legacy:                data_chiusura "entro il 30 giugno 2025 ore 12:00"
+
+Un solo parser li porta tutti a una `date` + uno stato (DeadlineStatus).
+È usato in scrittura (Bando.refresh_deadline, chiamato da fetcher /
+enricher / analyzer) e dalla validazione dell'output LLM: le query non
+confrontano mai stringhe di date.
+"""
+
+import enum
+import re
+from datetime import date, datetime, timezone
+from functools import lru_cache
+from typing import Optional, Tuple
+from zoneinfo import ZoneInfo
+
+ROME = ZoneInfo("Europe/Rome")
+
+# Chiavi di ai_analysis, in ordine di priorità: LLM, Solr, Open Data / legacy
+DEADLINE_KEYS = ('scadenza', 'close_date', 'data_chiusura', 'Data_Chiusura')
+OPEN_DATE_KEYS = ('open_date', 'data_apertura', 'Data_Apertura')
+# Testo libero sulla scadenza: usato solo per riconoscere i bandi a sportello
+DEADLINE_HINT_KEYS = ('scadenza_descrizione',)
+
+
+class DeadlineStatus(enum.Enum):
+    DATED = "dated"            # scadenza con data
+    SPORTELLO = "sportello"    # a sportello / fino a esaurimento fondi: nessuna data fissa
+    UNKNOWN = "unknown"        # N/A, mancante o non interpretabile
+
+
+MONTHS = {
+    "gennaio": 1, "febbraio": 2, "marzo": 3, "aprile": 4, "maggio": 5, "giugno": 6,
+    "luglio": 7, "agosto": 8, "settembre": 9, "ottobre": 10, "novembre": 11, "dicembre": 12,
+    "gen": 1, "feb": 2, "mar": 3, "apr": 4, "mag": 5, "giu": 6,
+    "lug": 7, "ago": 8, "set": 9, "sett": 9, "ott": 10, "nov": 11, "dic": 12,
+}
+_MONTH_NAMES = "|".join(sorted(MONTHS, key=len, reverse=True))
+
+_ISO = re.compile(
+    r'(\d{4})-(\d{2})-(\d{2})'
+    r'(?:[T ](\d{2}):(\d{2})(?::(\d{2})(?:\.\d+)?)?\s*(Z|[+-]\d{2}:?\d{2})?)?'
+)
+_NUMERIC = re.compile(r'\b(\d{1,2})[/.\-](\d{1,2})[/.\-](\d{4})\b')
+_ITALIAN = re.compile(rf'\b(\d{{1,2}})\s*[°º]?\s*(?:di\s+)?({_MONTH_NAMES})\.?\s+(\d{{4}})\b', re.IGNORECASE)
+
+_SPORTELLO = re.compile(r'sportello|esaurimento|senza scadenza|nessuna scadenza|fino a chiusura', re.IGNORECASE)
+# Frase subito prima della data: "entro il 30/06/2025", "fino al", "dal ... al", "scadenza:"
+_CLOSING = re.compile(
+    r"\b(?:entro(?:\s+e\s+non\s+oltre)?(?:\s+il)?|entro\s+le\s+ore\s+[\d.:]+\s+del|al|all'|"
+    r"scade(?:nza)?(?:\s+il)?|chiusura(?:\s+il)?|termine(?:\s+ultimo)?(?:\s+il)?)\s*:?\s*$",
+    re.IGNORECASE,
+)
+# "dal 1 marzo 2025", "a partire dal", "apertura il": data di apertura, non scadenza
+_OPENING = re.compile(r"\b(?:dal|dall'|a\s+partire\s+da|apertura(?:\s+il)?|aperto\s+dal|decorrere\s+dal)\s*:?\s*$", re.IGNORECASE)
+_UNKNOWN = {"", "n/a", "na", "n.a.", "n.d.", "nd", "-", "null", "none", "non specificata", "non indicata"}
+
+
+def _iso_date(match) -> Optional[date]:
+    year, month, day, hour, minute, second, tz = match.groups()
+    try:
+        if tz is None:
+            return date(int(year), int(month), int(day))
+        # Timestamp con fuso (Solr: UTC): conta il giorno in Italia
+        stamp = datetime(int(year), int(month), int(day), int(hour), int(minute), int(second or 0))
+        offset = timezone.utc if tz == "Z" else datetime.strptime(tz.replace(":", ""), "%z").tzinfo
+        return stamp.replace(tzinfo=offset).astimezone(ROME).date()
+    except ValueError:
+        return None
+
+
+def _dates_in(text: str):
+    """(posizione, data) per ogni data nel testo."""
+    for match in _ISO.finditer(text):
+        yield match.start(), _iso_date(match)
+    for match in _NUMERIC.finditer(text):
+        day, month, year = (int(g) for g in match.groups())
+        yield match.start(), _safe_date(year, month, day)
+    for match in _ITALIAN.finditer(text):
+        day, month, year = match.groups()
+        yield match.start(), _safe_date(int(year), MONTHS[month.lower()], int(day))
+
+
+def _safe_date(year: int, month: int, day: int) -> Optional[date]:
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=65536)
+def _normalize_text(text: str) -> Tuple[Optional[date], DeadlineStatus]:
+    cleaned = text.strip()
+    if cleaned.lower() in _UNKNOWN:
+        return None, DeadlineStatus.UNKNOWN
+    closing, plain = [], []
+    for start, found in _dates_in(cleaned):
+        if not found:
+            continue
+        before = cleaned[max(0, start - 40):start]
+        if _CLOSING.search(before):
+            closing.append(found)
+        elif not _OPENING.search(before):
+            plain.append(found)
+    # A sportello: solo una data di chiusura esplicita ("... e comunque entro il 31/12/2025")
+    # è una scadenza; "dal 1 marzo fino a esaurimento fondi" resta senza data
+    if _SPORTELLO.search(cleaned):
+        if closing:
+            return max(closing), DeadlineStatus.DATED
+        return None, DeadlineStatus.SPORTELLO
+    # Più date nel testo ("dal 01/02/2025 al 31/12/2025"): la scadenza è l'ultima,
+    # le date di apertura ("dal ...") non contano
+    found = closing + plain
+    if found:
+        return max(found), DeadlineStatus.DATED
+    return None, DeadlineStatus.UNKNOWN
+
+
+def normalize_date(value) -> Tuple[Optional[date], DeadlineStatus]:
+    """Un singolo valore (stringa, date, datetime, None) -> (data, stato)."""
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(ROME)
+        return value.date(), DeadlineStatus.DATED
+    if isinstance(value, date):
+        return value, DeadlineStatus.DATED
+    if isinstance(value, str):
+        return _normalize_text(value)
+    return None, DeadlineStatus.UNKNOWN
+
+
+def parse_date(value) -> Optional[date]:
+    return normalize_date(value)[0]
+
+
+def extract_deadline(analysis: dict) -> Tuple[Optional[date], DeadlineStatus]:
+    """Scadenza di un bando: prima chiave con una data, altrimenti sportello / sconosciuta."""
+    status = DeadlineStatus.UNKNOWN
+    for key in DEADLINE_KEYS + DEADLINE_HINT_KEYS:
+        parsed, key_status = normalize_date(analysis.get(key))
+        if parsed and key not in DEADLINE_HINT_KEYS:
+            return parsed, DeadlineStatus.DATED
+        if key_status is DeadlineStatus.SPORTELLO:
+            status = DeadlineStatus.SPORTELLO
+    return None, status
+
+
+def extract_open_date(analysis: dict) -> Optional[date]:
+    for key in OPEN_DATE_KEYS:
+        parsed = parse_date(analysis.get(key))
+        if parsed:
+            return parsed
+    return None
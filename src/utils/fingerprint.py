@@ -0,0 +1,12 @@
+import hashlib
+import json
+
+
+def fingerprint(*parts) -> str:
+    """
+    SHA256 stabile di una sequenza di valori (stringhe, dict, liste, numeri).
+    I dict vengono serializzati con chiavi ordinate, quindi due input
+    equivalenti producono sempre lo stesso hash.
+    """
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
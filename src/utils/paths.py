@@ -0,0 +1,4 @@
+from pathlib import Path
+
+# Radice del repository (scripts/, data/, frontend/)
+BASE_DIR = Path(__file__).parent.parent.parent
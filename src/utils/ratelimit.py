@@ -0,0 +1,26 @@
+import threading
+import time
+from typing import Optional
+
+
+class RateLimiter:
+    """
+    Limite di richieste al secondo verso una fonte, condiviso tra thread:
+    ogni chiamata a wait() prenota il prossimo slot libero e dorme fino a quello.
+    rate None o <= 0: nessun limite.
+    """
+
+    def __init__(self, rate: Optional[float]):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
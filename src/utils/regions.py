@@ -0,0 +1,64 @@
+from typing import Optional, Set
+
+# Mapping Solr IDs to Italian region names (from incentivi.gov.it)
+SOLR_ID_TO_REGION = {
+    "218": "Abruzzo",
+    "219": "Basilicata",
+    "220": "Calabria",
+    "221": "Campania",
+    "222": "Emilia-Romagna",
+    "223": "Friuli-Venezia Giulia",
+    "224": "Lazio",
+    "225": "Liguria",
+    "226": "Lombardia",
+    "227": "Marche",
+    "228": "Molise",
+    "229": "Piemonte",
+    "230": "Puglia",
+    "231": "Sardegna",
+    "232": "Sicilia",
+    "233": "Toscana",
+    "234": "Trentino-Alto Adige",
+    "235": "Umbria",
+    "236": "Valle d'Aosta",
+    "237": "Veneto",
+    "587": "Estero",
+}
+
+# Standard Italian regions fallback
+REGIONI_ITALIANE = [
+    "Nazionale", "Lombardia", "Lazio", "Campania", "Veneto",
+    "Piemonte", "Emilia-Romagna", "Sicilia", "Toscana", "Puglia"
+]
+
+NAZIONALE = "Nazionale"
+
+
+def normalize_region(value) -> Optional[str]:
+    """Solr ID -> nome regione; nomi lasciati invariati; ID sconosciuti scartati."""
+    if value is None:
+        return None
+    r_str = str(value).strip()
+    if not r_str:
+        return None
+    if r_str in SOLR_ID_TO_REGION:
+        return SOLR_ID_TO_REGION[r_str]
+    if r_str.isdigit():
+        return None
+    return r_str
+
+
+def extract_regions(analysis: dict) -> Set[str]:
+    """Regioni di un bando da `regions` (V2 / Solr) o `regione` (legacy / Open Data)."""
+    regions = analysis.get('regions') or analysis.get('regione') or []
+    if isinstance(regions, str):
+        regions = [regions]
+    if not isinstance(regions, list):
+        return set()
+
+    found = set()
+    for r in regions:
+        name = normalize_region(r)
+        if name:
+            found.add(name)
+    return found